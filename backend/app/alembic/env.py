@@ -2,7 +2,7 @@ import os
 from logging.config import fileConfig
 
 from alembic import context
-from sqlalchemy import engine_from_config, pool
+from sqlalchemy import engine_from_config, inspect, pool
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -70,6 +70,8 @@ def run_migrations_online():
     )
 
     with connectable.connect() as connection:
+        # Shared by revisions so schema reflection is cached across them
+        config.attributes["inspector"] = inspect(connection)
         context.configure(
             connection=connection, target_metadata=target_metadata, compare_type=True
         )
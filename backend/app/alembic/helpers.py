@@ -0,0 +1,63 @@
+"""Helpers shared by the revisions in versions/"""
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+from alembic import op
+
+
+def get_inspector() -> sa.Inspector:
+    """The Inspector env.py shares across revisions, so their reflection is
+    cached once per run. Re-created if a revision runs on another bind"""
+    bind = op.get_bind()
+    attributes = op.get_context().config.attributes
+    inspector = attributes.get("inspector")
+    if inspector is None or inspector.bind is not bind:
+        inspector = attributes["inspector"] = sa.inspect(bind)
+    return inspector
+
+
+def clear_inspector_cache() -> None:
+    """Forget the shared reflection after a revision changed the schema, so
+    later revisions in the same run do not see the old one"""
+    inspector = op.get_context().config.attributes.get("inspector")
+    if inspector is not None:
+        inspector.clear_cache()
+
+
+@contextmanager
+def lock_timeout(timeout: str = "2s") -> Iterator[None]:
+    """Give up on DDL waiting for a lock after timeout instead of queueing
+    every query behind it, and restore the server default afterwards so the
+    setting does not leak into later revisions on the same connection"""
+    op.execute(f"SET lock_timeout = '{timeout}'")
+    try:
+        yield
+    finally:
+        op.execute("RESET lock_timeout")
+
+
+def create_index_concurrently(name: str, table: str, columns: str) -> None:
+    """CREATE INDEX CONCURRENTLY, to run inside an autocommit_block.
+
+    A failed concurrent build (lock timeout, deadlock, cancel) leaves an
+    INVALID index behind under its name, which IF NOT EXISTS would then skip
+    forever. A valid index is kept, an invalid one is dropped and rebuilt.
+    """
+    valid = (
+        op.get_bind()
+        .execute(
+            sa.text(
+                "SELECT indisvalid FROM pg_index "
+                "WHERE indexrelid = to_regclass(:name)"
+            ),
+            {"name": name},
+        )
+        .scalar()
+    )
+    if valid:
+        return
+    if valid is not None:
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    op.execute(f"CREATE INDEX CONCURRENTLY {name} ON {table} ({columns})")
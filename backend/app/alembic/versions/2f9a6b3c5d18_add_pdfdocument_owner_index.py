@@ -0,0 +1,38 @@
+"""Add the owner index backing the PDF document listing
+
+Revision ID: 2f9a6b3c5d18
+Revises: 8c4f2d7e1a63
+Create Date: 2026-10-15 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+from app.alembic.helpers import (
+    clear_inspector_cache,
+    create_index_concurrently,
+    get_inspector,
+    lock_timeout,
+)
+
+
+# revision identifiers, used by Alembic.
+revision = "2f9a6b3c5d18"
+down_revision = "8c4f2d7e1a63"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "pdfdocument" not in get_inspector().get_table_names():
+        return
+
+    with op.get_context().autocommit_block(), lock_timeout():
+        create_index_concurrently("ix_pdfdocument_owner", "pdfdocument", "owner_id")
+    clear_inspector_cache()
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_pdfdocument_owner")
+    clear_inspector_cache()
@@ -0,0 +1,55 @@
+"""Extend the content filter log user index with created_at
+
+Revision ID: 4a7c2e9d1b85
+Revises: 7d3e1f9b4c26
+Create Date: 2026-10-15 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+from app.alembic.helpers import (
+    clear_inspector_cache,
+    create_index_concurrently,
+    get_inspector,
+    lock_timeout,
+)
+
+
+# revision identifiers, used by Alembic.
+revision = "4a7c2e9d1b85"
+down_revision = "7d3e1f9b4c26"
+branch_labels = None
+depends_on = None
+
+
+def _replace_index(create: str, columns: str, drop: str) -> None:
+    if "contentfilterlog" not in get_inspector().get_table_names():
+        return
+
+    # Build the replacement before dropping so user deletes, which cascade to
+    # the logs, never lose their index
+    with op.get_context().autocommit_block(), lock_timeout():
+        create_index_concurrently(create, "contentfilterlog", columns)
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {drop}")
+
+
+def upgrade():
+    # A user's logs are listed newest first, with created_at in the index the
+    # page is read in order straight from it
+    _replace_index(
+        "ix_contentfilterlog_user_created",
+        "user_id, created_at",
+        "ix_contentfilterlog_user",
+    )
+    clear_inspector_cache()
+
+
+def downgrade():
+    _replace_index(
+        "ix_contentfilterlog_user",
+        "user_id",
+        "ix_contentfilterlog_user_created",
+    )
+    clear_inspector_cache()
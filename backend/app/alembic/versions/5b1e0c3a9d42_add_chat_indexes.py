@@ -0,0 +1,55 @@
+"""Add indexes backing the chat listing queries
+
+Revision ID: 5b1e0c3a9d42
+Revises:
+Create Date: 2026-10-15 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+from app.alembic.helpers import (
+    clear_inspector_cache,
+    create_index_concurrently,
+    get_inspector,
+    lock_timeout,
+)
+
+
+# revision identifiers, used by Alembic.
+revision = "5b1e0c3a9d42"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns)
+INDEXES = (
+    ("ix_chatsession_owner_updated", "chatsession", ["owner_id", "updated_at"]),
+    ("ix_chatmessage_session_created", "chatmessage", ["session_id", "created_at"]),
+    ("ix_contentfilterlog_user", "contentfilterlog", ["user_id"]),
+)
+
+
+def upgrade():
+    # Fresh databases get these indexes from SQLModel.metadata.create_all in
+    # init_db, this migration only backfills them on existing deployments
+    existing_tables = frozenset(get_inspector().get_table_names())
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, and it keeps
+    # the tables writable while the index is built. Existing valid indexes
+    # are kept, so the migration stays idempotent.
+    with op.get_context().autocommit_block(), lock_timeout():
+        for name, table, columns in INDEXES:
+            if table in existing_tables:
+                create_index_concurrently(name, table, ", ".join(columns))
+    clear_inspector_cache()
+
+
+def downgrade():
+    # DROP INDEX CONCURRENTLY only accepts one index, a plain DROP INDEX takes
+    # them all in a single statement which is fine for a rollback
+    names = ", ".join(name for name, _, _ in INDEXES)
+    op.execute(f"DROP INDEX IF EXISTS {names}")
+    clear_inspector_cache()
@@ -0,0 +1,47 @@
+"""Add a text pattern index for content filter log user ID prefix searches
+
+Revision ID: 6b9d4f2a8e17
+Revises: c3f8a1e6d274
+Create Date: 2026-10-15 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+from app.alembic.helpers import (
+    clear_inspector_cache,
+    create_index_concurrently,
+    get_inspector,
+    lock_timeout,
+)
+
+
+# revision identifiers, used by Alembic.
+revision = "6b9d4f2a8e17"
+down_revision = "c3f8a1e6d274"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "contentfilterlog" not in get_inspector().get_table_names():
+        return
+
+    # The admin view searches logs by user ID prefix, text_pattern_ops lets
+    # LIKE 'prefix%' range scan the index whatever the database collation
+    with op.get_context().autocommit_block(), lock_timeout():
+        create_index_concurrently(
+            "ix_contentfilterlog_user_id_text",
+            "contentfilterlog",
+            "(user_id::text) text_pattern_ops",
+        )
+    clear_inspector_cache()
+
+
+def downgrade():
+    with op.get_context().autocommit_block(), lock_timeout():
+        op.execute(
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_contentfilterlog_user_id_text"
+        )
+    clear_inspector_cache()
@@ -0,0 +1,46 @@
+"""Extend the PDF document owner index with id
+
+Revision ID: 7d3e1f9b4c26
+Revises: 2f9a6b3c5d18
+Create Date: 2026-10-15 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+from app.alembic.helpers import (
+    clear_inspector_cache,
+    create_index_concurrently,
+    get_inspector,
+    lock_timeout,
+)
+
+
+# revision identifiers, used by Alembic.
+revision = "7d3e1f9b4c26"
+down_revision = "2f9a6b3c5d18"
+branch_labels = None
+depends_on = None
+
+
+def _replace_index(create: str, columns: str, drop: str) -> None:
+    if "pdfdocument" not in get_inspector().get_table_names():
+        return
+
+    # Build the replacement before dropping so the listing never loses its index
+    with op.get_context().autocommit_block(), lock_timeout():
+        create_index_concurrently(create, "pdfdocument", columns)
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {drop}")
+
+
+def upgrade():
+    # The per-user listing pages in id order, with id in the index the page
+    # is read in order straight from it
+    _replace_index("ix_pdfdocument_owner_id_id", "owner_id, id", "ix_pdfdocument_owner")
+    clear_inspector_cache()
+
+
+def downgrade():
+    _replace_index("ix_pdfdocument_owner", "owner_id", "ix_pdfdocument_owner_id_id")
+    clear_inspector_cache()
@@ -0,0 +1,71 @@
+"""Add the id tiebreaker to the chat keyset indexes
+
+Revision ID: 8c4f2d7e1a63
+Revises: 5b1e0c3a9d42
+Create Date: 2026-10-15 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+from app.alembic.helpers import (
+    clear_inspector_cache,
+    create_index_concurrently,
+    get_inspector,
+    lock_timeout,
+)
+
+
+# revision identifiers, used by Alembic.
+revision = "8c4f2d7e1a63"
+down_revision = "5b1e0c3a9d42"
+branch_labels = None
+depends_on = None
+
+
+# (table, index name, columns) before and after this revision
+OLD_INDEXES = (
+    ("chatsession", "ix_chatsession_owner_updated", ["owner_id", "updated_at"]),
+    ("chatmessage", "ix_chatmessage_session_created", ["session_id", "created_at"]),
+)
+NEW_INDEXES = (
+    (
+        "chatsession",
+        "ix_chatsession_owner_updated_id",
+        ["owner_id", "updated_at", "id"],
+    ),
+    (
+        "chatmessage",
+        "ix_chatmessage_session_created_id",
+        ["session_id", "created_at", "id"],
+    ),
+)
+
+
+def _replace_indexes(create, drop) -> None:
+    existing_tables = frozenset(get_inspector().get_table_names())
+
+    with op.get_context().autocommit_block(), lock_timeout():
+        # Build the replacement before dropping so the listings never lose
+        # their index while the migration runs
+        for table, name, columns in create:
+            if table in existing_tables:
+                create_index_concurrently(name, table, ", ".join(columns))
+        for table, name, _ in drop:
+            if table in existing_tables:
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def upgrade():
+    # The listings order and page by (timestamp, id). With id in the index
+    # the keyset predicate and ORDER BY are served by a single index scan in
+    # either direction, no sort step. The old indexes are a prefix of the new
+    # ones and would only cost writes.
+    _replace_indexes(create=NEW_INDEXES, drop=OLD_INDEXES)
+    clear_inspector_cache()
+
+
+def downgrade():
+    _replace_indexes(create=OLD_INDEXES, drop=NEW_INDEXES)
+    clear_inspector_cache()
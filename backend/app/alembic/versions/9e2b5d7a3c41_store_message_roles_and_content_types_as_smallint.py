@@ -0,0 +1,92 @@
+"""Store chat message roles and content filter content types as smallint
+
+Revision ID: 9e2b5d7a3c41
+Revises: 4a7c2e9d1b85
+Create Date: 2026-10-15 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+from app.alembic.helpers import clear_inspector_cache, get_inspector
+
+
+# revision identifiers, used by Alembic.
+revision = "9e2b5d7a3c41"
+down_revision = "4a7c2e9d1b85"
+branch_labels = None
+depends_on = None
+
+
+# Positions match CHAT_MESSAGE_ROLES and CONTENT_FILTER_CONTENT_TYPES in
+# app.models, frozen here so later additions there do not change history
+CODED_COLUMNS = [
+    ("chatmessage", "role", ("user", "assistant", "ai")),
+    ("contentfilterlog", "content_type", ("user_input", "ai_response")),
+]
+
+
+def _check_values(table: str, column: str, allowed: str) -> None:
+    """Fail with the offending values before converting, instead of having
+    the CASE turn them into NULLs that abort the conversion halfway"""
+    unexpected = (
+        op.get_bind()
+        .execute(
+            sa.text(
+                f"SELECT DISTINCT {column}::text FROM {table} "
+                f"WHERE {column} NOT IN ({allowed})"
+            )
+        )
+        .scalars()
+        .all()
+    )
+    if unexpected:
+        raise RuntimeError(
+            f"{table}.{column} holds values without a mapping: "
+            f"{', '.join(map(repr, unexpected))}. Map or remove them first."
+        )
+
+
+def _column_type(table: str, column: str) -> sa.types.TypeEngine | None:
+    inspector = get_inspector()
+    if table not in inspector.get_table_names():
+        return None
+    for info in inspector.get_columns(table):
+        if info["name"] == column:
+            return info["type"]
+    return None
+
+
+def upgrade():
+    # Rewrites both tables under an exclusive lock, run it in a quiet window.
+    # SET LOCAL ends with the revision's transaction, later ones keep the default
+    op.execute("SET LOCAL lock_timeout = '2s'")
+    for table, column, values in CODED_COLUMNS:
+        if not isinstance(_column_type(table, column), sa.String):
+            continue
+        _check_values(table, column, ", ".join(f"'{value}'" for value in values))
+        cases = " ".join(
+            f"WHEN '{value}' THEN {code}" for code, value in enumerate(values)
+        )
+        op.execute(
+            f"ALTER TABLE {table} ALTER COLUMN {column} TYPE smallint "
+            f"USING CASE {column} {cases} END"
+        )
+    clear_inspector_cache()
+
+
+def downgrade():
+    op.execute("SET LOCAL lock_timeout = '2s'")
+    for table, column, values in CODED_COLUMNS:
+        if not isinstance(_column_type(table, column), sa.SmallInteger):
+            continue
+        _check_values(table, column, ", ".join(map(str, range(len(values)))))
+        cases = " ".join(
+            f"WHEN {code} THEN '{value}'" for code, value in enumerate(values)
+        )
+        op.execute(
+            f"ALTER TABLE {table} ALTER COLUMN {column} TYPE varchar(20) "
+            f"USING CASE {column} {cases} END"
+        )
+    clear_inspector_cache()
@@ -0,0 +1,44 @@
+"""Add the persisted query embedding cache
+
+Revision ID: c3f8a1e6d274
+Revises: 9e2b5d7a3c41
+Create Date: 2026-10-15 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+from app.alembic.helpers import clear_inspector_cache, get_inspector
+
+
+# revision identifiers, used by Alembic.
+revision = "c3f8a1e6d274"
+down_revision = "9e2b5d7a3c41"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "embeddingcache" in get_inspector().get_table_names():
+        return
+
+    op.create_table(
+        "embeddingcache",
+        sa.Column(
+            "hash", sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False
+        ),
+        sa.Column(
+            "model", sqlmodel.sql.sqltypes.AutoString(length=100), nullable=False
+        ),
+        sa.Column("dimensions", sa.Integer(), nullable=False),
+        sa.Column("vector", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("hash"),
+    )
+    clear_inspector_cache()
+
+
+def downgrade():
+    op.drop_table("embeddingcache", if_exists=True)
+    clear_inspector_cache()
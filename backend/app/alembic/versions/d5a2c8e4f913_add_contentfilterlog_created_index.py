@@ -0,0 +1,43 @@
+"""Add a created_at, id index for content filter log keyset pages
+
+Revision ID: d5a2c8e4f913
+Revises: 6b9d4f2a8e17
+Create Date: 2026-10-15 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+from app.alembic.helpers import (
+    clear_inspector_cache,
+    create_index_concurrently,
+    get_inspector,
+    lock_timeout,
+)
+
+
+# revision identifiers, used by Alembic.
+revision = "d5a2c8e4f913"
+down_revision = "6b9d4f2a8e17"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "contentfilterlog" not in get_inspector().get_table_names():
+        return
+
+    # Unfiltered admin pages walk the logs newest first from a cursor, read
+    # backwards off this index
+    with op.get_context().autocommit_block(), lock_timeout():
+        create_index_concurrently(
+            "ix_contentfilterlog_created_id", "contentfilterlog", "created_at, id"
+        )
+    clear_inspector_cache()
+
+
+def downgrade():
+    with op.get_context().autocommit_block(), lock_timeout():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_contentfilterlog_created_id")
+    clear_inspector_cache()
@@ -1,11 +1,2 @@
-from . import (
-    items,
-    login,
-    private,
-    users,
-    utils,
-    pdfs,
-    chat,
-    content_filter,
-    feature_flags,
-)
+# Route modules are imported by name from app.api.main, only those it
+# registers are loaded
@@ -1,24 +1,25 @@
 import uuid
 from typing import Any
 
-from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select, Session
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
+from sqlmodel import select, Session
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
-from app.api.deps import CurrentUser, SessionDep
+from app.api.deps import CurrentUser, SessionDep, parse_cursor
 from app.models import (
     ChatSession,
     ChatSessionCreate,
     ChatSessionPublic,
     ChatSessionsPublic,
     ChatSessionUpdate,
-    ChatMessage,
     ChatMessageCreate,
-    ChatMessagePublic,
     ChatMessagesPublic,
+    ChatMessagesHeadPublic,
     Message,
 )
-from app.services.chat_service import chat_service
+from app.core.pagination import encode_cursor
+from app.services.chat_service import ChatSessionNotFoundError, chat_service
 from app.core.db import engine
 import logging
 
@@ -26,32 +27,62 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+# ChatSession also stores the conversation summary, which is not exposed
+CHAT_SESSION_PUBLIC_FIELDS = set(ChatSessionPublic.model_fields)
+
+
+def dump_exchange(result: dict[str, Any]) -> dict[str, Any]:
+    """Dump the messages and session send_message returns, the rows already
+    hold valid public fields so they are not validated again"""
+    return {
+        "user_message": result["user_message"].model_dump(),
+        "ai_message": result["ai_message"].model_dump(),
+        "session": result["session"].model_dump(include=CHAT_SESSION_PUBLIC_FIELDS),
+    }
+
 
 @router.get("/sessions", response_model=ChatSessionsPublic)
 def read_chat_sessions(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 20
+    session: SessionDep,
+    current_user: CurrentUser,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    after: str | None = None,
+    include_count: bool = False,
 ) -> Any:
     """
     Retrieve user's chat sessions.
-    """
-    try:
-        chat_sessions = chat_service.get_user_sessions(
-            session, current_user.id, skip=skip, limit=limit
-        )
 
-        # Get total count
-        count_statement = (
-            select(func.count())
-            .select_from(ChatSession)
-            .where(ChatSession.owner_id == current_user.id)
-        )
-        count = session.exec(count_statement).one()
+    Pass the previous page's `next_cursor` as `after` to page through without
+    an OFFSET, `skip` is kept for existing clients. The total `count` is only
+    computed with `include_count`, `has_more` tells whether a next page exists.
+    """
+    chat_sessions, count, has_more = chat_service.get_user_sessions(
+        session,
+        current_user.id,
+        skip=skip,
+        limit=limit,
+        after=parse_cursor(after),
+        include_count=include_count,
+    )
 
-        return ChatSessionsPublic(data=chat_sessions, count=count)
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error retrieving chat sessions: {str(e)}"
-        )
+    next_cursor = None
+    if has_more:
+        last = chat_sessions[-1]
+        next_cursor = encode_cursor(last.updated_at, last.id)
+    # Rows are dumped straight into the response instead of being validated
+    # against the response model one by one
+    return ORJSONResponse(
+        {
+            "data": [
+                chat_session.model_dump(include=CHAT_SESSION_PUBLIC_FIELDS)
+                for chat_session in chat_sessions
+            ],
+            "count": count,
+            "has_more": has_more,
+            "next_cursor": next_cursor,
+        }
+    )
 
 
 @router.post("/sessions", response_model=ChatSessionPublic)
@@ -61,15 +92,10 @@ def create_chat_session(
     """
     Create new chat session.
     """
-    try:
-        chat_session = chat_service.create_session(
-            session, current_user.id, session_in.title
-        )
-        return chat_session
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error creating chat session: {str(e)}"
-        )
+    chat_session = chat_service.create_session(
+        session, current_user.id, session_in.title
+    )
+    return chat_session
 
 
 @router.get("/sessions/{session_id}", response_model=ChatSessionPublic)
@@ -79,22 +105,12 @@ def read_chat_session(
     """
     Get chat session by ID.
     """
-    try:
-        statement = select(ChatSession).where(
-            ChatSession.id == session_id, ChatSession.owner_id == current_user.id
-        )
-        chat_session = session.exec(statement).first()
+    chat_session = chat_service.get_owned_session(session, session_id, current_user.id)
 
-        if not chat_session:
-            raise HTTPException(status_code=404, detail="Chat session not found")
+    if not chat_session:
+        raise HTTPException(status_code=404, detail="Chat session not found")
 
-        return chat_session
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error retrieving chat session: {str(e)}"
-        )
+    return chat_session
 
 
 @router.put("/sessions/{session_id}", response_model=ChatSessionPublic)
@@ -108,20 +124,16 @@ def update_chat_session(
     """
     Update chat session title.
     """
-    try:
-        if not session_in.title:
-            raise HTTPException(status_code=400, detail="Title is required")
+    if not session_in.title:
+        raise HTTPException(status_code=400, detail="Title is required")
 
+    try:
         chat_session = chat_service.update_session_title(
             session, session_id, current_user.id, session_in.title
         )
-        return chat_session
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error updating chat session: {str(e)}"
-        )
+    return chat_session
 
 
 @router.delete("/sessions/{session_id}")
@@ -133,13 +145,9 @@ def delete_chat_session(
     """
     try:
         chat_service.delete_session(session, session_id, current_user.id)
-        return Message(message="Chat session deleted successfully")
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error deleting chat session: {str(e)}"
-        )
+    return Message(message="Chat session deleted successfully")
 
 
 @router.get("/sessions/{session_id}/messages", response_model=ChatMessagesPublic)
@@ -147,42 +155,85 @@ def read_chat_messages(
     session: SessionDep,
     current_user: CurrentUser,
     session_id: uuid.UUID,
-    skip: int = 0,
-    limit: int = 20,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    after: str | None = None,
+    include_count: bool = False,
 ) -> Any:
     """
     Get messages for a specific chat session.
+
+    Pass the previous page's `next_cursor` as `after` to page through without
+    an OFFSET, `skip` is kept for existing clients. The total `count` is only
+    computed with `include_count`, `has_more` tells whether a next page exists.
     """
     try:
-        # Verify session ownership
-        session_statement = select(ChatSession).where(
-            ChatSession.id == session_id, ChatSession.owner_id == current_user.id
+        # Ownership is checked as part of the messages query
+        messages, count, has_more = chat_service.get_session_messages(
+            session,
+            session_id,
+            current_user.id,
+            skip=skip,
+            limit=limit,
+            after=parse_cursor(after),
+            include_count=include_count,
         )
-        chat_session = session.exec(session_statement).first()
+    except ChatSessionNotFoundError:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(messages[-1].created_at, messages[-1].id)
+
+    # ChatMessage has exactly the ChatMessagePublic fields, returning a response
+    # directly skips validating every message against the response model again
+    return ORJSONResponse(
+        {
+            "data": [message.model_dump() for message in messages],
+            "count": count,
+            "has_more": has_more,
+            "next_cursor": next_cursor,
+        }
+    )
 
-        if not chat_session:
-            raise HTTPException(status_code=404, detail="Chat session not found")
 
-        # Get messages
-        messages = chat_service.get_session_messages(
-            session, session_id, skip=skip, limit=limit
-        )
+@router.get(
+    "/sessions/{session_id}/messages/head", response_model=ChatMessagesHeadPublic
+)
+def read_chat_messages_head(
+    session: SessionDep,
+    current_user: CurrentUser,
+    session_id: uuid.UUID,
+    before: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+) -> Any:
+    """
+    Get the latest messages of a chat session, or those sent before `before`,
+    the previous page's `next_cursor`.
 
-        # Get total count
-        count_statement = (
-            select(func.count())
-            .select_from(ChatMessage)
-            .where(ChatMessage.session_id == session_id)
-        )
-        count = session.exec(count_statement).one()
-
-        return ChatMessagesPublic(data=messages, count=count)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error retrieving messages: {str(e)}"
+    Prefer this over skip/limit on long sessions, deep OFFSETs get slower
+    with every page.
+    """
+    try:
+        messages = chat_service.get_session_messages_before(
+            session,
+            session_id,
+            current_user.id,
+            before=parse_cursor(before),
+            limit=limit,
         )
+    except ChatSessionNotFoundError:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+
+    next_cursor = None
+    if messages and len(messages) == limit:
+        next_cursor = encode_cursor(messages[0].created_at, messages[0].id)
+    return ORJSONResponse(
+        {
+            "data": [message.model_dump() for message in messages],
+            "next_cursor": next_cursor,
+        }
+    )
 
 
 @router.post("/sessions/{session_id}/messages")
@@ -192,62 +243,26 @@ def send_chat_message(
     current_user: CurrentUser,
     session_id: uuid.UUID,
     message_in: ChatMessageCreate,
+    background_tasks: BackgroundTasks,
 ) -> Any:
     """
     Send a message in a chat session and get AI response.
     """
     try:
-        # Verify session ownership
-        session_statement = select(ChatSession).where(
-            ChatSession.id == session_id, ChatSession.owner_id == current_user.id
-        )
-        chat_session = session.exec(session_statement).first()
-
-        if not chat_session:
-            raise HTTPException(status_code=404, detail="Chat session not found")
-
-        # Send message and get response
+        # Send message and get response, the service verifies ownership
         result = chat_service.send_message(
-            session, session_id, current_user.id, message_in.content
-        )
-
-        # Convert SQLModel objects to proper response format
-        user_message_public = ChatMessagePublic(
-            id=result["user_message"].id,
-            content=result["user_message"].content,
-            role=result["user_message"].role,
-            session_id=result["user_message"].session_id,
-            created_at=result["user_message"].created_at,
-        )
-
-        ai_message_public = ChatMessagePublic(
-            id=result["ai_message"].id,
-            content=result["ai_message"].content,
-            role=result["ai_message"].role,
-            session_id=result["ai_message"].session_id,
-            created_at=result["ai_message"].created_at,
+            session,
+            session_id,
+            current_user.id,
+            message_in.content,
+            background_tasks=background_tasks,
         )
-
-        session_public = ChatSessionPublic(
-            id=result["session"].id,
-            title=result["session"].title,
-            is_active=result["session"].is_active,
-            owner_id=result["session"].owner_id,
-            created_at=result["session"].created_at,
-            updated_at=result["session"].updated_at,
-            is_blocked=result["session"].is_blocked,
-            blocked_reason=result["session"].blocked_reason,
-        )
-
-        return {
-            "user_message": user_message_public,
-            "ai_message": ai_message_public,
-            "session": session_public,
-        }
+    except ChatSessionNotFoundError:
+        raise HTTPException(status_code=404, detail="Chat session not found")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error sending message: {str(e)}")
+
+    return ORJSONResponse(dump_exchange(result))
 
 
 @router.get("/sessions/{session_id}/summary")
@@ -259,58 +274,51 @@ def get_session_summary(
     """
     try:
         summary = chat_service.get_session_summary(session, session_id, current_user.id)
-        return summary
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error getting session summary: {str(e)}"
-        )
+    return summary
 
 
 @router.post("/test-ai")
-async def test_ai_behavior(request: dict, session: SessionDep):
+def test_ai_behavior(request: dict, session: SessionDep):
     """
     Test endpoint to verify AI behavior and logging
     """
+    # Create a test user and session
+    test_user_id = uuid.UUID("00000000-0000-0000-0000-000000000001")
+    test_session_id = uuid.UUID("00000000-0000-0000-0000-000000000002")
+
+    # Create test session if it doesn't exist
+    existing_session = session.exec(
+        select(ChatSession).where(ChatSession.id == test_session_id)
+    ).first()
+
+    if not existing_session:
+        existing_session = ChatSession(
+            id=test_session_id, owner_id=test_user_id, title="AI Test Session"
+        )
+        session.add(existing_session)
+        session.commit()
+
+    # Test the chat service
+    content = request.get("message", "Hello, how are you?")
+
+    logger.info("=== %s ===", "AI BEHAVIOR TEST START")
     try:
-        # Create a test user and session
-        test_user_id = uuid.UUID("00000000-0000-0000-0000-000000000001")
-        test_session_id = uuid.UUID("00000000-0000-0000-0000-000000000002")
-
-        # Create test session if it doesn't exist
-        existing_session = session.exec(
-            select(ChatSession).where(ChatSession.id == test_session_id)
-        ).first()
-
-        if not existing_session:
-            existing_session = ChatSession(
-                id=test_session_id, owner_id=test_user_id, title="AI Test Session"
-            )
-            session.add(existing_session)
-            session.commit()
-            session.refresh(existing_session)
-
-        # Test the chat service
-        content = request.get("message", "Hello, how are you?")
-
-        logger.info("=== AI BEHAVIOR TEST START ===")
         result = chat_service.send_message(
             session, test_session_id, test_user_id, content
         )
-        logger.info("=== AI BEHAVIOR TEST END ===")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info("=== %s ===", "AI BEHAVIOR TEST END")
 
-        return {
+    return ORJSONResponse(
+        {
             "status": "success",
             "message": "AI behavior test completed",
-            "user_message": result["user_message"],
-            "ai_message": result["ai_message"],
-            "session": result["session"],
+            **dump_exchange(result),
         }
-
-    except Exception as e:
-        logger.error(f"AI behavior test failed: {e}")
-        return {"status": "error", "message": str(e)}
+    )
 
 
 @router.post("/sessions/{session_id}/stream")
@@ -320,24 +328,31 @@ async def stream_chat_message(
     current_user: CurrentUser,
     session_id: uuid.UUID,
     message_in: ChatMessageCreate,
+    background_tasks: BackgroundTasks,
 ):
     """
     Stream AI response for a chat session.
     """
-    # Verify session ownership
-    session_statement = select(ChatSession).where(
-        ChatSession.id == session_id, ChatSession.owner_id == current_user.id
+    # Verify session ownership, in the threadpool as the session is blocking
+    chat_session = await run_in_threadpool(
+        chat_service.get_owned_session, session, session_id, current_user.id
     )
-    chat_session = session.exec(session_statement).first()
     if not chat_session:
-
-        def error_gen():
-            yield "Session not found or access denied."
-
-        return StreamingResponse(error_gen(), media_type="text/event-stream")
+        raise HTTPException(status_code=404, detail="Chat session not found")
 
     # Stream the AI response
     generator = chat_service.stream_message(
-        session, session_id, current_user.id, message_in.content
+        session,
+        session_id,
+        current_user.id,
+        message_in.content,
+        background_tasks=background_tasks,
+        session=chat_session,
+    )
+    # The client reads the body as plain concatenated text, disable caching and
+    # proxy buffering so each token is flushed as soon as it is generated
+    return StreamingResponse(
+        generator,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    return StreamingResponse(generator, media_type="text/event-stream")
@@ -1,8 +1,10 @@
 import uuid
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import ORJSONResponse
 from sqlmodel import Session
-from app.api.deps import CurrentUser, SessionDep
+from app.api.deps import SessionDep, get_current_active_superuser, parse_cursor
+from app.core.pagination import encode_cursor
 from app.models import (
     ContentFilterLog,
     ContentFilterLogPublic,
@@ -10,51 +12,57 @@ from app.models import (
 )
 from app.services.content_filter_service import content_filter_service
 
-router = APIRouter()
+# Every content filter endpoint is admin only
+router = APIRouter(dependencies=[Depends(get_current_active_superuser)])
 
 
 @router.get("/logs", response_model=ContentFilterLogsPublic)
 def get_content_filter_logs(
     db: SessionDep,
-    current_user: CurrentUser,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
-    user_id: Optional[str] = Query(None),
-    content_type: Optional[str] = Query(None),
-) -> ContentFilterLogsPublic:
+    user_id: str | None = Query(None),
+    content_type: str | None = Query(None),
+    after: str | None = Query(None),
+) -> ORJSONResponse:
     """
     Get content filter logs (admin only)
-    """
-    if not current_user.is_superuser:
-        raise HTTPException(
-            status_code=403,
-            detail="Not enough permissions. Only admins can view content filter logs.",
-        )
 
+    Pass the previous page's `next_cursor` as `after` to page through without
+    an OFFSET, the `count` then only covers the logs from the cursor on.
+    """
     result = content_filter_service.get_filter_logs(
         db=db,
         skip=skip,
         limit=limit,
         user_id=user_id,
         content_type=content_type,
+        after=parse_cursor(after),
     )
 
-    return ContentFilterLogsPublic(data=result["data"], count=result["count"])
+    next_cursor = None
+    if result["has_more"]:
+        last = result["data"][-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    # ContentFilterLog has exactly the ContentFilterLogPublic fields, skip
+    # validating every log against the response model again
+    return ORJSONResponse(
+        {
+            "data": [log.model_dump() for log in result["data"]],
+            "count": result["count"],
+            "has_more": result["has_more"],
+            "next_cursor": next_cursor,
+        }
+    )
 
 
 @router.get("/statistics")
 def get_content_filter_statistics(
-    current_user: CurrentUser,
     db: SessionDep,
 ) -> dict:
     """
     Get content filter statistics (admin only)
     """
-    if not current_user.is_superuser:
-        raise HTTPException(
-            status_code=403,
-            detail="Not enough permissions. Only admins can view content filter statistics.",
-        )
-
     stats = content_filter_service.get_filter_statistics(db=db)
     return stats
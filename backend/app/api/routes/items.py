@@ -2,6 +2,8 @@ import uuid
 from typing import Any
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import raiseload
 from sqlmodel import func, select
 
 from app.api.deps import CurrentUser, SessionDep
@@ -21,7 +23,7 @@ def read_items(
     if current_user.is_superuser:
         count_statement = select(func.count()).select_from(Item)
         count = session.exec(count_statement).one()
-        statement = select(Item).offset(skip).limit(limit)
+        statement = select(Item).options(raiseload("*")).offset(skip).limit(limit)
         items = session.exec(statement).all()
     else:
         count_statement = (
@@ -32,13 +34,17 @@ def read_items(
         count = session.exec(count_statement).one()
         statement = (
             select(Item)
+            .options(raiseload("*"))
             .where(Item.owner_id == current_user.id)
             .offset(skip)
             .limit(limit)
         )
         items = session.exec(statement).all()
 
-    return ItemsPublic(data=items, count=count)
+    # Item has exactly the ItemPublic fields, skip validating every row again
+    return ORJSONResponse(
+        {"data": [item.model_dump() for item in items], "count": count}
+    )
 
 
 @router.get("/{id}", response_model=ItemPublic)
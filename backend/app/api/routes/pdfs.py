@@ -1,76 +1,106 @@
+import asyncio
+import json
+import logging
+import os
 import uuid
+from collections.abc import AsyncIterator
+from email.utils import parsedate_to_datetime
 from typing import List
 from fastapi import (
     APIRouter,
+    BackgroundTasks,
     Depends,
     HTTPException,
+    Query,
+    Request,
+    Response,
     UploadFile,
     File,
-    BackgroundTasks,
     Form,
 )
-from sqlmodel import Session, select
-from app.api.deps import CurrentUser, SessionDep
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
+from sqlalchemy.orm import raiseload
+from sqlmodel import Session, func, select
+from starlette.concurrency import run_in_threadpool
+from app.api.deps import (
+    CurrentSuperUser,
+    CurrentUser,
+    SessionDep,
+    get_current_active_superuser,
+)
 from app.models import (
+    Message,
     PDFDocument,
     PDFDocumentCreate,
     PDFDocumentUpdate,
     PDFDocumentPublic,
     PDFDocumentsPublic,
 )
-from app.services.pdf_service import pdf_service
+from app.services.pdf_service import (
+    PDF_FINAL_STATUSES,
+    UPLOAD_CHUNK_SIZE,
+    IncompleteUploadError,
+    PDFTooLargeError,
+    pdf_service,
+    processing_status_payload,
+)
+from app.services.pdf_status_service import pdf_status_broadcaster
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Check file size limit (10MB)
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB in bytes
+# Seconds between keepalive comments on an idle status event stream
+STATUS_EVENTS_KEEPALIVE = 15
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: float | None = None
+) -> bool:
+    """Whether the client's conditional headers match the current version"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have one second precision
+    return int(last_modified) <= since.timestamp()
+
 
 @router.post("/", response_model=PDFDocumentPublic)
 def create_pdf_document(
     *,
     db: SessionDep,
-    current_user: CurrentUser,
+    current_user: CurrentSuperUser,
     title: str = Form(...),
     description: str = Form(None),
     file: UploadFile = File(...),
-    background_tasks: BackgroundTasks,
 ) -> PDFDocumentPublic:
     """
     Create new PDF document.
     """
-    # Check if user is superuser (admin)
-    if not current_user.is_superuser:
-        raise HTTPException(
-            status_code=403,
-            detail="Not enough permissions. Only admins can upload PDFs.",
-        )
-
     # Validate file type
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed.")
 
-    # Check file size limit (10MB)
-    MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB in bytes
-
-    # Read file content
-    try:
-        file_content = file.file.read()
-        file_size = len(file_content)
-
-        # Check if file size exceeds limit
-        if file_size > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File size ({file_size / (1024*1024):.2f} MB) exceeds the maximum allowed size of 10 MB.",
-            )
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error reading file: {str(e)}")
-
-    # Save file to storage
+    # Copy the upload to storage, an oversized file is rejected before any of
+    # it is copied
     try:
-        file_path = pdf_service.save_pdf_file(file_content, file.filename)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
+        file_path, file_size = pdf_service.save_pdf_file(
+            file.file, file.filename, MAX_FILE_SIZE
+        )
+    except PDFTooLargeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     # Create PDF document record
     pdf_document = PDFDocument(
@@ -84,14 +114,164 @@ def create_pdf_document(
         owner_id=current_user.id,
     )
 
+    # Every column is set client side, the response is built before the
+    # commit expires the instance so no SELECT is needed to reload it
+    pdf_public = PDFDocumentPublic.model_validate(pdf_document)
     db.add(pdf_document)
     db.commit()
-    db.refresh(pdf_document)
 
-    # Process PDF in background
-    background_tasks.add_task(pdf_service.process_pdf, pdf_document, db)
+    # Process PDF on the processing workers
+    pdf_service.enqueue_processing(pdf_public.id)
 
-    return PDFDocumentPublic.from_orm(pdf_document)
+    return pdf_public
+
+
+@router.post("/uploads", response_model=PDFDocumentPublic)
+def create_pdf_upload(
+    *,
+    db: SessionDep,
+    current_user: CurrentSuperUser,
+    background_tasks: BackgroundTasks,
+    title: str = Form(...),
+    description: str = Form(None),
+    filename: str = Form(...),
+    file_size: int = Form(..., gt=0),
+) -> PDFDocumentPublic:
+    """
+    Start a chunked PDF upload.
+
+    Send the file's bytes with `PUT /pdfs/{pdf_id}/chunks?offset=N`, chunks can
+    be sent in parallel and in any order, then call `POST /pdfs/{pdf_id}/finalize`.
+    Uploads not finalized within PDF_UPLOAD_EXPIRE_SECONDS are removed.
+    """
+    # Starting an upload is when abandoned ones are cleared, uploads are rare
+    # enough that nothing else needs to watch for them
+    background_tasks.add_task(pdf_service.expire_abandoned_uploads)
+    if not filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed.")
+    if file_size > MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File size ({file_size / (1024*1024):.2f} MB) exceeds the maximum allowed size of 10 MB.",
+        )
+
+    pdf_document = PDFDocument(
+        title=title,
+        description=description,
+        filename=str(pdf_service.allocate_pdf_path(filename)),
+        file_size=file_size,
+        page_count=0,
+        is_processed=False,
+        processing_status="uploading",
+        owner_id=current_user.id,
+    )
+
+    pdf_public = PDFDocumentPublic.model_validate(pdf_document)
+    db.add(pdf_document)
+    db.commit()
+
+    return pdf_public
+
+
+def get_uploading_pdf(db: Session, pdf_id: uuid.UUID) -> PDFDocument:
+    pdf_document = db.get(PDFDocument, pdf_id)
+    if not pdf_document:
+        raise HTTPException(status_code=404, detail="PDF document not found")
+    if pdf_document.processing_status != "uploading":
+        raise HTTPException(status_code=409, detail="PDF upload is already finalized")
+    return pdf_document
+
+
+@router.put("/{pdf_id}/chunks", dependencies=[Depends(get_current_active_superuser)])
+async def upload_pdf_chunk(
+    *,
+    db: SessionDep,
+    pdf_id: uuid.UUID,
+    offset: int = Query(..., ge=0),
+    request: Request,
+) -> Message:
+    """
+    Upload one chunk of a chunked PDF upload, the request body is the raw bytes
+    starting at `offset`.
+    """
+    pdf_document = await run_in_threadpool(get_uploading_pdf, db, pdf_id)
+    filename, file_size = pdf_document.filename, pdf_document.file_size
+    # Return the pooled connection before the body streams in, parallel chunk
+    # uploads would otherwise hold one each for as long as their upload takes
+    await run_in_threadpool(db.close)
+
+    if offset >= file_size:
+        raise HTTPException(
+            status_code=400, detail="Chunk offset is past the declared file size"
+        )
+    too_long = HTTPException(
+        status_code=400, detail="Chunk extends past the declared file size"
+    )
+    max_length = file_size - offset
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_length:
+        raise too_long
+
+    # The body is streamed to the part file in blocks, counting the bytes as
+    # they arrive, so a chunk is never held in memory whole
+    position = offset
+    buffer = bytearray()
+    async for data in request.stream():
+        if position - offset + len(buffer) + len(data) > max_length:
+            raise too_long
+        buffer += data
+        if len(buffer) >= UPLOAD_CHUNK_SIZE:
+            await run_in_threadpool(
+                pdf_service.write_upload_chunk,
+                filename,
+                position,
+                bytes(buffer),
+            )
+            position += len(buffer)
+            buffer.clear()
+    if buffer:
+        await run_in_threadpool(
+            pdf_service.write_upload_chunk,
+            filename,
+            position,
+            bytes(buffer),
+        )
+    return Message(message="Chunk uploaded")
+
+
+@router.post(
+    "/{pdf_id}/finalize",
+    response_model=PDFDocumentPublic,
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def finalize_pdf_upload(
+    *,
+    db: SessionDep,
+    pdf_id: uuid.UUID,
+    sha256: str | None = None,
+) -> PDFDocumentPublic:
+    """
+    Finish a chunked PDF upload and start processing it. Pass the file's hex
+    `sha256` to have its content verified.
+    """
+    pdf_document = get_uploading_pdf(db, pdf_id)
+
+    try:
+        pdf_service.finalize_upload(
+            pdf_document.filename, pdf_document.file_size, sha256
+        )
+    except IncompleteUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    pdf_document.processing_status = "pending"
+    pdf_public = PDFDocumentPublic.model_validate(pdf_document)
+    db.add(pdf_document)
+    db.commit()
+
+    # Process PDF on the processing workers
+    pdf_service.enqueue_processing(pdf_public.id)
+
+    return pdf_public
 
 
 @router.get("/", response_model=PDFDocumentsPublic)
@@ -100,29 +280,43 @@ def read_pdf_documents(
     current_user: CurrentUser,
     skip: int = 0,
     limit: int = 100,
-) -> PDFDocumentsPublic:
+) -> ORJSONResponse:
     """
     Retrieve PDF documents.
     """
     # Only admins can see all PDFs, regular users see only their own
-    if current_user.is_superuser:
-        statement = select(PDFDocument).offset(skip).limit(limit)
-        count_statement = select(PDFDocument)
+    statement = select(PDFDocument, func.count().over().label("total"))
+    count_statement = select(func.count()).select_from(PDFDocument)
+    if not current_user.is_superuser:
+        statement = statement.where(PDFDocument.owner_id == current_user.id)
+        count_statement = count_statement.where(PDFDocument.owner_id == current_user.id)
+
+    # The page and the total come from one query, a separate count is only
+    # needed when paging past the last document. Ordering by id keeps pages
+    # stable and is served by the primary key or the (owner_id, id) index.
+    statement = (
+        statement.options(raiseload("*"))
+        .order_by(PDFDocument.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    rows = db.exec(statement).all()
+    pdf_documents = [row[0] for row in rows]
+    if rows:
+        total_count = rows[0].total
+    elif skip > 0:
+        total_count = db.exec(count_statement).one()
     else:
-        statement = (
-            select(PDFDocument)
-            .where(PDFDocument.owner_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
-        )
-        count_statement = select(PDFDocument).where(
-            PDFDocument.owner_id == current_user.id
-        )
-
-    pdf_documents = db.exec(statement).all()
-    total_count = len(db.exec(count_statement).all())
-
-    return PDFDocumentsPublic(data=pdf_documents, count=total_count)
+        total_count = 0
+
+    # PDFDocument has exactly the PDFDocumentPublic fields, skip validating
+    # every document against the response model again
+    return ORJSONResponse(
+        {
+            "data": [pdf_document.model_dump() for pdf_document in pdf_documents],
+            "count": total_count,
+        }
+    )
 
 
 @router.get("/{pdf_id}", response_model=PDFDocumentPublic)
@@ -135,8 +329,7 @@ def read_pdf_document(
     """
     Get PDF document by ID.
     """
-    statement = select(PDFDocument).where(PDFDocument.id == pdf_id)
-    pdf_document = db.exec(statement).first()
+    pdf_document = db.get(PDFDocument, pdf_id)
 
     if not pdf_document:
         raise HTTPException(status_code=404, detail="PDF document not found")
@@ -145,7 +338,7 @@ def read_pdf_document(
     if not current_user.is_superuser and pdf_document.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    return PDFDocumentPublic.from_orm(pdf_document)
+    return PDFDocumentPublic.model_validate(pdf_document)
 
 
 @router.put("/{pdf_id}", response_model=PDFDocumentPublic)
@@ -159,8 +352,7 @@ def update_pdf_document(
     """
     Update PDF document.
     """
-    statement = select(PDFDocument).where(PDFDocument.id == pdf_id)
-    pdf_document = db.exec(statement).first()
+    pdf_document = db.get(PDFDocument, pdf_id)
 
     if not pdf_document:
         raise HTTPException(status_code=404, detail="PDF document not found")
@@ -170,15 +362,15 @@ def update_pdf_document(
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
     # Update fields
-    update_data = pdf_document_in.dict(exclude_unset=True)
+    update_data = pdf_document_in.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(pdf_document, field, value)
 
+    pdf_public = PDFDocumentPublic.model_validate(pdf_document)
     db.add(pdf_document)
     db.commit()
-    db.refresh(pdf_document)
 
-    return PDFDocumentPublic.from_orm(pdf_document)
+    return pdf_public
 
 
 @router.get("/{pdf_id}/download")
@@ -187,12 +379,12 @@ def download_pdf_document(
     db: SessionDep,
     current_user: CurrentUser,
     pdf_id: uuid.UUID,
+    request: Request,
 ):
     """
     Download PDF document.
     """
-    statement = select(PDFDocument).where(PDFDocument.id == pdf_id)
-    pdf_document = db.exec(statement).first()
+    pdf_document = db.get(PDFDocument, pdf_id)
 
     if not pdf_document:
         raise HTTPException(status_code=404, detail="PDF document not found")
@@ -201,19 +393,24 @@ def download_pdf_document(
     if not current_user.is_superuser and pdf_document.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    # Check if file exists
-    import os
-
-    if not os.path.exists(pdf_document.filename):
+    # Stat the file once, FileResponse reuses the result for its headers
+    # instead of stat-ing it again, and the body is sent with sendfile where
+    # the server supports it
+    try:
+        stat_result = os.stat(pdf_document.filename)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="PDF file not found")
 
-    # Read file and return as response
-    from fastapi.responses import FileResponse
+    etag = f'W/"{stat_result.st_mtime_ns}-{stat_result.st_size}"'
+    if is_not_modified(request, etag, last_modified=stat_result.st_mtime):
+        return Response(status_code=304, headers={"ETag": etag})
 
     return FileResponse(
         path=pdf_document.filename,
         filename=f"{pdf_document.title}.pdf",
         media_type="application/pdf",
+        stat_result=stat_result,
+        headers={"ETag": etag},
     )
 
 
@@ -227,8 +424,7 @@ def delete_pdf_document(
     """
     Delete PDF document.
     """
-    statement = select(PDFDocument).where(PDFDocument.id == pdf_id)
-    pdf_document = db.exec(statement).first()
+    pdf_document = db.get(PDFDocument, pdf_id)
 
     if not pdf_document:
         raise HTTPException(status_code=404, detail="PDF document not found")
@@ -238,9 +434,6 @@ def delete_pdf_document(
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
     try:
-        import logging
-
-        logger = logging.getLogger(__name__)
         logger.info(f"Starting deletion process for PDF {pdf_id}")
 
         # Delete embeddings from ChromaDB (don't fail if this doesn't work)
@@ -253,8 +446,6 @@ def delete_pdf_document(
             logger.warning(f"Failed to delete embeddings for PDF {pdf_id}: {e}")
 
         # Delete file from storage
-        import os
-
         if os.path.exists(pdf_document.filename):
             try:
                 logger.info(f"Deleting file: {pdf_document.filename}")
@@ -274,13 +465,10 @@ def delete_pdf_document(
 
         return {"message": "PDF document deleted successfully"}
 
-    except Exception as e:
-        # Rollback database changes if there was an error
-        logger.error(f"Error during PDF deletion: {e}")
+    except Exception:
+        # Rollback database changes, the app's exception handler returns the 500
         db.rollback()
-        raise HTTPException(
-            status_code=500, detail=f"Error deleting PDF document: {str(e)}"
-        )
+        raise
 
 
 @router.get("/{pdf_id}/status")
@@ -289,12 +477,13 @@ def get_pdf_processing_status(
     db: SessionDep,
     current_user: CurrentUser,
     pdf_id: uuid.UUID,
+    request: Request,
+    response: Response,
 ) -> dict:
     """
     Get PDF processing status.
     """
-    statement = select(PDFDocument).where(PDFDocument.id == pdf_id)
-    pdf_document = db.exec(statement).first()
+    pdf_document = db.get(PDFDocument, pdf_id)
 
     if not pdf_document:
         raise HTTPException(status_code=404, detail="PDF document not found")
@@ -303,41 +492,84 @@ def get_pdf_processing_status(
     if not current_user.is_superuser and pdf_document.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    return {
-        "id": str(pdf_document.id),
-        "processing_status": pdf_document.processing_status,
-        "is_processed": pdf_document.is_processed,
-        "error_message": pdf_document.error_message,
-        "page_count": pdf_document.page_count,
-    }
+    # Processing bumps updated_at on every status change, pollers whose copy
+    # is current get an empty 304
+    etag = (
+        f'W/"{pdf_document.processing_status}-'
+        f'{pdf_document.updated_at.timestamp()}"'
+    )
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
 
+    return processing_status_payload(pdf_document)
 
-@router.post("/{pdf_id}/reprocess")
-def reprocess_pdf_document(
+
+@router.get("/{pdf_id}/events")
+async def stream_pdf_processing_status(
     *,
     db: SessionDep,
     current_user: CurrentUser,
     pdf_id: uuid.UUID,
-    background_tasks: BackgroundTasks,
+) -> StreamingResponse:
+    """
+    Stream PDF processing status changes as server-sent events, instead of
+    polling the status endpoint. The stream starts with the current status and
+    ends once processing has completed or failed.
+    """
+    pdf_document = await run_in_threadpool(db.get, PDFDocument, pdf_id)
+
+    if not pdf_document:
+        raise HTTPException(status_code=404, detail="PDF document not found")
+
+    # Check permissions
+    if not current_user.is_superuser and pdf_document.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    # The stream can stay open for minutes, it reads statuses in sessions of
+    # its own instead of holding this one's pooled connection
+    await run_in_threadpool(db.close)
+
+    async def events() -> AsyncIterator[bytes]:
+        async with pdf_status_broadcaster.subscribe(pdf_id) as updates:
+            # Read the status only once subscribed so no change is missed
+            status = await run_in_threadpool(pdf_service.get_processing_status, pdf_id)
+            while status is not None:
+                yield f"data: {json.dumps(status)}\n\n".encode()
+                if status["processing_status"] in PDF_FINAL_STATUSES:
+                    return
+                try:
+                    status = await asyncio.wait_for(
+                        updates.get(), STATUS_EVENTS_KEEPALIVE
+                    )
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle stream
+                    yield b": keepalive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "/{pdf_id}/reprocess", dependencies=[Depends(get_current_active_superuser)]
+)
+def reprocess_pdf_document(
+    *,
+    db: SessionDep,
+    pdf_id: uuid.UUID,
 ) -> dict:
     """
     Reprocess PDF document.
     """
-    # Only admins can reprocess PDFs
-    if not current_user.is_superuser:
-        raise HTTPException(
-            status_code=403,
-            detail="Not enough permissions. Only admins can reprocess PDFs.",
-        )
-
-    statement = select(PDFDocument).where(PDFDocument.id == pdf_id)
-    pdf_document = db.exec(statement).first()
+    pdf_document = db.get(PDFDocument, pdf_id)
 
     if not pdf_document:
         raise HTTPException(status_code=404, detail="PDF document not found")
 
-    # Reprocess in background
-    background_tasks.add_task(pdf_service.reprocess_pdf, pdf_document, db)
+    # Reprocess on the processing workers
+    pdf_service.enqueue_processing(pdf_document.id, reprocess=True)
 
     return {
         "message": "PDF reprocessing started",
@@ -346,35 +578,17 @@ def reprocess_pdf_document(
     }
 
 
-@router.get("/chroma/stats")
-def get_chroma_stats(
-    current_user: CurrentUser,
-) -> dict:
+@router.get("/chroma/stats", dependencies=[Depends(get_current_active_superuser)])
+def get_chroma_stats() -> dict:
     """
     Get ChromaDB statistics.
     """
-    # Only admins can view ChromaDB stats
-    if not current_user.is_superuser:
-        raise HTTPException(
-            status_code=403,
-            detail="Not enough permissions. Only admins can view ChromaDB stats.",
-        )
-
     return pdf_service.get_chroma_stats()
 
 
-@router.post("/chroma/compact")
-def compact_chromadb(
-    current_user: CurrentUser,
-) -> dict:
+@router.post("/chroma/compact", dependencies=[Depends(get_current_active_superuser)])
+def compact_chromadb() -> dict:
     """
     Compact ChromaDB collection to reclaim space.
     """
-    # Only admins can compact ChromaDB
-    if not current_user.is_superuser:
-        raise HTTPException(
-            status_code=403,
-            detail="Not enough permissions. Only admins can compact ChromaDB.",
-        )
-
     return pdf_service.compact_chromadb()
@@ -2,6 +2,8 @@ import uuid
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import raiseload
 from sqlmodel import col, delete, func, select
 
 from app import crud
@@ -28,6 +30,9 @@ from app.utils import generate_new_account_email, send_email
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+# Never includes the password hash
+USER_PUBLIC_FIELDS = set(UserPublic.model_fields)
+
 
 @router.get(
     "/",
@@ -42,10 +47,16 @@ def read_users(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
     count_statement = select(func.count()).select_from(User)
     count = session.exec(count_statement).one()
 
-    statement = select(User).offset(skip).limit(limit)
+    # The listing never renders relationships, fail loudly on lazy loads
+    statement = select(User).options(raiseload("*")).offset(skip).limit(limit)
     users = session.exec(statement).all()
 
-    return UsersPublic(data=users, count=count)
+    return ORJSONResponse(
+        {
+            "data": [user.model_dump(include=USER_PUBLIC_FIELDS) for user in users],
+            "count": count,
+        }
+    )
 
 
 @router.post(
@@ -0,0 +1,16 @@
+from datetime import datetime, timezone
+
+
+def utcnow() -> datetime:
+    """
+    The current UTC time as a naive datetime.
+
+    The timestamp columns store naive UTC, this replaces the deprecated
+    datetime.utcnow() without mixing aware values into comparisons with them.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def utc_today_start() -> datetime:
+    """Midnight of the current UTC day, as a naive datetime"""
+    return utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
@@ -38,9 +38,9 @@ class Settings(BaseSettings):
     FRONTEND_HOST: str = "http://localhost:80"
     ENVIRONMENT: Literal["local", "staging", "production"] = "local"
 
-    BACKEND_CORS_ORIGINS: Annotated[list[AnyUrl] | str, BeforeValidator(parse_cors)] = (
-        []
-    )
+    BACKEND_CORS_ORIGINS: Annotated[
+        list[AnyUrl] | str, BeforeValidator(parse_cors)
+    ] = []
 
     @computed_field  # type: ignore[prop-decorator]
     @property
@@ -52,12 +52,30 @@ class Settings(BaseSettings):
         )
 
     PROJECT_NAME: str
+    # Worker threads available to sync path operations and dependencies
+    THREADPOOL_SIZE: int = 100
     SENTRY_DSN: HttpUrl | None = None
     POSTGRES_SERVER: str
     POSTGRES_PORT: int = 5432
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str = ""
     POSTGRES_DB: str = ""
+    # Connections per process, at most POSTGRES_POOL_SIZE +
+    # POSTGRES_MAX_OVERFLOW. Multiplied by the server workers (4 in the
+    # Dockerfile) and plus one status listener each, this must stay below
+    # Postgres's max_connections (100 by default) with room for migrations and
+    # admin sessions: 4 * (10 + 10 + 1) = 84
+    POSTGRES_POOL_SIZE: int = 10
+    POSTGRES_MAX_OVERFLOW: int = 10
+    # Seconds a request waits for a pooled connection before it gets a 503
+    POSTGRES_POOL_TIMEOUT: int = 10
+    # Seconds before a pooled connection is replaced
+    POSTGRES_POOL_RECYCLE: int = 1800
+    # Executions of a query before psycopg prepares it server side
+    POSTGRES_PREPARE_THRESHOLD: int = 2
+    # Create missing tables with SQLModel.metadata.create_all on startup, the
+    # migrations do not build the base schema so this stays on by default
+    INIT_DB_CREATE_ALL: bool = True
 
     @computed_field  # type: ignore[prop-decorator]
     @property
@@ -99,11 +117,60 @@ class Settings(BaseSettings):
 
     # OpenAI Configuration
     OPENAI_API_KEY: str | None = None
+    # Model used to embed PDF chunks and queries. A text-embedding-3 model can
+    # return shortened vectors with OPENAI_EMBEDDING_DIMENSIONS, which shrinks
+    # the vector store by the same factor. Changing either requires
+    # re-embedding the PDFs
+    OPENAI_EMBEDDING_MODEL: str = "text-embedding-ada-002"
+    OPENAI_EMBEDDING_DIMENSIONS: int | None = None
 
     # Chat Configuration
     CHAT_CONTEXT_WINDOW_SIZE: int = 3  # Number of messages to keep in context
     CHAT_MEMORY_K: int = 3  # LangChain memory parameter
     CHAT_SUMMARY_THRESHOLD: int = 5  # When to start summarizing
+    # Reuse AI responses for an identical conversation state and prompt
+    CHAT_RESPONSE_CACHE_SIZE: int = 1024
+    CHAT_RESPONSE_CACHE_TTL: int = 60 * 60 * 24
+    # Query embeddings reused for repeated questions in PDF retrieval
+    CHAT_EMBEDDING_CACHE_SIZE: int = 1024
+    CHAT_EMBEDDING_CACHE_TTL: int = 60 * 60 * 24
+    # Conversation histories kept in memory, evicted ones are reloaded from
+    # the stored summary and latest messages on their next turn
+    CHAT_MEMORY_CACHE_SIZE: int = 1024
+    CHAT_MEMORY_CACHE_TTL: int = 60 * 60
+    # Threads retrieving PDF context while send_message does its other work
+    CHAT_RETRIEVAL_WORKERS: int = 16
+    # Threads generating conversation summaries off the chat request path
+    CHAT_SUMMARY_WORKERS: int = 4
+    # Moderation results reused for identical texts, such as cached AI replies
+    CONTENT_FILTER_CACHE_SIZE: int = 16384
+    CONTENT_FILTER_CACHE_TTL: int = 60 * 60 * 24
+    # Moderation requests one streamed AI response may have in flight
+    CONTENT_FILTER_STREAM_CONCURRENCY: int = 4
+    # Seconds the content filter statistics are served from memory
+    CONTENT_FILTER_STATISTICS_CACHE_TTL: int = 30
+    # Tries of a rate limited moderation request, backing off in between
+    CONTENT_FILTER_MAX_ATTEMPTS: int = 4
+    # Active feature flags are read on every chat turn, changes made through
+    # another worker process show up after at most this many seconds
+    FEATURE_FLAG_CACHE_TTL: int = 60
+    # PDF parsing and embedding run on their own worker threads, outside the
+    # threadpool that serves requests
+    PDF_PROCESSING_WORKERS: int = 2
+    # Embedding requests in flight while PDFs are processed, shared by all
+    # processing workers
+    PDF_EMBEDDING_WORKERS: int = 4
+    # Chunked uploads not finalized within this many seconds are abandoned,
+    # their documents and partial files are removed
+    PDF_UPLOAD_EXPIRE_SECONDS: int = 60 * 60 * 24
+    # Relax fsync and enlarge the page cache of the Chroma SQLite connections
+    # used for PDF ingest, faster inserts at the cost of durability against
+    # power loss
+    CHROMA_FAST_INGEST: bool = False
+    # A Chroma server shared by all workers, the vector store is opened from
+    # the local persist directory when no host is set
+    CHROMA_HOST: str | None = None
+    CHROMA_PORT: int = 8000
 
     def _check_default_secret(self, var_name: str, value: str | None) -> None:
         if value == "changethis":
@@ -1,11 +1,30 @@
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
 from sqlmodel import Session, create_engine, select
 
 from app import crud
 from app.core.config import settings
 from app.models import User, UserCreate
-from app.services.feature_flag_service import FeatureFlagService
+from app.services.feature_flag_service import feature_flag_service
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+engine = create_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    pool_size=settings.POSTGRES_POOL_SIZE,
+    max_overflow=settings.POSTGRES_MAX_OVERFLOW,
+    pool_timeout=settings.POSTGRES_POOL_TIMEOUT,
+    # Recover from connections Postgres closed while they sat idle in the pool
+    pool_pre_ping=True,
+    pool_recycle=settings.POSTGRES_POOL_RECYCLE,
+    # Reuse the most recently returned connection so idle ones can be recycled
+    # and busy ones keep their prepared statements warm
+    pool_use_lifo=True,
+    connect_args={"prepare_threshold": settings.POSTGRES_PREPARE_THRESHOLD},
+)
+
+# Sessions for requests and background work. Every column default is generated
+# client side, so objects keep their loaded state across commits instead of
+# being reloaded on the next access
+SessionLocal = sessionmaker(engine, class_=Session, expire_on_commit=False)
 
 
 # make sure all SQLModel models are imported (app.models) before initializing DB
@@ -13,14 +32,35 @@ engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
 # for more details: https://github.com/fastapi/full-stack-fastapi-template/issues/28
 
 
+# Serializes init_db across containers starting at the same time
+INIT_DB_LOCK_KEY = 0x536F756C  # "Soul"
+
+
 def init_db(session: Session) -> None:
-    # Tables should be created with Alembic migrations
-    # But if you don't want to use migrations, create
-    # the tables un-commenting the next lines
-    from sqlmodel import SQLModel
+    # Hold the lock on a connection of its own, the session commits and hands
+    # its connection back to the pool along the way
+    with engine.connect() as lock_connection:
+        lock_connection.execute(
+            text("SELECT pg_advisory_lock(:key)"), {"key": INIT_DB_LOCK_KEY}
+        )
+        try:
+            _init_db(session)
+        finally:
+            lock_connection.execute(
+                text("SELECT pg_advisory_unlock(:key)"), {"key": INIT_DB_LOCK_KEY}
+            )
+            lock_connection.commit()
 
-    # This works because the models are already imported and registered from app.models
-    SQLModel.metadata.create_all(engine)
+
+def _init_db(session: Session) -> None:
+    # Deployments that only create the schema through Alembic migrations set
+    # INIT_DB_CREATE_ALL=False and skip reflecting every table here
+    if settings.INIT_DB_CREATE_ALL:
+        from sqlmodel import SQLModel
+
+        # This works because the models are already imported and registered
+        # from app.models
+        SQLModel.metadata.create_all(engine)
 
     user = session.exec(
         select(User).where(User.email == settings.FIRST_SUPERUSER)
@@ -33,9 +73,6 @@ def init_db(session: Session) -> None:
         )
         user = crud.create_user(session=session, user_create=user_in)
 
-    # Initialize predefined feature flags if table is empty
-    from app.models import FeatureFlag
-
-    flag_count = session.exec(select(FeatureFlag)).first()
-    if not flag_count:
-        FeatureFlagService().initialize_predefined_flags(session)
+    # Initialize predefined feature flags, a single upsert that leaves flags
+    # which are already up to date untouched
+    feature_flag_service.initialize_predefined_flags(session)
@@ -0,0 +1,51 @@
+import os
+import threading
+import time
+import uuid
+
+# Random bytes are read from the OS in blocks and handed out in slices, one
+# getrandom call serves hundreds of ids instead of one each
+_RANDOM_POOL_SIZE = 4096
+
+
+class _RandomPool(threading.local):
+    def __init__(self) -> None:
+        self.buffer = b""
+        self.position = 0
+
+
+_random_pool = _RandomPool()
+
+
+def _reset_random_pool() -> None:
+    # A forked worker must not hand out the bytes its parent already used
+    global _random_pool
+    _random_pool = _RandomPool()
+
+
+os.register_at_fork(after_in_child=_reset_random_pool)
+
+
+def _random_bytes(size: int) -> bytes:
+    pool = _random_pool
+    if pool.position + size > len(pool.buffer):
+        pool.buffer = os.urandom(_RANDOM_POOL_SIZE)
+        pool.position = 0
+    start = pool.position
+    pool.position += size
+    return pool.buffer[start : pool.position]
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Generate a time-ordered UUID (version 7, RFC 9562).
+
+    The leading 48 bits are the Unix timestamp in milliseconds, so new rows
+    land at the right edge of primary key indexes instead of random pages.
+    """
+    timestamp_ms = time.time_ns() // 1_000_000
+    value = (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80
+    value |= int.from_bytes(_random_bytes(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return uuid.UUID(int=value)
@@ -0,0 +1,21 @@
+import base64
+import uuid
+from datetime import datetime
+
+# Keyset pagination position, the sort timestamp and id of the last row seen
+Cursor = tuple[datetime, uuid.UUID]
+
+
+def encode_cursor(timestamp: datetime, row_id: uuid.UUID) -> str:
+    """Encode a keyset pagination position as an opaque cursor"""
+    raw = f"{timestamp.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Decode a cursor made by encode_cursor, raising ValueError if it is invalid"""
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor).decode().split("|")
+        return datetime.fromisoformat(timestamp), uuid.UUID(row_id)
+    except ValueError as e:
+        raise ValueError("Invalid cursor") from e
@@ -31,6 +31,14 @@ You have access to the user's document collection through a vector database. Whe
 
 IMPORTANT: Always cite your sources when using information from documents."""
 
+# The user's question with the retrieved PDF context, filled in with str.format
+PDF_CONTEXT_QUERY_TEMPLATE = """Context from your documents:
+{pdf_context}
+
+User question: {query}
+
+Please search the provided context and cite specific passages when answering."""
+
 # =============================================================================
 # CONVERSATION SUMMARY PROMPTS
 # =============================================================================
@@ -57,6 +65,18 @@ FEATURE_FLAG_INSTRUCTIONS = """Instructions:
 3. For specific requests that don't relate to any active features above, respond with: 'I apologize, but this feature is not currently available. These are the requests I can help you with:' and then list the active feature titles as a markdown list.
 4. Always maintain a spiritual, supportive tone in your responses."""
 
+FEATURE_FLAG_UNAVAILABLE_INSTRUCTIONS = "If a user's request is not available, respond with the unavailable message and then append this list of available features:"
+
+# Static parts of the feature flags prompt, built once at import
+_FEATURE_FLAG_PROMPT_PREFIX = FEATURE_FLAG_ACTIVE_HEADER + "\n"
+_FEATURE_FLAG_PROMPT_SUFFIX = (
+    "\n\n"
+    + FEATURE_FLAG_INSTRUCTIONS
+    + "\n\n"
+    + FEATURE_FLAG_UNAVAILABLE_INSTRUCTIONS
+    + "\n"
+)
+
 # =============================================================================
 # CONTENT FILTERING MESSAGES
 # =============================================================================
@@ -91,17 +111,10 @@ def format_feature_flags_prompt(active_flags: list) -> str:
     if not active_flags:
         return ""
 
-    prompt_parts = [FEATURE_FLAG_ACTIVE_HEADER]
-
-    for flag in active_flags:
-        prompt_parts.append(f"- {flag.name}: {flag.description}")
-
-    prompt_parts.append("")
-    prompt_parts.append(FEATURE_FLAG_INSTRUCTIONS)
-    prompt_parts.append("")
-    prompt_parts.append(
-        "If a user's request is not available, respond with the unavailable message and then append this list of available features:"
+    descriptions = "\n".join(
+        f"- {flag.name}: {flag.description}" for flag in active_flags
+    )
+    names = "\n".join(f"- {flag.name}" for flag in active_flags)
+    return (
+        _FEATURE_FLAG_PROMPT_PREFIX + descriptions + _FEATURE_FLAG_PROMPT_SUFFIX + names
     )
-    prompt_parts.append("\n".join([f"- {flag.name}" for flag in active_flags]))
-
-    return "\n".join(prompt_parts)
@@ -0,0 +1,23 @@
+import chromadb
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+
+
+def open_chroma(embedding_function: Embeddings, persist_directory: str) -> Chroma:
+    """Open the PDF vector store, on the shared Chroma server if CHROMA_HOST is
+    set and in persist_directory otherwise"""
+    if settings.CHROMA_HOST:
+        # Every worker process talks to the one server, instead of each one
+        # loading the index and queueing on the SQLite file lock
+        return Chroma(
+            client=chromadb.HttpClient(
+                host=settings.CHROMA_HOST, port=settings.CHROMA_PORT
+            ),
+            embedding_function=embedding_function,
+        )
+    return Chroma(
+        persist_directory=persist_directory,
+        embedding_function=embedding_function,
+    )
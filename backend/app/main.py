@@ -1,10 +1,25 @@
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import anyio
 import sentry_sdk
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
 from fastapi.routing import APIRoute
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.main import api_router
 from app.core.config import settings
+from app.core.logging import start_queue_logging, stop_queue_logging
+from app.services.chat_service import chat_service
+from app.services.content_filter_service import content_filter_service
+from app.services.pdf_service import pdf_service
+from app.services.pdf_status_service import pdf_status_broadcaster
+
+logger = logging.getLogger(__name__)
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -14,8 +29,29 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
     sentry_sdk.init(dsn=str(settings.SENTRY_DSN), enable_tracing=True)
 
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    # Sync routes run in anyio's worker threads, the default of 40 caps
+    # concurrent chat requests well below what the database can serve
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = settings.THREADPOOL_SIZE
+    log_listener = start_queue_logging()
+    try:
+        yield
+    finally:
+        await pdf_status_broadcaster.stop()
+        pdf_service.shutdown()
+        chat_service.shutdown()
+        await content_filter_service.aclose()
+        stop_queue_logging(log_listener)
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
+    lifespan=lifespan,
+    # orjson encodes UUIDs and datetimes natively instead of through jsonable_encoder
+    default_response_class=ORJSONResponse,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
 )
@@ -30,4 +66,34 @@ if settings.all_cors_origins:
         allow_headers=["*"],
     )
 
+
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(
+    request: Request, exc: Exception
+) -> ORJSONResponse:
+    # Routes only handle the errors they map to a status code, anything else
+    # ends up here without exposing its message to the client
+    logger.error(
+        f"Unhandled error on {request.method} {request.url.path}", exc_info=exc
+    )
+    return ORJSONResponse(status_code=500, content={"detail": "Internal server error"})
+
+
+@app.exception_handler(PoolTimeoutError)
+@app.exception_handler(OperationalError)
+async def database_unavailable_handler(
+    request: Request, exc: Exception
+) -> ORJSONResponse:
+    # An exhausted connection pool or a lost database connection is transient,
+    # tell clients to retry instead of reporting a server bug
+    logger.warning(
+        f"Database unavailable on {request.method} {request.url.path}: {exc}"
+    )
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": "Service temporarily unavailable"},
+        headers={"Retry-After": "1"},
+    )
+
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -2,10 +2,50 @@ import uuid
 from datetime import datetime
 from typing import Dict, Any
 
-from pydantic import EmailStr
+from pydantic import ConfigDict, EmailStr
 from sqlmodel import Field, Relationship, SQLModel
+from sqlalchemy import Index, LargeBinary, SmallInteger, TypeDecorator, text
 from sqlalchemy import JSON as SQLJSON
 
+from app.core.ids import uuid7
+
+
+class CodedString(TypeDecorator):
+    """
+    A string from a fixed set of values, stored as its SMALLINT position.
+
+    Rows of high-volume tables stay narrow while the API keeps using the
+    strings. Only ever append values, the position is what is stored.
+    """
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, values: tuple[str, ...]) -> None:
+        super().__init__()
+        self.values = values
+        self._codes = {value: code for code, value in enumerate(values)}
+
+    def process_bind_param(self, value: str | None, dialect: Any) -> int | None:
+        if value is None:
+            return None
+        try:
+            return self._codes[value]
+        except KeyError:
+            raise ValueError(
+                f"Unknown value {value!r}, expected one of {self.values}"
+            ) from None
+
+    def process_result_value(self, value: int | None, dialect: Any) -> str | None:
+        if value is None:
+            return None
+        return self.values[value]
+
+
+# Stored codes, see CodedString. "ai" marks the canned replies to blocked content
+CHAT_MESSAGE_ROLES = ("user", "assistant", "ai")
+CONTENT_FILTER_CONTENT_TYPES = ("user_input", "ai_response")
+
 
 # Shared properties
 class UserBase(SQLModel):
@@ -57,6 +97,8 @@ class User(UserBase, table=True):
 
 # Properties to return via API, id is always required
 class UserPublic(UserBase):
+    model_config = ConfigDict(frozen=True)
+
     id: uuid.UUID
 
 
@@ -92,6 +134,8 @@ class Item(ItemBase, table=True):
 
 # Properties to return via API, id is always required
 class ItemPublic(ItemBase):
+    model_config = ConfigDict(frozen=True)
+
     id: uuid.UUID
     owner_id: uuid.UUID
 
@@ -146,6 +190,9 @@ class PDFDocumentUpdate(SQLModel):
 
 
 class PDFDocument(PDFDocumentBase, table=True):
+    # Backs the per-user listing in id order and its count
+    __table_args__ = (Index("ix_pdfdocument_owner_id_id", "owner_id", "id"),)
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     owner_id: uuid.UUID = Field(
         foreign_key="user.id", nullable=False, ondelete="CASCADE"
@@ -156,6 +203,8 @@ class PDFDocument(PDFDocumentBase, table=True):
 
 
 class PDFDocumentPublic(PDFDocumentBase):
+    model_config = ConfigDict(frozen=True)
+
     id: uuid.UUID
     owner_id: uuid.UUID
     created_at: datetime
@@ -182,13 +231,20 @@ class ChatSessionUpdate(SQLModel):
 
 
 class ChatSession(ChatSessionBase, table=True):
-    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    # Backs the per-user listing ordered by updated_at (scanned backwards)
+    __table_args__ = (
+        Index("ix_chatsession_owner_updated_id", "owner_id", "updated_at", "id"),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid7, primary_key=True)
     owner_id: uuid.UUID = Field(
         foreign_key="user.id", nullable=False, ondelete="CASCADE"
     )
     owner: User | None = Relationship(back_populates="chat_sessions")
+    # Messages are removed by the ON DELETE CASCADE foreign key, deleting a
+    # session does not load them first
     messages: list["ChatMessage"] = Relationship(
-        back_populates="session", cascade_delete=True
+        back_populates="session", cascade_delete=True, passive_deletes=True
     )
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -204,6 +260,8 @@ class ChatSession(ChatSessionBase, table=True):
 
 
 class ChatSessionPublic(ChatSessionBase):
+    model_config = ConfigDict(frozen=True)
+
     id: uuid.UUID
     owner_id: uuid.UUID
     created_at: datetime
@@ -214,7 +272,11 @@ class ChatSessionPublic(ChatSessionBase):
 
 class ChatSessionsPublic(SQLModel):
     data: list[ChatSessionPublic]
-    count: int
+    # Only computed when requested with include_count
+    count: int | None = None
+    has_more: bool = False
+    # Pass as `after` to get the next page, None on the last page
+    next_cursor: str | None = None
 
 
 class ChatMessageBase(SQLModel):
@@ -228,15 +290,22 @@ class ChatMessageCreate(SQLModel):
 
 
 class ChatMessage(ChatMessageBase, table=True):
-    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    __table_args__ = (
+        Index("ix_chatmessage_session_created_id", "session_id", "created_at", "id"),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid7, primary_key=True)
     session_id: uuid.UUID = Field(
         foreign_key="chatsession.id", nullable=False, ondelete="CASCADE"
     )
     session: ChatSession | None = Relationship(back_populates="messages")
+    role: str = Field(sa_type=CodedString(CHAT_MESSAGE_ROLES), nullable=False)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 class ChatMessagePublic(ChatMessageBase):
+    model_config = ConfigDict(frozen=True)
+
     id: uuid.UUID
     session_id: uuid.UUID
     created_at: datetime
@@ -244,7 +313,17 @@ class ChatMessagePublic(ChatMessageBase):
 
 class ChatMessagesPublic(SQLModel):
     data: list[ChatMessagePublic]
-    count: int
+    # Only computed when requested with include_count
+    count: int | None = None
+    has_more: bool = False
+    # Pass as `after` to get the next page, None on the last page
+    next_cursor: str | None = None
+
+
+class ChatMessagesHeadPublic(SQLModel):
+    data: list[ChatMessagePublic]
+    # Pass as `before` to get the previous page, None on the oldest page
+    next_cursor: str | None = None
 
 
 # Content Filter Models
@@ -255,17 +334,33 @@ class ContentFilterLogBase(SQLModel):
 
 
 class ContentFilterLog(ContentFilterLogBase, table=True):
-    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    # Backs the admin audit view of a user's violations, newest first, the
+    # user ID prefix search of the same view and its unfiltered pages
+    __table_args__ = (
+        Index("ix_contentfilterlog_user_created", "user_id", "created_at"),
+        Index("ix_contentfilterlog_created_id", "created_at", "id"),
+        Index(
+            "ix_contentfilterlog_user_id_text",
+            text("(user_id::text) text_pattern_ops"),
+        ),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid7, primary_key=True)
     user_id: uuid.UUID = Field(
         foreign_key="user.id", nullable=False, ondelete="CASCADE"
     )
     session_id: uuid.UUID = Field(
         foreign_key="chatsession.id", nullable=True, ondelete="CASCADE"
     )
+    content_type: str = Field(
+        sa_type=CodedString(CONTENT_FILTER_CONTENT_TYPES), nullable=False
+    )
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 class ContentFilterLogPublic(ContentFilterLogBase):
+    model_config = ConfigDict(frozen=True)
+
     id: uuid.UUID
     user_id: uuid.UUID
     session_id: uuid.UUID | None
@@ -275,6 +370,9 @@ class ContentFilterLogPublic(ContentFilterLogBase):
 class ContentFilterLogsPublic(SQLModel):
     data: list[ContentFilterLogPublic]
     count: int
+    has_more: bool = False
+    # Pass as `after` to get the next page, None on the last page
+    next_cursor: str | None = None
 
 
 # Feature Flag Models
@@ -302,6 +400,8 @@ class FeatureFlag(FeatureFlagBase, table=True):
 
 
 class FeatureFlagPublic(FeatureFlagBase):
+    model_config = ConfigDict(frozen=True)
+
     id: uuid.UUID
     created_at: datetime
     updated_at: datetime
@@ -310,3 +410,15 @@ class FeatureFlagPublic(FeatureFlagBase):
 class FeatureFlagsPublic(SQLModel):
     data: list[FeatureFlagPublic]
     count: int
+
+
+# Query embeddings persisted across restarts, keyed by the SHA-256 of the
+# embedding model and the query text
+class EmbeddingCache(SQLModel, table=True):
+    hash: str = Field(primary_key=True, max_length=64)
+    model: str = Field(max_length=100)
+    dimensions: int
+    # Little-endian float16 components, half the size of float32 and well
+    # within the precision similarity search needs
+    vector: bytes = Field(sa_type=LargeBinary)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
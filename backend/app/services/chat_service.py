@@ -1,28 +1,54 @@
-import os
+import asyncio
 import uuid
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Any, Optional, Sequence
+from datetime import datetime
+import orjson
+from fastapi import BackgroundTasks
+from starlette.concurrency import run_in_threadpool
 from langchain_openai import ChatOpenAI
 from langchain.prompts import (
     SystemMessagePromptTemplate,
     HumanMessagePromptTemplate,
-    MessagesPlaceholder,
     ChatPromptTemplate,
 )
-from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_core.chat_history import InMemoryChatMessageHistory
 from pydantic import BaseModel, Field
 from langchain_core.chat_history import BaseChatMessageHistory
-from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+)
+from langchain_core.documents import Document
 from langchain_chroma import Chroma
 from langchain_openai import OpenAIEmbeddings
-from langchain.memory import ConversationSummaryBufferMemory
-from sqlmodel import Session, select
-from app.models import ChatSession, ChatMessage, User
+from sqlalchemy import (
+    String,
+    bindparam,
+    case,
+    cast,
+    delete,
+    exists,
+    insert,
+    text,
+    true,
+    tuple_,
+    update,
+)
+from sqlalchemy.orm import raiseload
+from sqlmodel import Session, func, select
+from app.models import ChatSession, ChatMessage, ContentFilterLog
+from app.core.cache import TTLCache
 from app.core.config import settings
-from app.core.db import engine
+from app.core.db import SessionLocal
+from app.core.pagination import Cursor
+from app.core.vectorstore import open_chroma
 from app.services.content_filter_service import content_filter_service
+from app.services.embedding_cache_service import embedding_cache_service
 from app.services.feature_flag_service import feature_flag_service
 from app.core.prompts import (
     CHAT_SYSTEM_PROMPT,
@@ -30,13 +56,53 @@ from app.core.prompts import (
     CONVERSATION_SUMMARY_HUMAN_PROMPT,
     BLOCKED_CONTENT_MESSAGE,
     AI_RESPONSE_BLOCKED_MESSAGE,
-    BLOCKED_SESSION_DELETE_ERROR,
+    PDF_CONTEXT_QUERY_TEMPLATE,
 )
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
 
+class ChatSessionNotFoundError(ValueError):
+    """Raised when a chat session does not exist or is not owned by the user"""
+
+
+# Checks ownership and the blocked flag in the same round trip as the insert
+_insert_user_message_statement = text(
+    "INSERT INTO chatmessage (id, session_id, content, role, created_at) "
+    "SELECT :id, id, :content, :role, :created_at FROM chatsession "
+    "WHERE id = :session_id AND owner_id = :user_id AND NOT is_blocked "
+    "RETURNING id"
+).bindparams(bindparam("role", type_=ChatMessage.__table__.c.role.type))
+
+
+# Built once at import and shared by every chat service and history. The chat
+# system prompt has no template variables, so it is sent as a ready-made message
+_chat_system_message = SystemMessage(content=CHAT_SYSTEM_PROMPT)
+_summary_prompt = ChatPromptTemplate.from_messages(
+    [
+        SystemMessagePromptTemplate.from_template(CONVERSATION_SUMMARY_SYSTEM_PROMPT),
+        HumanMessagePromptTemplate.from_template(CONVERSATION_SUMMARY_HUMAN_PROMPT),
+    ]
+)
+
+
+# The PDF context is built from the closest limit * this many chunks, grouped by
+# PDF, with up to _PDF_CONTEXT_CHUNKS_PER_PDF chunks kept for each of the best
+# `limit` PDFs
+_PDF_CONTEXT_CANDIDATES_PER_RESULT = 2
+_PDF_CONTEXT_CHUNKS_PER_PDF = 2
+_PDF_CONTEXT_CHUNK_LENGTH = 500
+
+
+# LangChain message class for each stored role, any other role is the AI's
+_message_classes: dict[str, type[BaseMessage]] = {
+    "user": HumanMessage,
+    "assistant": AIMessage,
+    "ai": AIMessage,
+}
+
+
 class ConversationSummaryBufferMessageHistory(BaseChatMessageHistory, BaseModel):
     """Custom message history that implements ConversationSummaryBufferMemory with database persistence"""
 
@@ -46,7 +112,12 @@ class ConversationSummaryBufferMessageHistory(BaseChatMessageHistory, BaseModel)
     session_id: str = Field(default="")
 
     def __init__(
-        self, session_id: str, db_session: Session, llm: ChatOpenAI, k: int = 6
+        self,
+        session_id: str,
+        db_session: Session,
+        llm: ChatOpenAI,
+        k: int = 6,
+        summary_executor: Executor | None = None,
     ):
         super().__init__()
         self.session_id = session_id
@@ -55,146 +126,211 @@ class ConversationSummaryBufferMessageHistory(BaseChatMessageHistory, BaseModel)
         self.k = k
         self.messages = []
 
+        # Summaries are generated on summary_executor when given, off the
+        # request that added the messages. Messages trimmed from the window wait
+        # in _pending_old_messages and are summarized in order, one run at a time
+        self._summary_executor = summary_executor
+        self._lock = threading.Lock()
+        self._pending_old_messages: list[BaseMessage] = []
+        self._summarizing = False
+
         # Load existing summary and messages from database
         self._load_from_database()
 
     def _get_db_session(self) -> Session:
         """Get database session, creating a new one if needed"""
         if not hasattr(self, "_db_session") or self._db_session is None:
-            self._db_session = Session(engine)
+            self._db_session = SessionLocal()
         return self._db_session
 
     def _load_from_database(self):
         """Load existing summary and messages from database"""
         try:
-            session = self._get_db_session().get(ChatSession, self.session_id)
-            if not session:
-                return
-
-            # Load existing summary if available
-            if session.conversation_summary:
-                self.messages.append(
-                    SystemMessage(content=session.conversation_summary)
+            # The summary and the recent messages in one round trip. Only the
+            # columns the history is built from are read, and the lateral
+            # subquery walks ix_chatmessage_session_created_id backwards, so
+            # the last k messages come off the index without a sort
+            recent = (
+                select(
+                    ChatMessage.role,
+                    ChatMessage.content,
+                    ChatMessage.created_at,
+                    ChatMessage.id,
                 )
-                logger.info(f"Loaded existing summary for session {self.session_id}")
-
-            # Load recent messages
-            recent_messages = (
+                .where(ChatMessage.session_id == ChatSession.id)
+                .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+                .limit(self.k)
+                .lateral("recent")
+            )
+            rows = (
                 self._get_db_session()
                 .exec(
-                    select(ChatMessage)
-                    .where(ChatMessage.session_id == self.session_id)
-                    .order_by(ChatMessage.created_at.desc())
-                    .limit(self.k)
+                    select(
+                        ChatSession.conversation_summary,
+                        recent.c.role,
+                        recent.c.content,
+                    )
+                    .select_from(ChatSession)
+                    .outerjoin(recent, true())
+                    .where(ChatSession.id == self.session_id)
+                    .order_by(recent.c.created_at.desc(), recent.c.id.desc())
                 )
                 .all()
             )
+            if not rows:
+                return
 
-            # Add messages in chronological order
-            for msg in reversed(recent_messages):
-                if msg.role == "user":
-                    from langchain_core.messages import HumanMessage
+            # Load existing summary if available
+            summary = rows[0].conversation_summary
+            if summary:
+                self.messages.append(SystemMessage(content=summary))
+                logger.info("Loaded existing summary for session %s", self.session_id)
 
-                    self.messages.append(HumanMessage(content=msg.content))
-                else:
-                    from langchain_core.messages import AIMessage
+            # A session without messages comes back as a single row of NULLs
+            recent_messages = [row for row in rows if row.role is not None]
 
-                    self.messages.append(AIMessage(content=msg.content))
+            # Add messages in chronological order
+            self.messages.extend(
+                _message_classes.get(msg.role, AIMessage)(content=msg.content)
+                for msg in recent_messages[::-1]
+            )
 
             logger.info(
-                f"Loaded {len(recent_messages)} recent messages for session {self.session_id}"
+                "Loaded %s recent messages for session %s",
+                len(recent_messages),
+                self.session_id,
             )
         except Exception as e:
-            logger.error(f"Error loading from database: {e}")
+            logger.error("Error loading from database: %s", e)
 
     def add_messages(self, messages: list[BaseMessage]) -> None:
         """Add messages to the history, implementing ConversationSummaryBufferMemory logic"""
         try:
-            existing_summary: SystemMessage | None = None
-            old_messages: list[BaseMessage] | None = None
-
-            # Check if we already have a summary message
-            if len(self.messages) > 0 and isinstance(self.messages[0], SystemMessage):
-                logger.info("Found existing summary")
-                existing_summary = self.messages.pop(0)
+            with self._lock:
+                # Add the new messages to the history
+                self.messages.extend(messages)
+
+                # Check if we have too many messages, not counting the summary
+                offset = 1 if self._get_summary_message() is not None else 0
+                excess = len(self.messages) - offset - self.k
+                if excess <= 0:
+                    # The common case, nothing leaves the window
+                    logger.debug("No old messages to update summary with")
+                    return
 
-            # Add the new messages to the history
-            self.messages.extend(messages)
-
-            # Check if we have too many messages
-            if len(self.messages) > self.k:
                 logger.info(
-                    f"Found {len(self.messages)} messages, dropping oldest {len(self.messages) - self.k} messages"
+                    "Found %s messages, dropping oldest %s messages",
+                    len(self.messages) - offset,
+                    excess,
                 )
-                # Pull out the oldest messages...
-                old_messages = self.messages[: len(self.messages) - self.k]
-                # ...and keep only the most recent messages
-                self.messages = self.messages[-self.k :]
+                # Pull out the oldest messages, the window shrinks right away
+                # even if the summary is generated later
+                old_messages = slice(offset, offset + excess)
+                self._pending_old_messages.extend(self.messages[old_messages])
+                del self.messages[old_messages]
+                if self._summarizing:
+                    # The running summarization picks these up when it is done
+                    return
+                self._summarizing = True
+
+            if self._summary_executor is None:
+                self._summarize_pending()
+            else:
+                try:
+                    self._summary_executor.submit(self._summarize_pending)
+                except RuntimeError:
+                    # The executor is shut down, leave the messages pending
+                    # for the next add_messages instead of blocking it forever
+                    with self._lock:
+                        self._summarizing = False
+                    raise
 
-            if old_messages is None:
-                logger.info("No old messages to update summary with")
-                return
+        except Exception as e:
+            logger.error("Error in add_messages: %s", e)
+
+    def _get_summary_message(self) -> SystemMessage | None:
+        if self.messages and isinstance(self.messages[0], SystemMessage):
+            return self.messages[0]
+        return None
+
+    def _summarize_pending(self) -> None:
+        """Fold the messages trimmed from the window into the summary until none
+        are left"""
+        while True:
+            with self._lock:
+                if not self._pending_old_messages:
+                    self._summarizing = False
+                    return
+                old_messages = self._pending_old_messages
+                self._pending_old_messages = []
+                existing_summary = self._get_summary_message()
 
-            # Construct the summary chat messages
-            summary_prompt = ChatPromptTemplate.from_messages(
-                [
-                    SystemMessagePromptTemplate.from_template(
-                        CONVERSATION_SUMMARY_SYSTEM_PROMPT
-                    ),
-                    HumanMessagePromptTemplate.from_template(
-                        CONVERSATION_SUMMARY_HUMAN_PROMPT
-                    ),
-                ]
-            )
-
-            # Format the messages and invoke the LLM
-            new_summary = self.llm.invoke(
-                summary_prompt.format_messages(
-                    existing_summary=(
-                        existing_summary.content
-                        if existing_summary
-                        else "No previous summary"
-                    ),
-                    old_messages=old_messages,
+            try:
+                # Format the summary chat messages and invoke the LLM
+                new_summary = self.llm.invoke(
+                    _summary_prompt.format_messages(
+                        existing_summary=(
+                            existing_summary.content
+                            if existing_summary
+                            else "No previous summary"
+                        ),
+                        old_messages=old_messages,
+                    )
                 )
-            )
-            logger.info(f"Generated new summary: {new_summary.content[:100]}...")
-
-            # Save summary to database
-            self._save_summary_to_database(new_summary.content)
+                logger.info("Generated new summary: %s...", new_summary.content[:100])
 
-            # Prepend the new summary to the history
-            self.messages = [SystemMessage(content=new_summary.content)] + self.messages
+                # Save summary to database
+                self._save_summary_to_database(new_summary.content)
+            except Exception as e:
+                logger.error("Error generating summary: %s", e)
+                with self._lock:
+                    self._summarizing = False
+                return
 
-        except Exception as e:
-            logger.error(f"Error in add_messages: {e}")
+            # Put the new summary at the front of the history
+            with self._lock:
+                summary_message = SystemMessage(content=new_summary.content)
+                if self._get_summary_message() is not None:
+                    self.messages[0] = summary_message
+                else:
+                    self.messages.insert(0, summary_message)
 
     def _save_summary_to_database(self, summary: str):
-        """Save summary to database"""
+        """Save summary to database, in its own database session as it may run
+        after the request that triggered it has finished"""
         try:
-            session = self._get_db_session().get(ChatSession, self.session_id)
-            if session:
-                session.conversation_summary = summary
-                session.summary_updated_at = datetime.utcnow()
-
-                # Get the latest message ID
-                latest_message = (
-                    self._get_db_session()
-                    .exec(
-                        select(ChatMessage)
-                        .where(ChatMessage.session_id == self.session_id)
-                        .order_by(ChatMessage.created_at.desc())
+            # The latest message ID, read off the (session_id, created_at, id)
+            # index inside the UPDATE instead of loading the session and
+            # sorting its messages first
+            latest_message_id = (
+                select(cast(ChatMessage.id, String))
+                .where(ChatMessage.session_id == self.session_id)
+                .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+                .limit(1)
+                .scalar_subquery()
+            )
+            with SessionLocal() as db:
+                db.execute(
+                    update(ChatSession)
+                    .where(ChatSession.id == self.session_id)
+                    .values(
+                        conversation_summary=summary,
+                        summary_updated_at=datetime.utcnow(),
+                        last_summary_message_id=func.coalesce(
+                            latest_message_id, ChatSession.last_summary_message_id
+                        ),
                     )
-                    .first()
                 )
-
-                if latest_message:
-                    session.last_summary_message_id = str(latest_message.id)
-
-                self._get_db_session().commit()
-                logger.info(f"Saved summary to database for session {self.session_id}")
+                db.commit()
+            logger.info("Saved summary to database for session %s", self.session_id)
         except Exception as e:
-            logger.error(f"Failed to save summary to database: {e}")
+            logger.error("Failed to save summary to database: %s", e)
+
+    def snapshot(self) -> tuple[BaseMessage, ...]:
+        """The current messages, consistent even while a background summary
+        rewrites the history"""
+        with self._lock:
+            return tuple(self.messages)
 
     def add_message(self, message: BaseMessage) -> None:
         """Add a single message to the history"""
@@ -202,16 +338,19 @@ class ConversationSummaryBufferMessageHistory(BaseChatMessageHistory, BaseModel)
 
     def clear(self) -> None:
         """Clear the history"""
-        self.messages = []
+        with self._lock:
+            self.messages = []
+            self._pending_old_messages = []
         # Clear summary in database
         try:
-            session = self._get_db_session().get(ChatSession, self.session_id)
-            if session:
-                session.conversation_summary = ""
-                session.last_summary_message_id = ""
-                self._get_db_session().commit()
+            self._get_db_session().execute(
+                update(ChatSession)
+                .where(ChatSession.id == self.session_id)
+                .values(conversation_summary="", last_summary_message_id="")
+            )
+            self._get_db_session().commit()
         except Exception as e:
-            logger.error(f"Failed to clear summary in database: {e}")
+            logger.error("Failed to clear summary in database: %s", e)
 
 
 class ChatService:
@@ -235,11 +374,13 @@ class ChatService:
 
                 # Initialize OpenAI embeddings
                 self.embedding = OpenAIEmbeddings(
-                    openai_api_key=settings.OPENAI_API_KEY
+                    model=settings.OPENAI_EMBEDDING_MODEL,
+                    dimensions=settings.OPENAI_EMBEDDING_DIMENSIONS,
+                    openai_api_key=settings.OPENAI_API_KEY,
                 )
                 logger.info("OpenAI embeddings initialized successfully")
             except Exception as e:
-                logger.error(f"Failed to initialize OpenAI components: {e}")
+                logger.error("Failed to initialize OpenAI components: %s", e)
                 self.llm = None
                 self.embedding = None
 
@@ -247,11 +388,47 @@ class ChatService:
         self.persist_directory = "/app/chroma_db"
         self.vectordb = self._get_or_create_vectordb()
 
-        # Initialize chat memory map
-        self.chat_memory_map = {}
+        # Initialize chat memory map, keyed by the session UUID itself so
+        # lookups do not format it as a string first. Bounded so idle
+        # sessions do not hold their history for the life of the process
+        self.chat_memory_map: TTLCache[ConversationSummaryBufferMessageHistory] = (
+            TTLCache(
+                maxsize=settings.CHAT_MEMORY_CACHE_SIZE,
+                ttl=settings.CHAT_MEMORY_CACHE_TTL,
+            )
+        )
 
-        # Initialize the chat pipeline
-        self.chat_pipeline = self._create_chat_pipeline()
+        # AI responses keyed by conversation state, the LLM runs at temperature 0
+        # so an identical prompt and history would produce the same answer
+        self.response_cache: TTLCache[str] = TTLCache(
+            maxsize=settings.CHAT_RESPONSE_CACHE_SIZE,
+            ttl=settings.CHAT_RESPONSE_CACHE_TTL,
+        )
+
+        # Query embeddings keyed by the whitespace-normalized query, a repeated
+        # question skips the embeddings API round trip
+        self.query_embedding_cache: TTLCache[list[float]] = TTLCache(
+            maxsize=settings.CHAT_EMBEDDING_CACHE_SIZE,
+            ttl=settings.CHAT_EMBEDDING_CACHE_TTL,
+        )
+        self.query_embedding_cache_hits = 0
+        self.query_embedding_cache_misses = 0
+
+        if not self.llm:
+            logger.warning("No LLM available. Chat pipeline cannot be created.")
+
+        # Runs PDF retrieval and moderation for send_message alongside its
+        # other I/O
+        self.retrieval_executor = ThreadPoolExecutor(
+            max_workers=settings.CHAT_RETRIEVAL_WORKERS,
+            thread_name_prefix="chat-retrieval",
+        )
+
+        # Generates conversation summaries after the turn that triggered them
+        self.summary_executor = ThreadPoolExecutor(
+            max_workers=settings.CHAT_SUMMARY_WORKERS,
+            thread_name_prefix="chat-summary",
+        )
 
     def _get_or_create_vectordb(self) -> Optional[Chroma]:
         """Get existing vector store or create new one"""
@@ -263,128 +440,429 @@ class ChatService:
 
         try:
             # Try to load existing vector store
-            vectordb = Chroma(
-                persist_directory=self.persist_directory,
-                embedding_function=self.embedding,
-            )
+            vectordb = open_chroma(self.embedding, self.persist_directory)
             logger.info("ChromaDB vector store loaded successfully")
             return vectordb
         except Exception as e:
-            logger.error(f"Failed to load existing ChromaDB: {e}")
-            return None
-
-    def _create_chat_pipeline(self):
-        """Create the chat pipeline without RunnableWithMessageHistory to avoid serialization issues"""
-        if not self.llm:
-            logger.warning("No LLM available. Chat pipeline cannot be created.")
+            logger.error("Failed to load existing ChromaDB: %s", e)
             return None
 
-        # Create prompt template that includes memory
-        prompt_template = ChatPromptTemplate.from_messages(
-            [
-                SystemMessagePromptTemplate.from_template(CHAT_SYSTEM_PROMPT),
-                MessagesPlaceholder(variable_name="history"),
-                HumanMessagePromptTemplate.from_template("{query}"),
-            ]
-        )
-
-        # Create simple pipeline without message history
-        pipeline = prompt_template | self.llm
-
-        return pipeline
-
-    def _get_session_history(
-        self, session_id: str
-    ) -> ConversationSummaryBufferMessageHistory:
-        """Get session history for the LangChain pipeline"""
-        # This method is no longer used but kept for compatibility
-        db_session = Session(engine)
-        return ConversationSummaryBufferMessageHistory(
-            session_id=session_id,
-            db_session=db_session,
-            llm=self.llm,
-            k=6,  # Keep last 6 messages (3 pairs)
-        )
+    def shutdown(self) -> None:
+        """Drop queued retrievals and wait for running retrievals and summaries
+        to finish"""
+        self.retrieval_executor.shutdown(wait=True, cancel_futures=True)
+        self.summary_executor.shutdown(wait=True)
+
+    def _build_chat_input(
+        self, history: Sequence[BaseMessage], query: str
+    ) -> list[BaseMessage]:
+        """Build the LLM input, the same messages the system prompt, history and
+        query template would render to"""
+        return [_chat_system_message, *history, HumanMessage(content=query)]
+
+    def _build_enhanced_query(
+        self, query: str, pdf_context: str, active_flags_prompt: str
+    ) -> str:
+        """Prepend the PDF context and active feature flags, if any, to the query"""
+        if pdf_context:
+            query = PDF_CONTEXT_QUERY_TEMPLATE.format(
+                pdf_context=pdf_context, query=query
+            )
+        if active_flags_prompt:
+            query = f"{active_flags_prompt}\n\n{query}"
+        return query
 
     def _get_chat_history(
-        self, session_id: str, db_session: Session
+        self, session_id: uuid.UUID, db_session: Session
     ) -> ConversationSummaryBufferMessageHistory:
         """Get or create chat history for a session with persistent summary storage"""
-        if session_id not in self.chat_memory_map:
+        chat_history = self.chat_memory_map.get(session_id)
+        if chat_history is None:
             # Create new persistent memory
-            self.chat_memory_map[session_id] = ConversationSummaryBufferMessageHistory(
-                session_id, db_session, self.llm
+            chat_history = ConversationSummaryBufferMessageHistory(
+                str(session_id),
+                db_session,
+                self.llm,
+                summary_executor=self.summary_executor,
             )
-            logger.info(f"Created new persistent memory for session {session_id}")
+            self.chat_memory_map.set(session_id, chat_history)
+            logger.info("Created new persistent memory for session %s", session_id)
         else:
             # Update the database session for existing memory
-            self.chat_memory_map[session_id]._db_session = db_session
-            current_messages = len(self.chat_memory_map[session_id].messages)
+            chat_history._db_session = db_session
             logger.info(
-                f"Retrieved existing persistent memory for session {session_id} with {current_messages} messages"
+                "Retrieved existing persistent memory for session %s with %s messages",
+                session_id,
+                len(chat_history.messages),
+            )
+
+        return chat_history
+
+    def _update_chat_history(self, session_id: uuid.UUID, message: BaseMessage) -> None:
+        """Add a message to a session's history in its own database session"""
+        with SessionLocal() as db:
+            self._get_chat_history(session_id, db).add_message(message)
+
+    def _add_ai_message_to_history(
+        self,
+        chat_history: ConversationSummaryBufferMessageHistory,
+        session_id: uuid.UUID,
+        ai_content: str,
+        background_tasks: BackgroundTasks | None,
+    ) -> None:
+        """Add the AI response to the history, after the response is sent if possible"""
+        ai_langchain_message = AIMessage(content=ai_content)
+        if background_tasks is None:
+            chat_history.add_message(ai_langchain_message)
+            return
+
+        # Adding a message may summarize older ones with another LLM call, which
+        # the client does not need to wait for
+        background_tasks.add_task(
+            self._update_chat_history, session_id, ai_langchain_message
+        )
+
+    def _response_cache_key(
+        self, user_id: uuid.UUID, messages: Sequence[BaseMessage], query: str
+    ) -> str:
+        """Hash the user and the full LLM input, history, prompt and model
+        settings"""
+        # Keyed per user so one user's answer, which may quote their own
+        # PDFs, is never served to another. orjson serializes straight to
+        # bytes, this runs on every turn
+        payload = orjson.dumps(
+            [
+                str(user_id),
+                [(message.type, message.content) for message in messages],
+                query,
+                self.llm.model_name,
+                self.llm.temperature,
+            ]
+        )
+        return hashlib.sha256(payload).hexdigest()
+
+    def _insert_user_message(
+        self, db: Session, message: ChatMessage, user_id: uuid.UUID
+    ) -> bool:
+        """Insert a user message if its session is owned by the user and not
+        blocked, returns whether it was inserted"""
+        result = db.execute(
+            _insert_user_message_statement,
+            {
+                "id": message.id,
+                "session_id": message.session_id,
+                "user_id": user_id,
+                "content": message.content,
+                "role": message.role,
+                "created_at": message.created_at,
+            },
+        )
+        return result.first() is not None
+
+    def _load_prompt_state(
+        self, db: Session, session_id: uuid.UUID
+    ) -> tuple[ConversationSummaryBufferMessageHistory, str]:
+        """Load the chat history and active feature flags prompt of a session"""
+        chat_history = self._get_chat_history(session_id, db)
+        return chat_history, feature_flag_service.get_active_flags_prompt_text(db)
+
+    def _save_message(
+        self, db: Session, session_id: uuid.UUID, content: str, role: str
+    ) -> ChatMessage:
+        """Persist a chat message"""
+        message = ChatMessage(session_id=session_id, content=content, role=role)
+        db.add(message)
+        db.commit()
+        return message
+
+    def _save_ai_message(
+        self,
+        db: Session,
+        session_id: uuid.UUID,
+        content: str,
+        role: str,
+        title: str | None = None,
+    ) -> tuple[ChatMessage, ChatSession]:
+        """Insert an AI message and bump its session's updated_at, replacing the
+        default title with `title` if given, without committing"""
+        # The message id and timestamp are generated client side so it is
+        # inserted without being tracked and refreshed by the session. It is
+        # only inserted while the session exists, a session deleted since the
+        # ownership check is reported as not found instead of failing the
+        # foreign key.
+        ai_message = ChatMessage(session_id=session_id, content=content, role=role)
+        row = ai_message.model_dump()
+        columns = ChatMessage.__table__.c
+        insert_ai_message = (
+            insert(ChatMessage)
+            .from_select(
+                list(row),
+                select(
+                    *(
+                        bindparam(f"ai_{key}", value, columns[key].type)
+                        for key, value in row.items()
+                    )
+                ).where(exists().where(ChatSession.id == session_id)),
             )
+            .cte("ai_message")
+        )
 
-        return self.chat_memory_map[session_id]
+        values: dict[str, Any] = {"updated_at": datetime.utcnow()}
+        if title is not None:
+            values["title"] = case(
+                (ChatSession.title == "New Chat", title),
+                else_=ChatSession.title,
+            )
+        # The insert rides along as a CTE of the session update, one statement
+        session = db.scalars(
+            update(ChatSession)
+            .where(ChatSession.id == session_id)
+            .values(values)
+            .add_cte(insert_ai_message)
+            .returning(ChatSession)
+        ).one_or_none()
+        if session is None:
+            raise ChatSessionNotFoundError("Session not found or access denied")
+        return ai_message, session
+
+    def _save_streamed_ai_message(
+        self, db: Session, session_id: uuid.UUID, content: str
+    ) -> None:
+        self._save_ai_message(db, session_id, content, "ai")
+        db.commit()
+
+    def _block_session(
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        session_id: uuid.UUID,
+        content_type: str,
+        content: str,
+        blocked_reason: str,
+        reply: str | None = None,
+        commit: bool = True,
+    ) -> None:
+        """Log a content violation and block the chat session it happened in,
+        saving `reply` as the AI message if given. All of it is written in one
+        transaction, which is left open with commit=False"""
+        log_entry = ContentFilterLog(
+            user_id=user_id,
+            session_id=session_id,
+            content_type=content_type,
+            original_content=content,
+            blocked_reason=blocked_reason,
+        )
+        blocked = content_filter_service.block_chat_session(
+            db=db,
+            session_id=session_id,
+            blocked_reason=blocked_reason,
+            commit=False,
+            log_entry=log_entry,
+        )
+        if not blocked:
+            # Deleted since the ownership check, nothing was logged either
+            raise ChatSessionNotFoundError("Session not found or access denied")
+        if reply is not None:
+            db.add(ChatMessage(session_id=session_id, content=reply, role="ai"))
+        if commit:
+            db.commit()
 
     def _get_pdf_context(self, user_id: uuid.UUID, query: str, limit: int = 3) -> str:
         """Get relevant PDF context for the user's query - Global access to all PDFs"""
         if not self.vectordb:
-            logger.info(f"No vector database available for user {user_id}")
+            logger.info("No vector database available for user %s", user_id)
             return ""
 
         try:
-            logger.info(
-                f"Searching PDF context for user {user_id} with query: '{query[:100]}...'"
-            )
-            logger.info(
-                f"Vector DB search parameters: limit={limit} (GLOBAL ACCESS - no user filtering)"
+            self._log_pdf_search(user_id, query, limit)
+            embedding = self._embed_query(query)
+            # Search all PDFs directly (no owner_id filtering), a retriever
+            # would only wrap the same call in per-query objects
+            docs_and_scores = (
+                self.vectordb.similarity_search_by_vector_with_relevance_scores(
+                    embedding, k=limit * _PDF_CONTEXT_CANDIDATES_PER_RESULT
+                )
             )
+            return self._format_pdf_context(user_id, docs_and_scores, limit)
 
-            # Create retriever with global access (no owner_id filtering)
-            retriever = self.vectordb.as_retriever(search_kwargs={"k": limit})
+        except Exception as e:
+            logger.error("Error retrieving PDF context for user %s: %s", user_id, e)
+            return ""
 
-            # Get relevant documents from all PDFs
-            docs = retriever.get_relevant_documents(query)
+    async def _aget_pdf_context(
+        self, user_id: uuid.UUID, query: str, limit: int = 3
+    ) -> str:
+        """Async variant of _get_pdf_context. The query embedding, the slow
+        part, is an awaited HTTP call, only the local vector search takes a
+        threadpool worker"""
+        if not self.vectordb:
+            logger.info("No vector database available for user %s", user_id)
+            return ""
 
-            logger.info(
-                f"Vector DB returned {len(docs)} documents (global access) for user {user_id}"
+        try:
+            self._log_pdf_search(user_id, query, limit)
+            embedding = await self._aembed_query(query)
+            docs_and_scores = await run_in_threadpool(
+                self.vectordb.similarity_search_by_vector_with_relevance_scores,
+                embedding,
+                k=limit * _PDF_CONTEXT_CANDIDATES_PER_RESULT,
             )
+            return self._format_pdf_context(user_id, docs_and_scores, limit)
 
-            if not docs:
-                logger.info(
-                    f"No relevant documents found in global PDF database for user {user_id}"
-                )
-                return ""
-
-            # Log document details
-            for i, doc in enumerate(docs):
-                title = doc.metadata.get("pdf_title", "Unknown")
-                owner_id = doc.metadata.get("owner_id", "Unknown")
-                content_preview = (
-                    doc.page_content[:100] + "..."
-                    if len(doc.page_content) > 100
-                    else doc.page_content
-                )
-                logger.info(
-                    f"Document {i+1}: '{title}' (Owner: {owner_id}) - Content preview: '{content_preview}'"
+        except Exception as e:
+            logger.error("Error retrieving PDF context for user %s: %s", user_id, e)
+            return ""
+
+    def _embed_query(self, query: str) -> list[float]:
+        """Embed a query, from the in-memory cache, the database or the API"""
+        key = self._query_embedding_key(query)
+        embedding = self._cached_query_embedding(key)
+        if embedding is not None:
+            return embedding
+        embedding = self._load_query_embedding(key)
+        if embedding is None:
+            embedding = self.embedding.embed_query(query)
+            self._store_query_embedding(key, embedding)
+        self.query_embedding_cache.set(key, embedding)
+        return embedding
+
+    async def _aembed_query(self, query: str) -> list[float]:
+        """Async variant of _embed_query"""
+        key = self._query_embedding_key(query)
+        embedding = self._cached_query_embedding(key)
+        if embedding is not None:
+            return embedding
+        embedding = await run_in_threadpool(self._load_query_embedding, key)
+        if embedding is None:
+            embedding = await self.embedding.aembed_query(query)
+            await run_in_threadpool(self._store_query_embedding, key, embedding)
+        self.query_embedding_cache.set(key, embedding)
+        return embedding
+
+    def _load_query_embedding(self, key: str) -> list[float] | None:
+        """Get a query embedding persisted by an earlier process, if any"""
+        try:
+            with SessionLocal() as db:
+                return embedding_cache_service.get(
+                    db, self._embedding_cache_model(), key
                 )
+        except Exception as e:
+            logger.error("Failed to load stored query embedding: %s", e)
+            return None
 
-            # Format context
-            context_parts = []
-            for doc in docs:
-                title = doc.metadata.get("pdf_title", "Unknown")
-                content = doc.page_content[:500]  # Limit content length
-                context_parts.append(f"From '{title}': {content}")
+    def _store_query_embedding(self, key: str, embedding: list[float]) -> None:
+        try:
+            with SessionLocal() as db:
+                embedding_cache_service.set(
+                    db, self._embedding_cache_model(), key, embedding
+                )
+        except Exception as e:
+            logger.error("Failed to store query embedding: %s", e)
+
+    def _embedding_cache_model(self) -> str:
+        # Shortened vectors from the same model must not be mixed up with full ones
+        if self.embedding.dimensions is None:
+            return self.embedding.model
+        return f"{self.embedding.model}:{self.embedding.dimensions}"
+
+    def _query_embedding_key(self, query: str) -> str:
+        # Collapse whitespace only, case can change what a query means
+        return " ".join(query.split())
+
+    def _cached_query_embedding(self, key: str) -> list[float] | None:
+        """Look a query embedding up in the cache, counting hits and misses"""
+        embedding = self.query_embedding_cache.get(key)
+        if embedding is None:
+            self.query_embedding_cache_misses += 1
+        else:
+            self.query_embedding_cache_hits += 1
+        logger.info(
+            "Query embedding cache %s (hits=%s, misses=%s)",
+            "hit" if embedding is not None else "miss",
+            self.query_embedding_cache_hits,
+            self.query_embedding_cache_misses,
+        )
+        return embedding
 
-            final_context = "\n\n".join(context_parts)
-            logger.info(f"Final PDF context length: {len(final_context)} characters")
+    def _log_pdf_search(self, user_id: uuid.UUID, query: str, limit: int) -> None:
+        logger.info(
+            "Searching PDF context for user %s with query: '%s...'",
+            user_id,
+            query[:100],
+        )
+        logger.info(
+            "Vector DB search parameters: limit=%s (GLOBAL ACCESS - no user filtering)",
+            limit,
+        )
 
-            return final_context
+    def _format_pdf_context(
+        self,
+        user_id: uuid.UUID,
+        docs_and_scores: list[tuple[Document, float]],
+        limit: int,
+    ) -> str:
+        """Format retrieved PDF chunks as context for the query, one entry per
+        PDF, best match first. The scores are Chroma distances, lower is
+        closer"""
+        logger.info(
+            "Vector DB returned %s documents (global access) for user %s",
+            len(docs_and_scores),
+            user_id,
+        )
 
-        except Exception as e:
-            logger.error(f"Error retrieving PDF context for user {user_id}: {e}")
+        if not docs_and_scores:
+            logger.info(
+                "No relevant documents found in global PDF database for user %s",
+                user_id,
+            )
             return ""
 
+        # Log document details
+        for i, (doc, score) in enumerate(docs_and_scores):
+            title = doc.metadata.get("pdf_title", "Unknown")
+            owner_id = doc.metadata.get("owner_id", "Unknown")
+            content_preview = (
+                doc.page_content[:100] + "..."
+                if len(doc.page_content) > 100
+                else doc.page_content
+            )
+            logger.info(
+                "Document %s: '%s' (Owner: %s, distance: %.3f) - Content preview: '%s'",
+                i + 1,
+                title,
+                owner_id,
+                score,
+                content_preview,
+            )
+
+        # Group the chunks by PDF so a title is written once however many of
+        # its chunks matched, closest first. The order only depends on the
+        # distances, with the text as tie-breaker, so the same retrieval always
+        # renders the same context and the response cache can match it
+        ranked = sorted(
+            docs_and_scores, key=lambda item: (item[1], item[0].page_content)
+        )
+        chunks_by_title: dict[str, list[str]] = {}
+        for doc, _ in ranked:
+            title = doc.metadata.get("pdf_title", "Unknown")
+            chunks = chunks_by_title.get(title)
+            if chunks is None:
+                if len(chunks_by_title) == limit:
+                    continue
+                chunks = chunks_by_title[title] = []
+            if len(chunks) < _PDF_CONTEXT_CHUNKS_PER_PDF:
+                # Limit content length
+                chunks.append(doc.page_content[:_PDF_CONTEXT_CHUNK_LENGTH])
+
+        # Format context
+        final_context = "\n\n".join(
+            f"From '{title}': " + "\n".join(chunks)
+            for title, chunks in chunks_by_title.items()
+        )
+        logger.info("Final PDF context length: %s characters", len(final_context))
+
+        return final_context
+
     def create_session(
         self, db: Session, user_id: uuid.UUID, title: str = "New Chat"
     ) -> ChatSession:
@@ -392,131 +870,264 @@ class ChatService:
         session = ChatSession(owner_id=user_id, title=title)
         db.add(session)
         db.commit()
-        db.refresh(session)
-        logger.info(f"Created new chat session: {session.id}")
+        logger.info("Created new chat session: %s", session.id)
+        return session
+
+    def get_owned_session(
+        self, db: Session, session_id: uuid.UUID, user_id: uuid.UUID
+    ) -> ChatSession | None:
+        """Get a chat session if it exists and is owned by the user"""
+        # A primary key lookup, served from the identity map when the session
+        # was already loaded in this request
+        session = db.get(ChatSession, session_id)
+        if session is None or session.owner_id != user_id:
+            return None
         return session
 
     def get_user_sessions(
-        self, db: Session, user_id: uuid.UUID, skip: int = 0, limit: int = 20
-    ) -> List[ChatSession]:
-        """Get all chat sessions for a user"""
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        skip: int = 0,
+        limit: int = 20,
+        after: Cursor | None = None,
+        include_count: bool = False,
+    ) -> tuple[list[ChatSession], int | None, bool]:
+        """Get a page of chat sessions for a user, the total count if requested
+        and whether more sessions follow.
+
+        With an `after` cursor, skip is ignored and the count only covers the
+        sessions from the cursor on.
+        """
+        columns: list[Any] = [ChatSession]
+        if include_count:
+            # Counting visits every matching row, only pay for it on request
+            columns.append(func.count().over().label("total"))
         statement = (
-            select(ChatSession)
+            select(*columns)
+            # Listings never render relationships, fail loudly on lazy loads
+            .options(raiseload("*"))
             .where(ChatSession.owner_id == user_id)
-            .order_by(ChatSession.updated_at.desc())
-            .offset(skip)
-            .limit(limit)
+            .order_by(ChatSession.updated_at.desc(), ChatSession.id.desc())
+            # One extra row tells whether there is a next page
+            .limit(limit + 1)
         )
-
-        sessions = db.exec(statement).all()
-        return sessions
+        if after is not None:
+            statement = statement.where(
+                tuple_(ChatSession.updated_at, ChatSession.id) < tuple_(*after)
+            )
+        else:
+            statement = statement.offset(skip)
+        rows = db.exec(statement).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        if not include_count:
+            return list(rows), None, has_more
+        if rows:
+            return [row[0] for row in rows], rows[0].total, has_more
+
+        # The window count is only available when the page has rows
+        count = 0
+        if skip > 0 and after is None:
+            count_statement = (
+                select(func.count())
+                .select_from(ChatSession)
+                .where(ChatSession.owner_id == user_id)
+            )
+            count = db.exec(count_statement).one()
+        return [], count, False
 
     def get_session_messages(
-        self, db: Session, session_id: uuid.UUID, skip: int = 0, limit: int = 20
-    ) -> List[ChatMessage]:
-        """Get messages for a specific session"""
+        self,
+        db: Session,
+        session_id: uuid.UUID,
+        user_id: uuid.UUID,
+        skip: int = 0,
+        limit: int = 20,
+        after: Cursor | None = None,
+        include_count: bool = False,
+    ) -> tuple[list[ChatMessage], int | None, bool]:
+        """Get a page of messages for a user's session, the total count if
+        requested and whether more messages follow.
+
+        With an `after` cursor, skip is ignored and the count only covers the
+        messages from the cursor on.
+        """
+        columns: list[Any] = [ChatMessage]
+        if include_count:
+            columns.append(func.count().over().label("total"))
+        statement = (
+            select(*columns)
+            .options(raiseload("*"))
+            .join(ChatSession, ChatSession.id == ChatMessage.session_id)
+            .where(ChatSession.id == session_id, ChatSession.owner_id == user_id)
+            .order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc())
+            .limit(limit + 1)
+        )
+        if after is not None:
+            statement = statement.where(
+                tuple_(ChatMessage.created_at, ChatMessage.id) > tuple_(*after)
+            )
+        else:
+            statement = statement.offset(skip)
+        rows = db.exec(statement).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        if rows:
+            if not include_count:
+                return list(rows), None, has_more
+            return [row[0] for row in rows], rows[0].total, has_more
+
+        # An empty page is either an unknown session or a session without
+        # (more) messages, check ownership and count in a single round trip
+        if include_count:
+            count_subquery = (
+                select(func.count())
+                .select_from(ChatMessage)
+                .where(ChatMessage.session_id == session_id)
+                .scalar_subquery()
+            )
+            owned_statement = select(count_subquery)
+        else:
+            owned_statement = select(ChatSession.id)
+        owned_statement = owned_statement.where(
+            ChatSession.id == session_id, ChatSession.owner_id == user_id
+        )
+        owned = db.exec(owned_statement).first()
+        if owned is None:
+            raise ChatSessionNotFoundError("Session not found or access denied")
+        if not include_count:
+            return [], None, False
+        return [], 0 if after is not None else owned, False
+
+    def get_session_messages_before(
+        self,
+        db: Session,
+        session_id: uuid.UUID,
+        user_id: uuid.UUID,
+        before: Cursor | None = None,
+        limit: int = 20,
+    ) -> list[ChatMessage]:
+        """Get the latest messages of a user's session before a cursor, in
+        chronological order"""
+        # Keyset pagination walks the (session_id, created_at, id) index
+        # backwards, unlike OFFSET its cost does not grow with the page number.
+        # The id breaks ties between messages sharing a timestamp, so none is
+        # skipped at a page boundary.
         statement = (
             select(ChatMessage)
-            .where(ChatMessage.session_id == session_id)
-            .order_by(ChatMessage.created_at.asc())
-            .offset(skip)
+            .join(ChatSession, ChatSession.id == ChatMessage.session_id)
+            .where(ChatSession.id == session_id, ChatSession.owner_id == user_id)
+            .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
             .limit(limit)
         )
-
+        if before is not None:
+            statement = statement.where(
+                tuple_(ChatMessage.created_at, ChatMessage.id) < tuple_(*before)
+            )
         messages = db.exec(statement).all()
-        return messages
+
+        if not messages and self.get_owned_session(db, session_id, user_id) is None:
+            raise ChatSessionNotFoundError("Session not found or access denied")
+        return messages[::-1]
 
     def send_message(
-        self, db: Session, session_id: uuid.UUID, user_id: uuid.UUID, content: str
+        self,
+        db: Session,
+        session_id: uuid.UUID,
+        user_id: uuid.UUID,
+        content: str,
+        background_tasks: BackgroundTasks | None = None,
     ) -> Dict[str, Any]:
         """Send a message and get AI response"""
         try:
             logger.info(
-                f"=== START: Processing message for session {session_id}, user {user_id} ==="
+                "=== START: Processing message for session %s, user %s ===",
+                session_id,
+                user_id,
             )
             logger.info(
-                f"User message: '{content[:100]}{'...' if len(content) > 100 else ''}'"
+                "User message: '%s%s'",
+                content[:100],
+                "..." if len(content) > 100 else "",
             )
 
-            # Get the session
-            session_statement = select(ChatSession).where(
-                ChatSession.id == session_id, ChatSession.owner_id == user_id
-            )
-            session = db.exec(session_statement).first()
-
-            if not session:
-                logger.error(
-                    f"Session {session_id} not found or access denied for user {user_id}"
-                )
-                raise ValueError("Session not found or access denied")
-
-            logger.info(
-                f"Found session: '{session.title}' (created: {session.created_at})"
+            # Save user message, guarded by the ownership and blocked checks
+            user_message = ChatMessage(
+                session_id=session_id, content=content, role="user"
             )
+            if not self._insert_user_message(db, user_message, user_id):
+                # Only look the session up to tell why the insert was refused
+                session = self.get_owned_session(db, session_id, user_id)
+                if not session:
+                    logger.error(
+                        "Session %s not found or access denied for user %s",
+                        session_id,
+                        user_id,
+                    )
+                    raise ChatSessionNotFoundError("Session not found or access denied")
 
-            # Check if session is blocked
-            if session.is_blocked:
                 logger.warning(
-                    f"Chat session {session_id} is blocked due to: {session.blocked_reason}"
+                    "Chat session %s is blocked due to: %s",
+                    session_id,
+                    session.blocked_reason,
                 )
                 raise ValueError("Chat session is blocked due to inappropriate content")
-
-            # Save user message (always, even if blocked)
-            user_message = ChatMessage(
-                session_id=session_id, content=content, role="user"
-            )
-            db.add(user_message)
             db.commit()
-            db.refresh(user_message)
 
-            # Content filtering for user input
-            filter_result = content_filter_service.filter_content(
+            # Start the PDF retrieval (embedding call and vector search) and the
+            # moderation call in the background, both overlap with each other
+            # and with the history and feature flag reads below
+            pdf_context_future = self.retrieval_executor.submit(
+                self._get_pdf_context, user_id, content
+            )
+            filter_future = self.retrieval_executor.submit(
+                content_filter_service.filter_content,
                 content=content,
                 user_id=user_id,
                 session_id=session_id,
                 content_type="user_input",
             )
 
-            if not filter_result["is_allowed"]:
-                # Log the violation
-                content_filter_service.log_violation(
-                    db=db,
-                    user_id=user_id,
-                    session_id=session_id,
-                    content_type="user_input",
-                    original_content=content,
-                    blocked_reason=filter_result["blocked_reason"],
-                )
+            # Get current chat history and active feature flags for AI prompt,
+            # the database session stays on this thread
+            chat_history, active_flags_prompt = self._load_prompt_state(db, session_id)
 
-                # Block the chat session
-                content_filter_service.block_chat_session(
-                    db=db,
-                    session_id=session_id,
-                    blocked_reason=filter_result["blocked_reason"],
-                )
+            # Content filtering for user input
+            filter_result = filter_future.result()
 
-                # Save the blocked message to chat history
-                blocked_message = ChatMessage(
-                    session_id=session_id, content=BLOCKED_CONTENT_MESSAGE, role="ai"
+            if not filter_result["is_allowed"]:
+                pdf_context_future.cancel()
+
+                # Log the violation, block the chat session and save the blocked
+                # message to chat history in one transaction
+                self._block_session(
+                    db,
+                    user_id,
+                    session_id,
+                    "user_input",
+                    content,
+                    filter_result["blocked_reason"],
+                    reply=BLOCKED_CONTENT_MESSAGE,
                 )
-                db.add(blocked_message)
-                db.commit()
-                db.refresh(blocked_message)
 
                 logger.error(
-                    f"Content blocked for user {user_id}: {filter_result['blocked_reason']}"
+                    "Content blocked for user %s: %s",
+                    user_id,
+                    filter_result["blocked_reason"],
                 )
                 raise ValueError(f"Content blocked: {filter_result['blocked_reason']}")
 
             # Get AI response
-            if not self.chat_pipeline:
+            if not self.llm:
                 logger.error("Chat pipeline not available")
                 raise ValueError("Chat pipeline not available")
 
-            # Get current chat history
-            chat_history = self._get_chat_history(str(session_id), db)
             logger.info(
-                f"Current chat history has {len(chat_history.messages)} messages"
+                "Current chat history has %s messages",
+                len(chat_history.messages),
             )
 
             # Log the last few messages for context
@@ -535,64 +1146,71 @@ class ChatService:
                         if len(msg.content) > 50
                         else msg.content
                     )
-                    logger.info(f"  {role}: '{content_preview}'")
+                    logger.info("  %s: '%s'", role, content_preview)
 
             # Get PDF context for the query
             logger.info("=== STEP 1: Retrieving PDF context ===")
-            pdf_context = self._get_pdf_context(user_id, content)
+            pdf_context = pdf_context_future.result()
 
             if pdf_context:
                 logger.info(
-                    f"PDF context retrieved successfully ({len(pdf_context)} characters)"
+                    "PDF context retrieved successfully (%s characters)",
+                    len(pdf_context),
                 )
             else:
                 logger.info(
                     "No PDF context found - proceeding with general knowledge only"
                 )
 
-            # Get active feature flags for AI prompt
-            logger.info("=== STEP 1.5: Getting active feature flags ===")
-            active_flags_prompt = feature_flag_service.get_active_flags_prompt_text(db)
-
             # Prepare query with context and feature flags
-            enhanced_query = content
+            enhanced_query = self._build_enhanced_query(
+                content, pdf_context, active_flags_prompt
+            )
             if pdf_context:
-                enhanced_query = f"Context from your documents:\n{pdf_context}\n\nUser question: {content}\n\nPlease search the provided context and cite specific passages when answering."
-                logger.info(f"Enhanced query prepared with PDF context")
+                logger.info("Enhanced query prepared with PDF context")
             else:
                 logger.info("Using original query without PDF context")
-
-            # Add feature flags to the query if any are active
             if active_flags_prompt:
-                enhanced_query = f"{active_flags_prompt}\n\n{enhanced_query}"
                 logger.info("Enhanced query with active feature flags")
             else:
                 logger.info("No active feature flags found")
 
             # Add the user message to history
-            from langchain_core.messages import HumanMessage
-
             user_langchain_message = HumanMessage(content=content)
             chat_history.add_message(user_langchain_message)
 
             # Prepare messages for the pipeline
-            messages = chat_history.messages.copy()
+            messages = chat_history.snapshot()
+
+            # End the read transaction so no pooled connection is held while
+            # waiting on the LLM, the session reconnects for the writes below
+            db.commit()
 
             # Get AI response using the pipeline
             logger.info("=== STEP 2: Generating AI response ===")
 
-            # Use the simple pipeline without message history
-            response = self.chat_pipeline.invoke(
-                {"query": enhanced_query, "history": messages}
-            )
+            cache_key = self._response_cache_key(user_id, messages, enhanced_query)
+            ai_content = self.response_cache.get(cache_key)
+            if ai_content is None:
+                response = self.llm.invoke(
+                    self._build_chat_input(messages, enhanced_query)
+                )
 
-            # Extract response content
-            ai_content = (
-                response.content if hasattr(response, "content") else str(response)
-            )
-            logger.info(f"AI response generated ({len(ai_content)} characters)")
+                # Extract response content
+                ai_content = (
+                    response.content if hasattr(response, "content") else str(response)
+                )
+                self.response_cache.set(cache_key, ai_content)
+                logger.info("AI response generated (%s characters)", len(ai_content))
+            else:
+                logger.info(
+                    "AI response served from cache (%s characters)",
+                    len(ai_content),
+                )
             logger.info(
-                f"AI response preview: '{ai_content[:200]}{'...' if len(ai_content) > 200 else ''}'"
+                "AI response preview: '%s%s'",
+                ai_content[:200],
+                "..." if len(ai_content) > 200 else "",
             )
 
             # Content filtering for AI response
@@ -605,55 +1223,41 @@ class ChatService:
             )
 
             if not ai_filter_result["is_allowed"]:
-                # Log the violation
-                content_filter_service.log_violation(
-                    db=db,
-                    user_id=user_id,
-                    session_id=session_id,
-                    content_type="ai_response",
-                    original_content=ai_content,
-                    blocked_reason=ai_filter_result["blocked_reason"],
-                )
-
-                # Block the chat session
-                content_filter_service.block_chat_session(
-                    db=db,
-                    session_id=session_id,
-                    blocked_reason=ai_filter_result["blocked_reason"],
+                # Log the violation and block the chat session, committed
+                # together with the AI message below
+                self._block_session(
+                    db,
+                    user_id,
+                    session_id,
+                    "ai_response",
+                    ai_content,
+                    ai_filter_result["blocked_reason"],
+                    commit=False,
                 )
 
                 # Replace AI content with blocked message and save to database
                 ai_content = AI_RESPONSE_BLOCKED_MESSAGE
                 logger.warning(
-                    f"AI response blocked for user {user_id}: {ai_filter_result['blocked_reason']}"
+                    "AI response blocked for user %s: %s",
+                    user_id,
+                    ai_filter_result["blocked_reason"],
                 )
 
             # Add the AI response to history
-            from langchain_core.messages import AIMessage
-
-            ai_langchain_message = AIMessage(content=ai_content)
-            chat_history.add_message(ai_langchain_message)
-
-            # Save AI message
-            ai_message = ChatMessage(
-                session_id=session_id, content=ai_content, role="assistant"
+            self._add_ai_message_to_history(
+                chat_history, session_id, ai_content, background_tasks
             )
-            db.add(ai_message)
-
-            # Update session timestamp
-            session.updated_at = datetime.utcnow()
 
-            # Auto-generate title if it's the first message
-            if session.title == "New Chat":
-                # Generate a title based on the first message
-                title = content[:50] + "..." if len(content) > 50 else content
-                session.title = title
-                logger.info(f"Auto-generated session title: '{title}'")
+            # Save AI message and update session timestamp, auto-generating the
+            # title from the first message if it still has the default one
+            title = content[:50] + "..." if len(content) > 50 else content
+            ai_message, session = self._save_ai_message(
+                db, session_id, ai_content, "assistant", title=title
+            )
 
             db.commit()
-            db.refresh(ai_message)
-            logger.info(f"Saved AI message with ID: {ai_message.id}")
-            logger.info(f"=== END: Message processing completed successfully ===")
+            logger.info("Saved AI message with ID: %s", ai_message.id)
+            logger.info("=== END: Message processing completed successfully ===")
 
             return {
                 "user_message": user_message,
@@ -663,9 +1267,10 @@ class ChatService:
 
         except Exception as e:
             logger.error(
-                f"=== ERROR: Failed to process message for session {session_id} ==="
+                "=== ERROR: Failed to process message for session %s ===",
+                session_id,
             )
-            logger.error(f"Error details: {e}")
+            logger.error("Error details: %s", e)
             db.rollback()
             raise
 
@@ -673,46 +1278,41 @@ class ChatService:
         self, db: Session, session_id: uuid.UUID, user_id: uuid.UUID, title: str
     ) -> ChatSession:
         """Update the title of a chat session"""
-        statement = select(ChatSession).where(
-            ChatSession.id == session_id, ChatSession.owner_id == user_id
-        )
-        session = db.exec(statement).first()
+        # The ownership check is part of the UPDATE, no row is loaded first
+        session = db.scalars(
+            update(ChatSession)
+            .where(ChatSession.id == session_id, ChatSession.owner_id == user_id)
+            .values(title=title, updated_at=datetime.utcnow())
+            .returning(ChatSession)
+        ).first()
 
         if not session:
             raise ValueError("Session not found or access denied")
 
-        session.title = title
-        session.updated_at = datetime.utcnow()
         db.commit()
-        db.refresh(session)
-
         return session
 
     def delete_session(
         self, db: Session, session_id: uuid.UUID, user_id: uuid.UUID
     ) -> bool:
         """Delete a chat session and all its messages"""
-        statement = select(ChatSession).where(
-            ChatSession.id == session_id, ChatSession.owner_id == user_id
+        # Delete session, guarded by the ownership check in the same statement
+        # (messages will be cascade deleted by the foreign key)
+        result = db.execute(
+            delete(ChatSession).where(
+                ChatSession.id == session_id, ChatSession.owner_id == user_id
+            )
         )
-        session = db.exec(statement).first()
 
-        if not session:
+        if result.rowcount == 0:
             raise ValueError("Session not found or access denied")
 
-            # Check if session is blocked
-            if session.is_blocked:
-                raise ValueError(BLOCKED_SESSION_DELETE_ERROR)
-
-        # Delete session (messages will be cascade deleted)
-        db.delete(session)
         db.commit()
 
         # Clean up memory
-        if str(session_id) in self.chat_memory_map:
-            del self.chat_memory_map[str(session_id)]
+        self.chat_memory_map.delete(session_id)
 
-        logger.info(f"Deleted chat session: {session_id}")
+        logger.info("Deleted chat session: %s", session_id)
         return True
 
     def get_session_summary(
@@ -720,167 +1320,205 @@ class ChatService:
     ) -> Dict[str, Any]:
         """Get a summary of a chat session"""
         # Get session
-        session_statement = select(ChatSession).where(
-            ChatSession.id == session_id, ChatSession.owner_id == user_id
-        )
-        session = db.exec(session_statement).first()
+        session = self.get_owned_session(db, session_id, user_id)
 
         if not session:
             raise ValueError("Session not found or access denied")
 
-        # Get message count
-        message_statement = select(ChatMessage).where(
-            ChatMessage.session_id == session_id
+        # Get the last message and the message count in one query. A window
+        # count would make Postgres read and sort every message before the
+        # limit, a scalar subquery lets the last message come straight off the
+        # (session_id, created_at, id) index
+        count_subquery = (
+            select(func.count())
+            .select_from(ChatMessage)
+            .where(ChatMessage.session_id == session_id)
+            .scalar_subquery()
         )
-        messages = db.exec(message_statement).all()
+        message_statement = (
+            select(ChatMessage, count_subquery.label("total"))
+            .where(ChatMessage.session_id == session_id)
+            .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+            .limit(1)
+        )
+        row = db.exec(message_statement).first()
 
         return {
             "session": session,
-            "message_count": len(messages),
-            "last_message": messages[-1] if messages else None,
+            "message_count": row.total if row else 0,
+            "last_message": row[0] if row else None,
         }
 
     async def stream_message(
-        self, db: Session, session_id: uuid.UUID, user_id: uuid.UUID, content: str
-    ):
-        """Streaming AI response implementation"""
+        self,
+        db: Session,
+        session_id: uuid.UUID,
+        user_id: uuid.UUID,
+        content: str,
+        background_tasks: BackgroundTasks | None = None,
+        session: ChatSession | None = None,
+    ) -> AsyncIterator[bytes]:
+        """Streaming AI response implementation, pass the chat `session` if the
+        caller already verified ownership to skip looking it up again. Chunks are
+        yielded as encoded bytes so the response does not re-encode each token"""
         try:
             logger.info(
-                f"=== START: Streaming message for session {session_id}, user {user_id} ==="
+                "=== START: Streaming message for session %s, user %s ===",
+                session_id,
+                user_id,
             )
             logger.info(
-                f"User message: '{content[:100]}{'...' if len(content) > 100 else ''}'"
+                "User message: '%s%s'",
+                content[:100],
+                "..." if len(content) > 100 else "",
             )
 
-            # Get the session
-            session_statement = select(ChatSession).where(
-                ChatSession.id == session_id, ChatSession.owner_id == user_id
-            )
-            session = db.exec(session_statement).first()
+            # The database session is blocking, run its calls in the threadpool
+            # so the event loop keeps serving streams. Moderation is awaited
+            if session is None:
+                session = await run_in_threadpool(
+                    self.get_owned_session, db, session_id, user_id
+                )
 
             if not session:
                 logger.error(
-                    f"Session {session_id} not found or access denied for user {user_id}"
+                    "Session %s not found or access denied for user %s",
+                    session_id,
+                    user_id,
                 )
-                yield "Session not found or access denied."
+                yield b"Session not found or access denied."
                 return
 
             if session.is_blocked:
                 logger.warning(
-                    f"Chat session {session_id} is blocked due to: {session.blocked_reason}"
+                    "Chat session %s is blocked due to: %s",
+                    session_id,
+                    session.blocked_reason,
                 )
-                yield BLOCKED_CONTENT_MESSAGE
+                yield BLOCKED_CONTENT_MESSAGE.encode()
                 return
 
             # Save user message (always, even if blocked)
-            user_message = ChatMessage(
-                session_id=session_id, content=content, role="user"
-            )
-            db.add(user_message)
-            db.commit()
-            db.refresh(user_message)
-
-            # Content filtering for user input
-            filter_result = content_filter_service.filter_content(
-                content=content,
-                user_id=user_id,
-                session_id=session_id,
-                content_type="user_input",
-            )
-            if not filter_result["is_allowed"]:
-                content_filter_service.log_violation(
-                    db=db,
+            await run_in_threadpool(self._save_message, db, session_id, content, "user")
+
+            # Moderation, PDF retrieval and the database reads are independent,
+            # run them concurrently so only the slowest of them is waited on
+            (
+                filter_result,
+                pdf_context,
+                (chat_history, active_flags_prompt),
+            ) = await asyncio.gather(
+                content_filter_service.afilter_content(
+                    content=content,
                     user_id=user_id,
                     session_id=session_id,
                     content_type="user_input",
-                    original_content=content,
-                    blocked_reason=filter_result["blocked_reason"],
-                )
-                content_filter_service.block_chat_session(
-                    db=db,
-                    session_id=session_id,
-                    blocked_reason=filter_result["blocked_reason"],
-                )
-                # Save the blocked message to chat history
-                blocked_message = ChatMessage(
-                    session_id=session_id, content=BLOCKED_CONTENT_MESSAGE, role="ai"
+                ),
+                self._aget_pdf_context(user_id, content),
+                run_in_threadpool(self._load_prompt_state, db, session_id),
+            )
+            if not filter_result["is_allowed"]:
+                await run_in_threadpool(
+                    self._block_session,
+                    db,
+                    user_id,
+                    session_id,
+                    "user_input",
+                    content,
+                    filter_result["blocked_reason"],
+                    # Saved to chat history in the same transaction
+                    BLOCKED_CONTENT_MESSAGE,
                 )
-                db.add(blocked_message)
-                db.commit()
-                db.refresh(blocked_message)
-                yield BLOCKED_CONTENT_MESSAGE
+                yield BLOCKED_CONTENT_MESSAGE.encode()
                 return
 
-            # Get context and feature flags
-            chat_history = self._get_chat_history(str(session_id), db)
-            pdf_context = self._get_pdf_context(user_id, content)
-            active_flags_prompt = feature_flag_service.get_active_flags_prompt_text(db)
-            enhanced_query = content
-            if pdf_context:
-                enhanced_query = f"Context from your documents:\n{pdf_context}\n\nUser question: {content}\n\nPlease search the provided context and cite specific passages when answering."
-            if active_flags_prompt:
-                enhanced_query = f"{active_flags_prompt}\n\n{enhanced_query}"
-
-            from langchain_core.messages import HumanMessage
+            enhanced_query = self._build_enhanced_query(
+                content, pdf_context, active_flags_prompt
+            )
 
             user_langchain_message = HumanMessage(content=content)
             chat_history.add_message(user_langchain_message)
-            messages = chat_history.messages.copy()
+            messages = chat_history.snapshot()
 
             # Stream AI response
-            if not self.chat_pipeline:
+            if not self.llm:
                 logger.error("Chat pipeline not available")
-                yield "AI chat pipeline not available."
+                yield b"AI chat pipeline not available."
                 return
 
-            # Use LangChain's astream for streaming
-            ai_content = ""
-            async for chunk in self.chat_pipeline.astream(
-                {"query": enhanced_query, "history": messages}
-            ):
-                token = chunk.content if hasattr(chunk, "content") else str(chunk)
-                ai_content += token
-                yield token
+            # Release the pooled connection for the duration of the stream
+            await run_in_threadpool(db.commit)
 
-            # Content filtering for AI response (after streaming)
-            ai_filter_result = content_filter_service.filter_content(
-                content=ai_content,
-                user_id=user_id,
-                session_id=session_id,
-                content_type="ai_response",
-            )
-            if not ai_filter_result["is_allowed"]:
-                content_filter_service.log_violation(
-                    db=db,
+            cache_key = self._response_cache_key(user_id, messages, enhanced_query)
+            ai_content = self.response_cache.get(cache_key)
+            if ai_content is not None:
+                yield ai_content.encode()
+
+                # Content filtering for AI response
+                ai_filter_result = await content_filter_service.afilter_content(
+                    content=ai_content,
                     user_id=user_id,
                     session_id=session_id,
                     content_type="ai_response",
-                    original_content=ai_content,
-                    blocked_reason=ai_filter_result["blocked_reason"],
                 )
-                content_filter_service.block_chat_session(
-                    db=db,
-                    session_id=session_id,
-                    blocked_reason=ai_filter_result["blocked_reason"],
+            else:
+                # Content filtering for AI response, segment by segment while
+                # the response is generated. A blocked segment ends the stream
+                ai_filter = content_filter_service.stream_filter(user_id, session_id)
+                ai_filter_result = None
+
+                # Use LangChain's astream for streaming. Tokens are joined once
+                # at the end, appending to a string copies it on every token
+                tokens: list[str] = []
+                try:
+                    async for chunk in self.llm.astream(
+                        self._build_chat_input(messages, enhanced_query)
+                    ):
+                        token = (
+                            chunk.content if hasattr(chunk, "content") else str(chunk)
+                        )
+                        tokens.append(token)
+                        ai_filter.feed(token)
+                        ai_filter_result = ai_filter.blocked_result()
+                        if ai_filter_result is not None:
+                            break
+                        yield token.encode()
+                except BaseException:
+                    ai_filter.cancel()
+                    raise
+                ai_content = "".join(tokens)
+
+                if ai_filter_result is None:
+                    ai_filter_result = await ai_filter.finish()
+                else:
+                    ai_filter.cancel()
+                if ai_filter_result["is_allowed"]:
+                    self.response_cache.set(cache_key, ai_content)
+
+            if not ai_filter_result["is_allowed"]:
+                await run_in_threadpool(
+                    self._block_session,
+                    db,
+                    user_id,
+                    session_id,
+                    "ai_response",
+                    ai_content,
+                    ai_filter_result["blocked_reason"],
                 )
-                yield AI_RESPONSE_BLOCKED_MESSAGE
+                yield AI_RESPONSE_BLOCKED_MESSAGE.encode()
                 return
 
-            # Save AI message
-            from langchain_core.messages import AIMessage
-
-            ai_langchain_message = AIMessage(content=ai_content)
-            chat_history.add_message(ai_langchain_message)
-            ai_message = ChatMessage(
-                session_id=session_id, content=ai_content, role="ai"
+            # Save AI message, the client refetches messages once the stream ends
+            self._add_ai_message_to_history(
+                chat_history, session_id, ai_content, background_tasks
+            )
+            await run_in_threadpool(
+                self._save_streamed_ai_message, db, session_id, ai_content
             )
-            db.add(ai_message)
-            db.commit()
-            db.refresh(ai_message)
 
         except Exception as e:
-            logger.error(f"Error in stream_message: {e}")
-            yield f"[Error] {str(e)}"
+            logger.error("Error in stream_message: %s", e)
+            yield f"[Error] {str(e)}".encode()
 
 
 # Global instance
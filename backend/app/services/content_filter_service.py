@@ -1,29 +1,157 @@
+import asyncio
+import hashlib
 import logging
+import re
+import threading
 import uuid
+from functools import cached_property
 from typing import Dict, Any, Optional
-from datetime import datetime
-from openai import OpenAI
-from sqlmodel import Session, select
+import httpx
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncOpenAI,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+)
+from sqlalchemy import insert, text, tuple_, update
+from sqlmodel import Session, func, select
+from tenacity import (
+    AsyncRetrying,
+    Retrying,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
 from app.models import ContentFilterLog, ChatSession
+from app.core.cache import TTLCache
+from app.core.clock import utc_today_start, utcnow
 from app.core.config import settings
+from app.core.pagination import Cursor
 
 logger = logging.getLogger(__name__)
 
+# What a UUID's text form can start with, checked before a prefix search
+_USER_ID_PREFIX = re.compile(r"[0-9a-f-]+")
+
+# A streamed text is moderated in segments ending at a sentence end once they
+# reach the minimum length, or cut at the maximum length
+_STREAM_SEGMENT_MIN_LENGTH = 400
+_STREAM_SEGMENT_MAX_LENGTH = 2000
+_SENTENCE_ENDS = (".", "!", "?", "\n")
+
+# Greetings and acknowledgements that are allowed without a moderation call
+_SAFE_CONTENT = re.compile(
+    r"(hi|hello|hey|thanks|thank you|ok|okay|yes|no)[.!? ]*", re.IGNORECASE
+)
+
+# Moderations from every request share the clients' pools, enough kept alive
+# connections that concurrent calls skip the TCP and TLS handshakes
+_HTTP_LIMITS = httpx.Limits(max_connections=200, max_keepalive_connections=100)
+_HTTP_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+
+# Rate limited moderations are retried with jittered backoff, so a burst of
+# requests spreads out instead of failing open together. Connection errors,
+# timeouts and server errors are retried the same way, in place of the SDK's
+# own retries
+_RATE_LIMIT_RETRY: dict[str, Any] = {
+    "retry": retry_if_exception_type(
+        (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+    ),
+    "wait": wait_random_exponential(min=1, max=8),
+    "stop": stop_after_attempt(settings.CONTENT_FILTER_MAX_ATTEMPTS),
+    "reraise": True,
+}
+
+# Returned when content cannot be checked, filtering fails open
+_ALLOWED_RESULT: dict[str, Any] = {
+    "is_allowed": True,
+    "blocked_reason": "",
+    "confidence": 0.0,
+}
+
 
 class ContentFilterService:
+    _STATISTICS_KEY = "statistics"
+    # Moderation categories that block content, with the reason logged for each
+    _BLOCKED_CATEGORIES = (
+        ("violence", "Violence"),
+        ("sexual", "Sexual Content"),
+        ("self_harm", "Self-Harm"),
+        ("hate", "Hate Speech"),
+    )
+
     def __init__(self):
-        self.client = None
-        if settings.OPENAI_API_KEY:
-            try:
-                self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-                logger.info("OpenAI client initialized for content filtering")
-            except Exception as e:
-                logger.error(f"Failed to initialize OpenAI client: {e}")
-        else:
+        if not settings.OPENAI_API_KEY:
             logger.warning(
                 "OpenAI API key not found. Content filtering will be limited."
             )
 
+        # Moderation results keyed by a hash of the text. A reply served from
+        # the chat response cache, or a repeated message, is not sent to the
+        # moderation API again
+        self.moderation_cache: TTLCache[dict[str, Any]] = TTLCache(
+            maxsize=settings.CONTENT_FILTER_CACHE_SIZE,
+            ttl=settings.CONTENT_FILTER_CACHE_TTL,
+        )
+        # Texts allowed without a moderation call in this process, see
+        # _is_trivially_safe. Counted from the threadpool's threads
+        self.trivially_safe_count = 0
+        self._trivially_safe_lock = threading.Lock()
+
+        # The admin dashboard polls the statistics, a few seconds of staleness
+        # saves a scan of the logs on every poll
+        self.statistics_cache: TTLCache[dict[str, int]] = TTLCache(
+            maxsize=1, ttl=settings.CONTENT_FILTER_STATISTICS_CACHE_TTL
+        )
+
+    # The OpenAI clients are created on first use rather than at import, so a
+    # server that imports the app before forking workers gives each worker its
+    # own connection pool instead of one inherited across the fork
+
+    @cached_property
+    def client(self) -> OpenAI | None:
+        if not settings.OPENAI_API_KEY:
+            return None
+        try:
+            client = OpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                # Retries are left to _moderate, which backs off further
+                max_retries=0,
+                http_client=httpx.Client(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT),
+            )
+            logger.info("OpenAI client initialized for content filtering")
+            return client
+        except Exception as e:
+            logger.error(f"Failed to initialize OpenAI client: {e}")
+            return None
+
+    @cached_property
+    def async_client(self) -> AsyncOpenAI | None:
+        if not settings.OPENAI_API_KEY:
+            return None
+        try:
+            return AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                max_retries=0,
+                http_client=httpx.AsyncClient(
+                    limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT
+                ),
+            )
+        except Exception as e:
+            logger.error(f"Failed to initialize async OpenAI client: {e}")
+            return None
+
+    async def aclose(self) -> None:
+        """Close the connection pools of the clients created so far"""
+        client = self.__dict__.pop("client", None)
+        if client is not None:
+            client.close()
+        async_client = self.__dict__.pop("async_client", None)
+        if async_client is not None:
+            await async_client.close()
+
     def filter_content(
         self,
         content: str,
@@ -37,63 +165,187 @@ class ContentFilterService:
         """
         if not self.client:
             logger.warning("OpenAI client not available. Content will be allowed.")
-            return {"is_allowed": True, "blocked_reason": "", "confidence": 0.0}
+            return dict(_ALLOWED_RESULT)
+
+        if self._is_trivially_safe(content):
+            return dict(_ALLOWED_RESULT)
+
+        cached = self._cached_result(content, user_id, content_type)
+        if cached is not None:
+            return cached
 
         try:
             logger.info(f"Filtering content for user {user_id}, type: {content_type}")
 
             # Use OpenAI's moderation API
-            response = self.client.moderations.create(input=content)
-            result = response.results[0]
-
-            # Check for violations
-            categories = result.categories
-            category_scores = result.category_scores
-
-            # Define blocked categories
-            blocked_categories = {
-                "violence": "Violence",
-                "sexual": "Sexual Content",
-                "self_harm": "Self-Harm",
-                "hate": "Hate Speech",
-            }
+            response = self._moderate(content)
+            return self._process_result(content, user_id, response.results[0])
 
-            blocked_reasons = []
-            max_score = 0.0
-
-            for category, reason in blocked_categories.items():
-                if hasattr(categories, category) and getattr(categories, category):
-                    score = getattr(category_scores, category, 0.0)
-                    blocked_reasons.append(reason)
-                    max_score = max(max_score, score)
-
-            is_allowed = len(blocked_reasons) == 0
-
-            result_data = {
-                "is_allowed": is_allowed,
-                "blocked_reason": "; ".join(blocked_reasons) if blocked_reasons else "",
-                "confidence": max_score,
-                "categories": {
-                    "violence": getattr(category_scores, "violence", 0.0),
-                    "sexual": getattr(category_scores, "sexual", 0.0),
-                    "self_harm": getattr(category_scores, "self_harm", 0.0),
-                    "hate": getattr(category_scores, "hate", 0.0),
-                },
-            }
+        except Exception as e:
+            logger.error(f"Error filtering content: {e}")
+            # Allow content if filtering fails
+            return dict(_ALLOWED_RESULT)
 
-            if not is_allowed:
-                logger.warning(
-                    f"Content blocked for user {user_id}: {result_data['blocked_reason']}"
-                )
-            else:
-                logger.info(f"Content allowed for user {user_id}")
+    async def afilter_content(
+        self,
+        content: str,
+        user_id: uuid.UUID,
+        session_id: uuid.UUID | None = None,
+        content_type: str = "user_input",
+    ) -> dict[str, Any]:
+        """Async variant of filter_content, the moderation call is awaited
+        instead of holding a threadpool worker"""
+        if not self.async_client:
+            logger.warning("OpenAI client not available. Content will be allowed.")
+            return dict(_ALLOWED_RESULT)
+
+        if self._is_trivially_safe(content):
+            return dict(_ALLOWED_RESULT)
 
-            return result_data
+        cached = self._cached_result(content, user_id, content_type)
+        if cached is not None:
+            return cached
+
+        try:
+            logger.info(f"Filtering content for user {user_id}, type: {content_type}")
+
+            response = await self._amoderate(content)
+            return self._process_result(content, user_id, response.results[0])
 
         except Exception as e:
             logger.error(f"Error filtering content: {e}")
             # Allow content if filtering fails
-            return {"is_allowed": True, "blocked_reason": "", "confidence": 0.0}
+            return dict(_ALLOWED_RESULT)
+
+    def stream_filter(
+        self,
+        user_id: uuid.UUID,
+        session_id: uuid.UUID | None = None,
+        content_type: str = "ai_response",
+    ) -> "StreamingContentFilter":
+        """Start moderating a text that is streamed in pieces"""
+        return StreamingContentFilter(self, user_id, session_id, content_type)
+
+    def filter_content_many(
+        self,
+        contents: list[str],
+        user_id: uuid.UUID,
+        session_id: uuid.UUID | None = None,
+        content_type: str = "user_input",
+    ) -> list[dict[str, Any]]:
+        """
+        Filter several texts, returning one result per text in the same order.
+        Texts not in the cache are sent in a single moderation request.
+        """
+        if not self.client:
+            logger.warning("OpenAI client not available. Content will be allowed.")
+            return [dict(_ALLOWED_RESULT) for _ in contents]
+
+        results: list[dict[str, Any] | None] = [
+            dict(_ALLOWED_RESULT)
+            if self._is_trivially_safe(content)
+            else self._cached_result(content, user_id, content_type)
+            for content in contents
+        ]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            try:
+                logger.info(
+                    f"Filtering {len(missing)} texts for user {user_id}, "
+                    f"type: {content_type}"
+                )
+                response = self._moderate([contents[i] for i in missing])
+                for i, result in zip(missing, response.results, strict=True):
+                    results[i] = self._process_result(contents[i], user_id, result)
+            except Exception as e:
+                logger.error(f"Error filtering content: {e}")
+                # Allow content if filtering fails
+                for i in missing:
+                    results[i] = dict(_ALLOWED_RESULT)
+        return results
+
+    def _moderate(self, content: str | list[str]) -> Any:
+        """Call the moderation API, retrying while it is rate limited or
+        unavailable"""
+        for attempt in Retrying(**_RATE_LIMIT_RETRY):
+            with attempt:
+                return self.client.moderations.create(input=content)
+
+    async def _amoderate(self, content: str) -> Any:
+        """Async variant of _moderate"""
+        async for attempt in AsyncRetrying(**_RATE_LIMIT_RETRY):
+            with attempt:
+                return await self.async_client.moderations.create(input=content)
+
+    def _is_trivially_safe(self, content: str) -> bool:
+        """Whether the text is too short or too common to need moderation"""
+        stripped = content.strip()
+        if len(stripped) < 3 or _SAFE_CONTENT.fullmatch(stripped):
+            with self._trivially_safe_lock:
+                self.trivially_safe_count += 1
+            return True
+        return False
+
+    def _cached_result(
+        self, content: str, user_id: uuid.UUID, content_type: str
+    ) -> dict[str, Any] | None:
+        cached = self.moderation_cache.get(self._cache_key(content))
+        if cached is None:
+            return None
+        logger.info(
+            f"Content filter result for user {user_id}, type: {content_type} "
+            "served from cache"
+        )
+        return dict(cached)
+
+    def _cache_key(self, content: str) -> bytes:
+        # A 128-bit BLAKE2b digest, faster than SHA-256 and a quarter the size
+        # of a hex key, collisions stay out of reach
+        return hashlib.blake2b(content.encode(), digest_size=16).digest()
+
+    def _process_result(
+        self, content: str, user_id: uuid.UUID, result: Any
+    ) -> dict[str, Any]:
+        """Turn a moderation result into the filter result and cache it"""
+        # Check for violations. The SDK returns typed models with a field per
+        # category, each flag and score is read once by attribute
+        categories = result.categories
+        scores = {
+            category: getattr(result.category_scores, category)
+            for category, _ in self._BLOCKED_CATEGORIES
+        }
+        # Nothing is flagged for most texts, the overall flag covers every
+        # category and spares checking the blocked ones one by one
+        flagged = (
+            [
+                (category, reason)
+                for category, reason in self._BLOCKED_CATEGORIES
+                if getattr(categories, category)
+            ]
+            if result.flagged
+            else []
+        )
+        is_allowed = not flagged
+
+        result_data = {
+            "is_allowed": is_allowed,
+            "blocked_reason": "; ".join(reason for _, reason in flagged),
+            "confidence": max(
+                (scores[category] for category, _ in flagged), default=0.0
+            ),
+            "categories": scores,
+        }
+
+        if not is_allowed:
+            logger.warning(
+                f"Content blocked for user {user_id}: {result_data['blocked_reason']}"
+            )
+        else:
+            logger.info(f"Content allowed for user {user_id}")
+
+        # Failed calls are not cached, the text is checked again
+        self.moderation_cache.set(self._cache_key(content), result_data)
+        return dict(result_data)
 
     def log_violation(
         self,
@@ -103,8 +355,10 @@ class ContentFilterService:
         content_type: str,
         original_content: str,
         blocked_reason: str,
+        commit: bool = True,
     ) -> ContentFilterLog:
-        """Log a content filter violation"""
+        """Log a content filter violation, pass commit=False to leave it to the
+        caller's transaction"""
         try:
             log_entry = ContentFilterLog(
                 user_id=user_id,
@@ -115,8 +369,8 @@ class ContentFilterService:
             )
 
             db.add(log_entry)
-            db.commit()
-            db.refresh(log_entry)
+            if commit:
+                db.commit()
 
             logger.info(f"Logged content filter violation for user {user_id}")
             return log_entry
@@ -127,27 +381,53 @@ class ContentFilterService:
             raise
 
     def block_chat_session(
-        self, db: Session, session_id: uuid.UUID, blocked_reason: str
+        self,
+        db: Session,
+        session_id: uuid.UUID,
+        blocked_reason: str,
+        commit: bool = True,
+        log_entry: ContentFilterLog | None = None,
     ) -> bool:
-        """Block a chat session after content violation"""
+        """Block a chat session after content violation, inserting `log_entry`
+        with it if given. Pass commit=False to leave it to the caller's
+        transaction, errors are then raised instead of rolled back"""
         try:
-            session = db.get(ChatSession, session_id)
-            if not session:
+            # A single UPDATE instead of loading the session to modify it, a
+            # copy already loaded in this session is updated along with it
+            stmt = (
+                update(ChatSession)
+                .where(ChatSession.id == session_id)
+                .values(
+                    is_blocked=True,
+                    blocked_reason=blocked_reason,
+                    updated_at=utcnow(),
+                )
+                .returning(ChatSession.id)
+            )
+            if log_entry is not None:
+                # The violation log rides along as a CTE of the update, saving
+                # the round trip of flushing it on its own
+                stmt = stmt.add_cte(
+                    insert(ContentFilterLog)
+                    .values(log_entry.model_dump())
+                    .cte("violation_log")
+                )
+            blocked_id = db.scalars(stmt).first()
+            if blocked_id is None:
                 logger.error(f"Chat session {session_id} not found")
                 return False
 
-            session.is_blocked = True
-            session.blocked_reason = blocked_reason
-            session.updated_at = datetime.utcnow()
-
-            db.add(session)
-            db.commit()
+            if commit:
+                db.commit()
 
             logger.info(f"Blocked chat session {session_id} due to: {blocked_reason}")
             return True
 
         except Exception as e:
             logger.error(f"Error blocking chat session: {e}")
+            if not commit:
+                # The transaction and its pending writes are the caller's
+                raise
             db.rollback()
             return False
 
@@ -156,74 +436,116 @@ class ContentFilterService:
         db: Session,
         skip: int = 0,
         limit: int = 100,
-        user_id: Optional[str] = None,
-        content_type: Optional[str] = None,
-    ) -> Dict[str, Any]:
-        """Get content filter logs with optional filtering"""
+        user_id: str | None = None,
+        content_type: str | None = None,
+        after: Cursor | None = None,
+    ) -> dict[str, Any]:
+        """Get content filter logs with optional filtering, newest first, and
+        whether more logs follow.
+
+        With an `after` cursor, skip is ignored and the count only covers the
+        logs from the cursor on.
+        """
+        empty = {
+            "data": [],
+            "count": 0,
+            "skip": skip,
+            "limit": limit,
+            "has_more": False,
+        }
         try:
-            query = select(ContentFilterLog)
+            query = select(ContentFilterLog, func.count().over().label("total"))
 
             if user_id:
-                # Support partial user ID matching using LIKE operator
-                from sqlalchemy import text
-
-                query = query.where(
-                    text("CAST(user_id AS TEXT) ILIKE :user_id_pattern")
-                ).params(user_id_pattern=f"%{user_id}%")
+                try:
+                    # A full user ID is matched exactly, which the
+                    # (user_id, created_at) index serves in order
+                    query = query.where(ContentFilterLog.user_id == uuid.UUID(user_id))
+                except ValueError:
+                    # A partial user ID matches the IDs it starts with, a range
+                    # scan of ix_contentfilterlog_user_id_text. IDs are
+                    # lowercase hex and dashes, nothing else can match
+                    user_id_prefix = user_id.strip().lower()
+                    if not _USER_ID_PREFIX.fullmatch(user_id_prefix):
+                        return empty
+                    query = query.where(
+                        text("user_id::text LIKE :user_id_pattern")
+                    ).params(user_id_pattern=f"{user_id_prefix}%")
 
             if content_type:
                 query = query.where(ContentFilterLog.content_type == content_type)
 
-            # Get total count
-            count_query = query
-            total_count = len(db.exec(count_query).all())
-
-            # Get paginated results
-            logs = db.exec(query.offset(skip).limit(limit)).all()
+            # Get paginated results along with the total count of matching
+            # logs, newest first with the id keeping pages stable. A cursor
+            # starts the page from an index position instead of skipping rows
+            query = query.order_by(
+                ContentFilterLog.created_at.desc(), ContentFilterLog.id.desc()
+            )
+            if after is not None:
+                query = query.where(
+                    tuple_(ContentFilterLog.created_at, ContentFilterLog.id)
+                    < tuple_(*after)
+                )
+            # One extra row tells whether there is a next page
+            offset = skip if after is None else 0
+            rows = db.exec(query.offset(offset).limit(limit + 1)).all()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            logs = [row[0] for row in rows]
+            if rows:
+                total_count = rows[0].total
+            elif skip > 0 and after is None:
+                # Paged past the last log, count separately
+                count_query = select(func.count()).select_from(
+                    query.with_only_columns(ContentFilterLog.id).subquery()
+                )
+                total_count = db.exec(count_query).one()
+            else:
+                total_count = 0
 
-            return {"data": logs, "count": total_count, "skip": skip, "limit": limit}
+            return {
+                "data": logs,
+                "count": total_count,
+                "skip": skip,
+                "limit": limit,
+                "has_more": has_more,
+            }
 
         except Exception as e:
             logger.error(f"Error getting filter logs: {e}")
-            return {"data": [], "count": 0, "skip": skip, "limit": limit}
+            return empty
 
-    def get_filter_statistics(self, db: Session) -> Dict[str, Any]:
-        """Get content filter statistics"""
-        try:
-            # Total violations
-            total_violations = len(db.exec(select(ContentFilterLog)).all())
-
-            # Today's violations
-            today = datetime.utcnow().date()
-            today_violations = len(
-                db.exec(
-                    select(ContentFilterLog).where(ContentFilterLog.created_at >= today)
-                ).all()
-            )
-
-            # Violations by type
-            user_input_violations = len(
-                db.exec(
-                    select(ContentFilterLog).where(
-                        ContentFilterLog.content_type == "user_input"
-                    )
-                ).all()
-            )
-
-            ai_response_violations = len(
-                db.exec(
-                    select(ContentFilterLog).where(
-                        ContentFilterLog.content_type == "ai_response"
-                    )
-                ).all()
-            )
+    def get_filter_statistics(self, db: Session) -> dict[str, Any]:
+        """Get content filter statistics, with how many texts this process
+        allowed without a moderation call"""
+        # Live rather than cached, it is not read from the database
+        counters = {"trivially_safe_count": self.trivially_safe_count}
+        cached = self.statistics_cache.get(self._STATISTICS_KEY)
+        if cached is not None:
+            return {**cached, **counters}
 
-            return {
-                "total_violations": total_violations,
-                "today_violations": today_violations,
-                "user_input_violations": user_input_violations,
-                "ai_response_violations": ai_response_violations,
-            }
+        try:
+            # Every count in one row, the database filters each aggregate
+            # instead of the client running a query per count
+            today = utc_today_start()
+            row = db.exec(
+                select(
+                    func.count().label("total_violations"),
+                    func.count()
+                    .filter(ContentFilterLog.created_at >= today)
+                    .label("today_violations"),
+                    func.count()
+                    .filter(ContentFilterLog.content_type == "user_input")
+                    .label("user_input_violations"),
+                    func.count()
+                    .filter(ContentFilterLog.content_type == "ai_response")
+                    .label("ai_response_violations"),
+                ).select_from(ContentFilterLog)
+            ).one()
+
+            statistics = dict(row._mapping)
+            self.statistics_cache.set(self._STATISTICS_KEY, statistics)
+            return {**statistics, **counters}
 
         except Exception as e:
             logger.error(f"Error getting filter statistics: {e}")
@@ -232,8 +554,88 @@ class ContentFilterService:
                 "today_violations": 0,
                 "user_input_violations": 0,
                 "ai_response_violations": 0,
+                **counters,
             }
 
 
+class StreamingContentFilter:
+    """
+    Moderates a streamed text while it is generated. The text is cut into
+    segments at sentence ends and each segment is checked as soon as it is
+    complete, so by the end of the stream only the last segment is left to
+    wait for.
+    """
+
+    def __init__(
+        self,
+        service: ContentFilterService,
+        user_id: uuid.UUID,
+        session_id: uuid.UUID | None,
+        content_type: str,
+    ):
+        self._service = service
+        self._user_id = user_id
+        self._session_id = session_id
+        self._content_type = content_type
+        self._pieces: list[str] = []
+        self._length = 0
+        self._tasks: list[asyncio.Task] = []
+        # Bounds the moderation requests one stream has in flight
+        self._semaphore = asyncio.Semaphore(settings.CONTENT_FILTER_STREAM_CONCURRENCY)
+
+    def feed(self, text: str) -> None:
+        """Add the next piece of the text, checking the segment it completes"""
+        self._pieces.append(text)
+        self._length += len(text)
+        if self._length >= _STREAM_SEGMENT_MAX_LENGTH or (
+            self._length >= _STREAM_SEGMENT_MIN_LENGTH
+            and text.rstrip(" ").endswith(_SENTENCE_ENDS)
+        ):
+            self._flush()
+
+    def blocked_result(self) -> dict[str, Any] | None:
+        """The result of a finished check that blocked a segment, if any"""
+        for task in self._tasks:
+            if task.done() and not task.result()["is_allowed"]:
+                return task.result()
+        return None
+
+    async def finish(self) -> dict[str, Any]:
+        """Check the rest of the text and wait for every check, returning the
+        first blocking result or an allowing one"""
+        self._flush()
+        results = await asyncio.gather(*self._tasks)
+        for result in results:
+            if not result["is_allowed"]:
+                return result
+        return {
+            "is_allowed": True,
+            "blocked_reason": "",
+            "confidence": max((r["confidence"] for r in results), default=0.0),
+        }
+
+    def cancel(self) -> None:
+        """Drop the checks still running, when the stream is abandoned"""
+        for task in self._tasks:
+            task.cancel()
+
+    def _flush(self) -> None:
+        if not self._pieces:
+            return
+        segment = "".join(self._pieces)
+        self._pieces = []
+        self._length = 0
+        self._tasks.append(asyncio.create_task(self._check(segment)))
+
+    async def _check(self, segment: str) -> dict[str, Any]:
+        async with self._semaphore:
+            return await self._service.afilter_content(
+                content=segment,
+                user_id=self._user_id,
+                session_id=self._session_id,
+                content_type=self._content_type,
+            )
+
+
 # Global instance
 content_filter_service = ContentFilterService()
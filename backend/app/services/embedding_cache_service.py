@@ -0,0 +1,52 @@
+import hashlib
+import logging
+import struct
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session
+
+from app.models import EmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCacheService:
+    """Stores query embeddings in the database so they survive restarts"""
+
+    def _hash(self, model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+    def get(self, db: Session, model: str, text: str) -> list[float] | None:
+        """Get the stored embedding of a text, None if it was never stored"""
+        entry = db.get(EmbeddingCache, self._hash(model, text))
+        if entry is None:
+            return None
+        return list(struct.unpack(f"<{entry.dimensions}e", entry.vector))
+
+    def set(self, db: Session, model: str, text: str, embedding: list[float]) -> None:
+        """Store the embedding of a text, keeping the first one on a race"""
+        try:
+            vector = struct.pack(f"<{len(embedding)}e", *embedding)
+        except (OverflowError, struct.error) as e:
+            # Outside the float16 range, embeddings are normalized so this
+            # only happens with an unexpected model
+            logger.warning("Not caching embedding from %s: %s", model, e)
+            return
+        statement = (
+            insert(EmbeddingCache)
+            .values(
+                EmbeddingCache(
+                    hash=self._hash(model, text),
+                    model=model,
+                    dimensions=len(embedding),
+                    vector=vector,
+                ).model_dump()
+            )
+            .on_conflict_do_nothing(index_elements=["hash"])
+        )
+        db.execute(statement)
+        db.commit()
+
+
+# Global instance
+embedding_cache_service = EmbeddingCacheService()
@@ -1,9 +1,19 @@
 import logging
+import threading
 import uuid
 from typing import List, Dict, Any, Optional
-from datetime import datetime
+from sqlalchemy import literal_column, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlmodel import Session, select
-from app.models import FeatureFlag, FeatureFlagCreate, FeatureFlagUpdate
+from app.core.cache import TTLCache
+from app.core.clock import utcnow
+from app.core.config import settings
+from app.models import (
+    FeatureFlag,
+    FeatureFlagCreate,
+    FeatureFlagPublic,
+    FeatureFlagUpdate,
+)
 from app.core.prompts import (
     FEATURE_FLAG_ACTIVE_HEADER,
     FEATURE_FLAG_INSTRUCTIONS,
@@ -14,7 +24,20 @@ logger = logging.getLogger(__name__)
 
 
 class FeatureFlagService:
+    _ACTIVE_FLAGS_KEY = "active"
+    _PROMPT_TEXT_KEY = "prompt"
+
     def __init__(self):
+        # Detached copies of the enabled flags, safe to share across sessions,
+        # and the prompt text rendered from them
+        self.active_flags_cache: TTLCache[list[FeatureFlagPublic] | str] = TTLCache(
+            maxsize=2, ttl=settings.FEATURE_FLAG_CACHE_TTL
+        )
+        # Lets one thread reload the flags on a miss while the others wait
+        self._active_flags_lock = threading.Lock()
+        # Bumped on every flag write, a reload that raced with a write does
+        # not cache what it read
+        self._cache_version = 0
         self.predefined_flags = {
             "spiritual_parenting": {
                 "name": "Spiritual Parenting",
@@ -51,35 +74,44 @@ class FeatureFlagService:
     def initialize_predefined_flags(self, db: Session) -> List[FeatureFlag]:
         """Initialize predefined feature flags in the database"""
         try:
-            created_flags = []
-
-            for flag_key, flag_data in self.predefined_flags.items():
-                # Check if flag already exists
-                existing_flag = db.exec(
-                    select(FeatureFlag).where(FeatureFlag.name == flag_data["name"])
-                ).first()
-
-                if not existing_flag:
-                    # Create new flag
-                    new_flag = FeatureFlag(
+            now = utcnow()
+            stmt = insert(FeatureFlag).values(
+                [
+                    FeatureFlag(
                         name=flag_data["name"],
                         description=flag_data["description"],
                         is_enabled=flag_data["is_enabled"],
                         is_predefined=True,
-                    )
+                        created_at=now,
+                        updated_at=now,
+                    ).model_dump()
+                    for flag_data in self.predefined_flags.values()
+                ]
+            )
+            # Create missing flags and refresh the description of existing ones
+            # in one statement, rows whose description is unchanged are left
+            # alone. xmax is 0 only for rows this statement inserted.
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[FeatureFlag.name],
+                set_={
+                    "description": stmt.excluded.description,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+                where=FeatureFlag.description.is_distinct_from(
+                    stmt.excluded.description
+                ),
+            ).returning(FeatureFlag, literal_column("xmax = 0"))
 
-                    db.add(new_flag)
-                    created_flags.append(new_flag)
-                    logger.info(f"Created predefined flag: {flag_data['name']}")
+            created_flags = []
+            for flag, created in db.execute(stmt).all():
+                if created:
+                    created_flags.append(flag)
+                    logger.info(f"Created predefined flag: {flag.name}")
                 else:
-                    # Update existing flag if needed
-                    if existing_flag.description != flag_data["description"]:
-                        existing_flag.description = flag_data["description"]
-                        existing_flag.updated_at = datetime.utcnow()
-                        db.add(existing_flag)
-                        logger.info(f"Updated predefined flag: {flag_data['name']}")
+                    logger.info(f"Updated predefined flag: {flag.name}")
 
             db.commit()
+            self._invalidate_active_flags()
             logger.info(f"Initialized {len(created_flags)} predefined feature flags")
             return created_flags
 
@@ -97,16 +129,36 @@ class FeatureFlagService:
             logger.error(f"Error getting feature flags: {e}")
             return []
 
-    def get_active_flags(self, db: Session) -> List[FeatureFlag]:
+    def _invalidate_active_flags(self) -> None:
+        self._cache_version += 1
+        self.active_flags_cache.clear()
+
+    def get_active_flags(self, db: Session) -> list[FeatureFlagPublic]:
         """Get all enabled feature flags"""
-        try:
-            active_flags = db.exec(
-                select(FeatureFlag).where(FeatureFlag.is_enabled == True)
-            ).all()
-            return active_flags
-        except Exception as e:
-            logger.error(f"Error getting active feature flags: {e}")
-            return []
+        cached = self.active_flags_cache.get(self._ACTIVE_FLAGS_KEY)
+        if cached is not None:
+            return cached
+
+        with self._active_flags_lock:
+            # Another thread may have reloaded the flags while this one waited
+            cached = self.active_flags_cache.get(self._ACTIVE_FLAGS_KEY)
+            if cached is not None:
+                return cached
+
+            try:
+                version = self._cache_version
+                active_flags = [
+                    FeatureFlagPublic.model_validate(flag)
+                    for flag in db.exec(
+                        select(FeatureFlag).where(FeatureFlag.is_enabled == True)
+                    ).all()
+                ]
+                if version == self._cache_version:
+                    self.active_flags_cache.set(self._ACTIVE_FLAGS_KEY, active_flags)
+                return active_flags
+            except Exception as e:
+                logger.error(f"Error getting active feature flags: {e}")
+                return []
 
     def get_flag_by_id(self, db: Session, flag_id: uuid.UUID) -> Optional[FeatureFlag]:
         """Get a specific feature flag by ID"""
@@ -122,17 +174,6 @@ class FeatureFlagService:
     ) -> Optional[FeatureFlag]:
         """Create a new feature flag"""
         try:
-            # Check if flag with same name already exists
-            existing_flag = db.exec(
-                select(FeatureFlag).where(FeatureFlag.name == flag_data.name)
-            ).first()
-
-            if existing_flag:
-                logger.warning(
-                    f"Feature flag with name '{flag_data.name}' already exists"
-                )
-                return None
-
             new_flag = FeatureFlag(
                 name=flag_data.name,
                 description=flag_data.description,
@@ -140,9 +181,22 @@ class FeatureFlagService:
                 is_predefined=False,
             )
 
-            db.add(new_flag)
+            # The unique name decides, so two concurrent creates of the same
+            # flag cannot both pass an existence check
+            new_flag = db.scalars(
+                insert(FeatureFlag)
+                .values(new_flag.model_dump())
+                .on_conflict_do_nothing(index_elements=[FeatureFlag.name])
+                .returning(FeatureFlag)
+            ).first()
             db.commit()
-            db.refresh(new_flag)
+            self._invalidate_active_flags()
+
+            if new_flag is None:
+                logger.warning(
+                    f"Feature flag with name '{flag_data.name}' already exists"
+                )
+                return None
 
             logger.info(f"Created feature flag: {flag_data.name}")
             return new_flag
@@ -182,11 +236,11 @@ class FeatureFlagService:
             if flag_data.is_enabled is not None:
                 flag.is_enabled = flag_data.is_enabled
 
-            flag.updated_at = datetime.utcnow()
+            flag.updated_at = utcnow()
 
             db.add(flag)
             db.commit()
-            db.refresh(flag)
+            self._invalidate_active_flags()
 
             logger.info(f"Updated feature flag: {flag.name}")
             return flag
@@ -212,6 +266,7 @@ class FeatureFlagService:
             flag_name = flag.name
             db.delete(flag)
             db.commit()
+            self._invalidate_active_flags()
 
             logger.info(f"Deleted feature flag: {flag_name}")
             return True
@@ -224,17 +279,23 @@ class FeatureFlagService:
     def toggle_flag(self, db: Session, flag_id: uuid.UUID) -> Optional[FeatureFlag]:
         """Toggle a feature flag on/off"""
         try:
-            flag = db.get(FeatureFlag, flag_id)
+            # Flipped in the database, two concurrent toggles cannot both read
+            # the same state and cancel out into one
+            flag = db.scalars(
+                update(FeatureFlag)
+                .where(FeatureFlag.id == flag_id)
+                .values(
+                    is_enabled=~FeatureFlag.is_enabled,
+                    updated_at=utcnow(),
+                )
+                .returning(FeatureFlag)
+            ).first()
             if not flag:
                 logger.error(f"Feature flag {flag_id} not found")
                 return None
 
-            flag.is_enabled = not flag.is_enabled
-            flag.updated_at = datetime.utcnow()
-
-            db.add(flag)
             db.commit()
-            db.refresh(flag)
+            self._invalidate_active_flags()
 
             status = "enabled" if flag.is_enabled else "disabled"
             logger.info(f"Toggled feature flag '{flag.name}' to {status}")
@@ -247,9 +308,19 @@ class FeatureFlagService:
 
     def get_active_flags_prompt_text(self, db: Session) -> str:
         """Get formatted text of active flags for AI prompt"""
+        cached = self.active_flags_cache.get(self._PROMPT_TEXT_KEY)
+        if cached is not None:
+            return cached
+
         try:
+            # Rendered from the flags of one cache version, if a write lands
+            # meanwhile the text is returned but not cached
+            version = self._cache_version
             active_flags = self.get_active_flags(db)
-            return format_feature_flags_prompt(active_flags)
+            prompt_text = format_feature_flags_prompt(active_flags)
+            if version == self._cache_version:
+                self.active_flags_cache.set(self._PROMPT_TEXT_KEY, prompt_text)
+            return prompt_text
         except Exception as e:
             logger.error(f"Error generating active flags prompt: {e}")
             return ""
@@ -257,11 +328,9 @@ class FeatureFlagService:
     def is_feature_available(self, db: Session, feature_name: str) -> bool:
         """Check if a specific feature is available"""
         try:
-            flag = db.exec(
-                select(FeatureFlag).where(FeatureFlag.name == feature_name)
-            ).first()
-
-            return flag.is_enabled if flag else False
+            # Answered from the cached enabled flags, a missing or disabled
+            # flag is simply not among them
+            return any(flag.name == feature_name for flag in self.get_active_flags(db))
 
         except Exception as e:
             logger.error(
@@ -1,20 +1,108 @@
+import hashlib
+import io
+import json
+import logging
 import os
+import shutil
+import sqlite3
 import uuid
-import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
 from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from sqlmodel import Session, select
-from app.models import PDFDocument
+from langchain_core.documents import Document
+from langchain_openai import OpenAIEmbeddings
+from sqlalchemy import delete, text, update
+from sqlmodel import func, select
+
+from app.core.clock import utcnow
 from app.core.config import settings
+from app.core.db import SessionLocal
+from app.core.vectorstore import open_chroma
+from app.models import PDFDocument
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Uploads are copied to disk in blocks of this size, never held in memory whole
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Pages split together while a PDF is processed, and chunks embedded and
+# stored in Chroma together. 250 chunks keep Chroma's inserts in its efficient
+# batch range and split mid-sized PDFs into batches that are embedded in
+# parallel
+PDF_PAGES_PER_BATCH = 8
+EMBEDDING_BATCH_SIZE = 250
+# Applied to the ingesting thread's Chroma SQLite connection with
+# CHROMA_FAST_INGEST. The journal mode is left alone, so an interrupted insert
+# still rolls back, only a power loss can lose the last transactions
+CHROMA_FAST_INGEST_PRAGMAS = (
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "cache_size=-65536",
+    "mmap_size=268435456",
+)
+# Deleting a PDF returns this many free pages of the Chroma SQLite file to the
+# filesystem once more than the threshold have accumulated, full compaction is
+# left to compact_chromadb
+CHROMA_FREE_PAGES_THRESHOLD = 10000
+CHROMA_INCREMENTAL_VACUUM_PAGES = 5000
+
+
+class PDFTooLargeError(ValueError):
+    """Raised when an upload exceeds the allowed size while it is being saved"""
+
+
+class IncompleteUploadError(ValueError):
+    """Raised when a chunked upload is finalized without all of its bytes"""
+
+
+# Postgres NOTIFY channel carrying processing_status_payload as JSON
+PDF_STATUS_CHANNEL = "pdf_status"
+# Statuses after which a document's status no longer changes on its own
+PDF_FINAL_STATUSES = frozenset({"completed", "failed"})
+# Characters of an error message stored on a document and sent in a status
+# notification, the column's length. Encoded as UTF-8 this stays well below
+# the 8000 bytes Postgres allows for a NOTIFY payload
+PDF_ERROR_MESSAGE_MAX_LENGTH = 1000
+
+
+def _copy_upload(source: BinaryIO, dest: BinaryIO, size: int) -> None:
+    """Copy a spooled upload to dest, in the kernel when it is on disk"""
+    # A SpooledTemporaryFile still in memory has no file descriptor to send
+    # from, asking for one would first write it out to a temporary file
+    if getattr(source, "_rolled", True):
+        try:
+            offset = 0
+            while offset < size:
+                sent = os.sendfile(
+                    dest.fileno(), source.fileno(), offset, size - offset
+                )
+                if not sent:
+                    break
+                offset += sent
+            return
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            # No descriptor or no sendfile support, copy what is left
+            dest.seek(0)
+            dest.truncate()
+            source.seek(0)
+    shutil.copyfileobj(source, dest, UPLOAD_CHUNK_SIZE)
+
+
+def processing_status_payload(pdf_document: PDFDocument) -> dict[str, Any]:
+    return {
+        "id": str(pdf_document.id),
+        "processing_status": pdf_document.processing_status,
+        "is_processed": pdf_document.is_processed,
+        "error_message": pdf_document.error_message,
+        "page_count": pdf_document.page_count,
+    }
+
 
 class PDFService:
     def __init__(self):
@@ -29,9 +117,14 @@ class PDFService:
             try:
                 # Initialize OpenAI embeddings
                 self.embedding = OpenAIEmbeddings(
-                    openai_api_key=settings.OPENAI_API_KEY
+                    model=settings.OPENAI_EMBEDDING_MODEL,
+                    dimensions=settings.OPENAI_EMBEDDING_DIMENSIONS,
+                    openai_api_key=settings.OPENAI_API_KEY,
+                )
+                logger.info(
+                    "OpenAI embeddings initialized successfully with model %s",
+                    settings.OPENAI_EMBEDDING_MODEL,
                 )
-                logger.info("OpenAI embeddings initialized successfully")
             except Exception as e:
                 logger.error(f"Failed to initialize OpenAI embeddings: {e}")
                 self.embedding = None
@@ -47,10 +140,27 @@ class PDFService:
         # Persist directory for ChromaDB
         self.persist_directory = "/app/chroma_db"
         Path(self.persist_directory).mkdir(exist_ok=True)
+        self.chroma_db_path = os.path.join(self.persist_directory, "chroma.sqlite3")
 
         # Initialize or load existing vector store
         self.vectordb = self._get_or_create_vectordb()
 
+        # Processing jobs queue here instead of running as request background
+        # tasks, so a burst of uploads cannot occupy the request threadpool
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.PDF_PROCESSING_WORKERS,
+            thread_name_prefix="pdf-processing",
+        )
+        # Jobs that have not finished yet, so the ones a shutdown drops can be
+        # marked failed instead of staying pending forever
+        self.queued_jobs: dict[uuid.UUID, Future] = {}
+        # Embedding requests for a document's chunk batches run here, so the
+        # next batches are embedded while earlier ones are written to Chroma
+        self.embedding_executor = ThreadPoolExecutor(
+            max_workers=settings.PDF_EMBEDDING_WORKERS,
+            thread_name_prefix="pdf-embedding",
+        )
+
     def _get_or_create_vectordb(self) -> Optional[Chroma]:
         """Get existing vector store or create new one"""
         if not self.embedding:
@@ -59,30 +169,42 @@ class PDFService:
             )
             return None
 
+        if not settings.CHROMA_HOST and not os.path.exists(self.chroma_db_path):
+            # auto_vacuum only takes effect if set before the first table is
+            # created, existing files switch over in compact_chromadb
+            conn = sqlite3.connect(self.chroma_db_path)
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.close()
+
         try:
             # Try to load existing vector store
-            vectordb = Chroma(
-                persist_directory=self.persist_directory,
-                embedding_function=self.embedding,
-            )
+            vectordb = open_chroma(self.embedding, self.persist_directory)
             logger.info("ChromaDB vector store loaded successfully")
             return vectordb
         except Exception as e:
             logger.error(f"Failed to load existing ChromaDB: {e}")
             try:
                 # Create new vector store if it doesn't exist
-                vectordb = Chroma(
-                    persist_directory=self.persist_directory,
-                    embedding_function=self.embedding,
-                )
+                vectordb = open_chroma(self.embedding, self.persist_directory)
                 logger.info("New ChromaDB vector store created successfully")
                 return vectordb
             except Exception as e2:
                 logger.error(f"Failed to create new ChromaDB: {e2}")
                 return None
 
-    def save_pdf_file(self, file_content: bytes, filename: str) -> str:
-        """Save PDF file to storage and return the file path"""
+    def _apply_fast_ingest_pragmas(self, vectordb: Chroma) -> None:
+        """Tune the calling thread's Chroma SQLite connection for bulk inserts"""
+        try:
+            # Chroma pools one connection per thread, these settings apply to
+            # the processing thread's connection only
+            conn = vectordb._client._server._sysdb._conn_pool.connect()
+            for pragma in CHROMA_FAST_INGEST_PRAGMAS:
+                conn.execute(f"PRAGMA {pragma}")
+        except Exception as e:
+            logger.warning(f"Could not tune ChromaDB for ingest: {e}")
+
+    def allocate_pdf_path(self, filename: str) -> Path:
+        """Return a new unique storage path for an uploaded PDF"""
         # Create date-based directory structure
         today = datetime.now()
         date_path = self.pdf_storage_path / str(today.year) / str(today.month).zfill(2)
@@ -92,75 +214,160 @@ class PDFService:
         file_uuid = str(uuid.uuid4())
         file_extension = Path(filename).suffix
         unique_filename = f"{file_uuid}{file_extension}"
-        file_path = date_path / unique_filename
+        return date_path / unique_filename
+
+    def save_pdf_file(
+        self, source: BinaryIO, filename: str, max_size: int
+    ) -> tuple[str, int]:
+        """Stream an uploaded PDF to storage, return the file path and its size"""
+        # The upload is already spooled by the server, its size is known
+        # without reading it, so an oversized file is rejected before copying
+        file_size = source.seek(0, os.SEEK_END)
+        source.seek(0)
+        if file_size > max_size:
+            raise PDFTooLargeError(
+                f"File size ({file_size / (1024 * 1024):.2f} MB) exceeds the "
+                f"maximum allowed size of {max_size // (1024 * 1024)} MB."
+            )
 
-        # Save file
-        with open(file_path, "wb") as f:
-            f.write(file_content)
+        file_path = self.allocate_pdf_path(filename)
+        try:
+            # Unbuffered, every block goes to the file in a single write
+            with open(file_path, "wb", buffering=0) as f:
+                _copy_upload(source, f, file_size)
+        except BaseException:
+            file_path.unlink(missing_ok=True)
+            raise
+
+        return str(file_path), file_size
+
+    def _upload_part_path(self, file_path: str) -> Path:
+        return Path(f"{file_path}.part")
+
+    def write_upload_chunk(self, file_path: str, offset: int, data: bytes) -> None:
+        """Write one chunk of a chunked upload at its offset"""
+        # Chunks may arrive in any order and in parallel, positional writes
+        # into the part file need no coordination between them
+        fd = os.open(self._upload_part_path(file_path), os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            os.pwrite(fd, data, offset)
+        finally:
+            os.close(fd)
+
+    def expire_abandoned_uploads(self) -> int:
+        """Delete chunked uploads that were started but never finalized, with
+        their partial files, and return how many were removed"""
+        cutoff = utcnow() - timedelta(seconds=settings.PDF_UPLOAD_EXPIRE_SECONDS)
+        with SessionLocal() as db:
+            filenames = db.scalars(
+                delete(PDFDocument)
+                .where(
+                    PDFDocument.processing_status == "uploading",
+                    PDFDocument.created_at < cutoff,
+                )
+                .returning(PDFDocument.filename)
+            ).all()
+            db.commit()
+        for filename in filenames:
+            self._upload_part_path(filename).unlink(missing_ok=True)
+        if filenames:
+            logger.info(f"Removed {len(filenames)} abandoned PDF uploads")
+        return len(filenames)
+
+    def finalize_upload(
+        self, file_path: str, expected_size: int, sha256: str | None = None
+    ) -> None:
+        """Check a chunked upload is complete and move it to its final path"""
+        part_path = self._upload_part_path(file_path)
+        try:
+            size = part_path.stat().st_size
+        except FileNotFoundError:
+            raise IncompleteUploadError("No chunks were uploaded")
+        if size != expected_size:
+            raise IncompleteUploadError(f"Uploaded {size} of {expected_size} bytes")
+
+        # The size alone cannot tell a skipped chunk in the middle, the
+        # checksum can
+        if sha256 is not None:
+            digest = hashlib.sha256()
+            with open(part_path, "rb") as f:
+                while chunk := f.read(UPLOAD_CHUNK_SIZE):
+                    digest.update(chunk)
+            if digest.hexdigest() != sha256.lower():
+                raise IncompleteUploadError("Checksum does not match")
+
+        os.replace(part_path, file_path)
+
+    def _update_document(
+        self, pdf_id: uuid.UUID, durable: bool = True, **values: Any
+    ) -> PDFDocument | None:
+        """
+        Write processing results in a short session of their own and announce
+        the new status on the PDF_STATUS_CHANNEL. Pass durable=False for
+        transient states, their commit does not wait for the WAL flush
+        """
+        with SessionLocal() as db:
+            if not durable:
+                db.execute(text("SET LOCAL synchronous_commit TO OFF"))
+            pdf_document = db.scalars(
+                update(PDFDocument)
+                .where(PDFDocument.id == pdf_id)
+                .values(updated_at=utcnow(), **values)
+                .returning(PDFDocument)
+            ).first()
+            if pdf_document is not None:
+                # Delivered to listeners when the transaction commits. Non-ASCII
+                # text is sent as is, escaping it could exceed the size limit
+                status = processing_status_payload(pdf_document)
+                if status["error_message"]:
+                    status["error_message"] = status["error_message"][
+                        :PDF_ERROR_MESSAGE_MAX_LENGTH
+                    ]
+                payload = json.dumps(status, ensure_ascii=False)
+                db.execute(select(func.pg_notify(PDF_STATUS_CHANNEL, payload)))
+            db.commit()
+            return pdf_document
+
+    def get_processing_status(self, pdf_id: uuid.UUID) -> dict[str, Any] | None:
+        """Read a document's current status in a short session of its own"""
+        with SessionLocal() as db:
+            pdf_document = db.get(PDFDocument, pdf_id)
+            if pdf_document is None:
+                return None
+            return processing_status_payload(pdf_document)
+
+    def process_pdf(
+        self, pdf_id: uuid.UUID, remove_stale: bool = False
+    ) -> dict[str, Any]:
+        """Process PDF document using LangChain approach. With remove_stale,
+        embeddings of the document that this run did not write are deleted
+        once it is done"""
+        # Runs after the response is sent, so it does not borrow the request's
+        # session. A connection is only held while the status is written, not
+        # while the PDF is parsed and embedded.
+        # The processing state is overwritten as soon as the document is done,
+        # losing it in a crash only shows the document as not yet started
+        pdf_document = self._update_document(
+            pdf_id, durable=False, processing_status="processing"
+        )
+        if not pdf_document:
+            logger.error(f"PDF document {pdf_id} not found for processing")
+            return {"status": "error", "error": "PDF document not found"}
 
-        return str(file_path)
+        # Chunk batches whose embeddings are being requested, stored in order
+        embedding_batches: deque[tuple[Future, list[Document], list[str]]] = deque()
+        stored_ids: set[str] = set()
 
-    def process_pdf(self, pdf_document: PDFDocument, db: Session) -> Dict[str, Any]:
-        """Process PDF document using LangChain approach"""
         try:
             logger.info(f"Starting PDF processing for document: {pdf_document.title}")
 
-            # Update status to processing
-            pdf_document.processing_status = "processing"
-            db.commit()
-
             # Check if file exists
             if not os.path.exists(pdf_document.filename):
                 raise Exception(f"PDF file not found: {pdf_document.filename}")
 
-            # Use PyPDFLoader to load the specific PDF file
-            logger.info(f"Loading PDF from: {pdf_document.filename}")
-            loader = PyPDFLoader(pdf_document.filename)
-            pdf_docs = loader.load()
-
-            if not pdf_docs:
-                raise Exception("No documents found in PDF")
-
-            logger.info(f"Loaded {len(pdf_docs)} pages from PDF")
-
-            # Split documents into chunks
-            logger.info("Splitting documents into chunks...")
-            chunks = self.text_splitter.split_documents(pdf_docs)
-            logger.info(f"Created {len(chunks)} chunks from PDF")
-
-            # Add metadata to chunks
-            logger.info("Adding metadata to chunks...")
-            for i, chunk in enumerate(chunks):
-                chunk.metadata.update(
-                    {
-                        "pdf_id": str(pdf_document.id),
-                        "pdf_title": pdf_document.title,
-                        "owner_id": str(pdf_document.owner_id),
-                        "source": "pdf_upload",
-                        "upload_date": pdf_document.created_at.isoformat(),
-                        "chunk_index": i,
-                        "total_chunks": len(chunks),
-                        "file_size": pdf_document.file_size,
-                    }
-                )
-
-            # Debug log: Confirm embedding function and API key
-            if self.embedding:
-                logger.info(f"Embedding function: {self.embedding}")
-                api_key = getattr(self.embedding, "openai_api_key", None)
-                if api_key:
-                    # Handle SecretStr object properly
-                    api_key_str = (
-                        str(api_key.get_secret_value())
-                        if hasattr(api_key, "get_secret_value")
-                        else str(api_key)
-                    )
-                    logger.info(
-                        f"OpenAI API key (first 8 chars): {api_key_str[:8]}... (length: {len(api_key_str)})"
-                    )
-                else:
-                    logger.warning("OpenAI API key not found in embedding instance!")
-            else:
+            # The embeddings are checked once at startup, only their absence
+            # is worth repeating per document
+            if not self.embedding:
                 logger.warning("No embedding function available!")
 
             # Try to get or reinitialize ChromaDB for background task
@@ -168,45 +375,140 @@ class PDFService:
             if not vectordb and self.embedding:
                 try:
                     logger.info("Reinitializing ChromaDB for background task...")
-                    vectordb = Chroma(
-                        persist_directory=self.persist_directory,
-                        embedding_function=self.embedding,
-                    )
+                    vectordb = open_chroma(self.embedding, self.persist_directory)
                     logger.info("ChromaDB reinitialized successfully")
                 except Exception as e:
                     logger.error(f"Failed to reinitialize ChromaDB: {e}")
                     vectordb = None
             if not vectordb:
                 logger.error(
-                    f"vectordb is None. self.embedding: {self.embedding}, self.persist_directory: {self.persist_directory}"
+                    "vectordb is None, embeddings available: %s, "
+                    "persist directory: %s",
+                    self.embedding is not None,
+                    self.persist_directory,
                 )
-            # Add documents to vector store if available
-            vector_store_updated = False
-            if vectordb:
-                try:
-                    logger.info("Adding chunks to ChromaDB...")
-                    vectordb.add_documents(chunks)
+                logger.warning("ChromaDB not available. Skipping vector storage.")
+            elif settings.CHROMA_FAST_INGEST and not settings.CHROMA_HOST:
+                self._apply_fast_ingest_pragmas(vectordb)
+
+            # Use PyPDFLoader to load the specific PDF file. Pages are read
+            # lazily and split, embedded and stored a batch at a time, so a
+            # long document never has all of its pages and chunks in memory
+            logger.info(f"Loading PDF from: {pdf_document.filename}")
+            loader = PyPDFLoader(pdf_document.filename)
 
-                    # Persist the vector store (new langchain_chroma handles this automatically)
-                    logger.info("Successfully saved to ChromaDB")
-                    vector_store_updated = True
+            # The document's ids are formatted once, not for every chunk
+            pdf_id_str = str(pdf_document.id)
+            metadata = {
+                "pdf_id": pdf_id_str,
+                "pdf_title": pdf_document.title,
+                "owner_id": str(pdf_document.owner_id),
+                "source": "pdf_upload",
+                "upload_date": pdf_document.created_at.isoformat(),
+                "file_size": pdf_document.file_size,
+            }
+            page_count = 0
+            chunk_count = 0
+            vector_store_updated = vectordb is not None
+
+            pending_chunks: list[Document] = []
+            pending_ids: list[str] = []
+
+            def store_oldest_batch() -> None:
+                nonlocal vector_store_updated
+                future, chunks, ids = embedding_batches.popleft()
+                if not vector_store_updated:
+                    future.cancel()
+                    return
+                try:
+                    # Embedded already, so the vectors go to the collection
+                    # directly instead of being computed again by the wrapper
+                    vectordb._collection.upsert(
+                        ids=ids,
+                        embeddings=future.result(),
+                        documents=[chunk.page_content for chunk in chunks],
+                        metadatas=[chunk.metadata for chunk in chunks],
+                    )
+                    stored_ids.update(ids)
                 except Exception as e:
+                    # Keep counting the remaining pages, the document is
+                    # still marked processed as it was before batching
                     logger.error(f"Error saving to ChromaDB: {e}")
                     vector_store_updated = False
-            else:
-                logger.warning("ChromaDB not available. Skipping vector storage.")
+
+            def flush_chunks(force: bool = False) -> None:
+                # Chunks from several page batches go to Chroma together, one
+                # embedding request and one insert per EMBEDDING_BATCH_SIZE
+                if not pending_chunks or (
+                    not force and len(pending_chunks) < EMBEDDING_BATCH_SIZE
+                ):
+                    return
+                if vector_store_updated:
+                    texts = [chunk.page_content for chunk in pending_chunks]
+                    embedding_batches.append(
+                        (
+                            self.embedding_executor.submit(
+                                self.embedding.embed_documents, texts
+                            ),
+                            pending_chunks[:],
+                            pending_ids[:],
+                        )
+                    )
+                    # Wait for the oldest batch once enough are in flight
+                    while len(embedding_batches) > settings.PDF_EMBEDDING_WORKERS:
+                        store_oldest_batch()
+                pending_chunks.clear()
+                pending_ids.clear()
+
+            def split_batch(pages: list[Document]) -> None:
+                nonlocal chunk_count
+                chunks = self.text_splitter.split_documents(pages)
+
+                # Ids derived from the page and the chunk's position on it
+                # make reprocessing overwrite the same entries
+                page_chunks: dict[int, int] = {}
+                for chunk in chunks:
+                    page = chunk.metadata.get("page", 0)
+                    index = page_chunks[page] = page_chunks.get(page, -1) + 1
+                    pending_ids.append(f"{pdf_id_str}:{page}:{index}")
+                    chunk.metadata.update(metadata, chunk_index=chunk_count)
+                    pending_chunks.append(chunk)
+                    chunk_count += 1
+                flush_chunks()
+
+            batch: list[Document] = []
+            for page in loader.lazy_load():
+                batch.append(page)
+                page_count += 1
+                if len(batch) == PDF_PAGES_PER_BATCH:
+                    split_batch(batch)
+                    logger.info(f"Processed {page_count} pages, {chunk_count} chunks")
+                    batch = []
+            split_batch(batch)
+            flush_chunks(force=True)
+            while embedding_batches:
+                store_oldest_batch()
+
+            if not page_count:
+                raise Exception("No documents found in PDF")
+
+            logger.info(f"Created {chunk_count} chunks from {page_count} pages")
+            if vector_store_updated:
+                logger.info("Successfully saved to ChromaDB")
+                if remove_stale:
+                    self._delete_stale_embeddings(vectordb, pdf_id, stored_ids)
 
             # Update document status - this should happen regardless of ChromaDB status
             try:
-                pdf_document.is_processed = True
-                pdf_document.processing_status = "completed"
-                pdf_document.page_count = len(pdf_docs)
-                db.add(pdf_document)
-                db.commit()
+                self._update_document(
+                    pdf_id,
+                    is_processed=True,
+                    processing_status="completed",
+                    page_count=page_count,
+                )
                 logger.info(f"Database status updated for: {pdf_document.title}")
             except Exception as e:
                 logger.error(f"Error updating database status: {e}")
-                db.rollback()
                 raise
 
             logger.info(
@@ -215,40 +517,46 @@ class PDFService:
 
             return {
                 "status": "success",
-                "chunks_processed": len(chunks),
-                "page_count": len(pdf_docs),
+                "chunks_processed": chunk_count,
+                "page_count": page_count,
                 "vector_store_updated": vector_store_updated,
             }
 
         except Exception as e:
             logger.error(f"Error processing PDF {pdf_document.title}: {str(e)}")
+            for future, _, _ in embedding_batches:
+                future.cancel()
 
             # Update status to failed
-            pdf_document.processing_status = "failed"
-            pdf_document.error_message = str(e)
-            db.commit()
+            self._update_document(
+                pdf_id,
+                processing_status="failed",
+                error_message=str(e)[:PDF_ERROR_MESSAGE_MAX_LENGTH],
+            )
 
             return {"status": "error", "error": str(e)}
 
     def search_similar_chunks(
         self, query: str, owner_id: uuid.UUID = None, limit: int = 5
     ) -> List[Dict[str, Any]]:
-        """Search for similar chunks in all documents using LangChain retriever (Global access)"""
-        try:
-            # Create retriever
-            retriever = self.vectordb.as_retriever(search_kwargs={"k": limit})
+        """Search for similar chunks in all documents (Global access)"""
+        if not self.vectordb:
+            logger.warning("ChromaDB not available. Cannot search chunks.")
+            return []
 
-            # Get relevant documents from all PDFs
-            docs = retriever.get_relevant_documents(query)
+        try:
+            # Query the vector store directly rather than through a per-call
+            # retriever wrapper, which also lets the distances come back
+            docs_and_scores = self.vectordb.similarity_search_with_score(query, k=limit)
 
             # Format results (no owner_id filtering for global access)
             formatted_results = []
-            for doc in docs:
+            for doc, score in docs_and_scores:
                 formatted_results.append(
                     {
                         "content": doc.page_content,
                         "metadata": doc.metadata,
-                        "score": None,  # LangChain doesn't provide scores by default
+                        "score": score,  # Distance, lower is more similar
                     }
                 )
 
@@ -269,44 +577,25 @@ class PDFService:
 
             logger.info(f"Attempting to delete embeddings for PDF ID: {pdf_id}")
 
-            # Use the correct ChromaDB deletion method
-            # First, get all documents with metadata filter
-            results = self.vectordb.get(where={"pdf_id": str(pdf_id)})
-
-            if not results or not results.get("ids"):
-                logger.info(f"No documents found for PDF ID: {pdf_id}")
+            where = {"pdf_id": str(pdf_id)}
+            # An id-only existence check, a PDF without embeddings skips the
+            # delete and the compaction below
+            existing = self.vectordb._collection.get(where=where, include=[], limit=1)
+            if not existing["ids"]:
+                logger.info(f"No ChromaDB documents found for PDF {pdf_id}")
                 return True
 
-            # Delete documents using the where clause (more efficient)
-            logger.info(
-                f"Deleting {len(results['ids'])} documents from ChromaDB for PDF {pdf_id}"
-            )
-            self.vectordb.delete(where={"pdf_id": str(pdf_id)})
-            logger.info(
-                f"Successfully deleted {len(results['ids'])} documents from ChromaDB"
-            )
+            # A single filtered delete, without first fetching the matching
+            # documents just to count them
+            self.vectordb.delete(where=where)
+            logger.info(f"Deleted ChromaDB documents for PDF {pdf_id}")
 
-            # Compact the collection to reclaim space
+            # Reclaim space a slice at a time once enough has been freed,
+            # instead of rewriting the whole file with VACUUM on every delete
             try:
-                logger.info("Compacting ChromaDB collection to reclaim space...")
-                import sqlite3
-                import os
-
-                # Get the database path
-                db_path = os.path.join(self.persist_directory, "chroma.sqlite3")
-
-                if os.path.exists(db_path):
-                    # Connect and run VACUUM to reclaim space
-                    conn = sqlite3.connect(db_path)
-                    conn.execute("VACUUM")
-                    conn.close()
-                    logger.info(
-                        "Successfully compacted ChromaDB collection using SQLite VACUUM"
-                    )
-                else:
-                    logger.warning("ChromaDB database file not found for compaction")
+                self._release_free_pages()
             except Exception as e:
-                logger.warning(f"Failed to compact ChromaDB collection: {e}")
+                logger.warning(f"Failed to reclaim ChromaDB space: {e}")
 
             return True
 
@@ -315,6 +604,43 @@ class PDFService:
             # Don't raise the exception, just log it and continue
             return False
 
+    def _delete_stale_embeddings(
+        self, vectordb: Chroma, pdf_id: uuid.UUID, keep_ids: set[str]
+    ) -> None:
+        """Delete a PDF's embeddings other than keep_ids, such as chunks a
+        previous run produced that this one did not"""
+        try:
+            existing = vectordb._collection.get(
+                where={"pdf_id": str(pdf_id)}, include=[]
+            )["ids"]
+            stale = [id_ for id_ in existing if id_ not in keep_ids]
+            if stale:
+                vectordb._collection.delete(ids=stale)
+                logger.info(f"Deleted {len(stale)} stale chunks of PDF {pdf_id}")
+        except Exception as e:
+            logger.warning(f"Could not delete stale chunks of PDF {pdf_id}: {e}")
+
+    def _release_free_pages(self) -> None:
+        # A Chroma server manages its own storage
+        if settings.CHROMA_HOST or not os.path.exists(self.chroma_db_path):
+            return
+        conn = sqlite3.connect(self.chroma_db_path)
+        try:
+            # Fold the delete written to the WAL back into the database and
+            # truncate the log, a no-op outside WAL mode. Unlike VACUUM this
+            # only touches the recent writes
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if free_pages > CHROMA_FREE_PAGES_THRESHOLD:
+                # A no-op unless auto_vacuum is incremental, the pragma only
+                # runs to completion once all of its rows are fetched
+                conn.execute(
+                    f"PRAGMA incremental_vacuum({CHROMA_INCREMENTAL_VACUUM_PAGES})"
+                ).fetchall()
+                logger.info(f"Released free pages of ChromaDB ({free_pages} free)")
+        finally:
+            conn.close()
+
     def get_retriever(self, owner_id: uuid.UUID = None, search_kwargs: Dict = None):
         """Get a retriever for the vector store with global access (no filtering)"""
         if not self.vectordb:
@@ -379,38 +705,65 @@ class PDFService:
             logger.error(f"Error getting ChromaDB stats: {e}")
             return {"error": str(e)}
 
-    def reprocess_pdf(self, pdf_document: PDFDocument, db: Session) -> Dict[str, Any]:
-        """Reprocess a PDF document (useful for failed documents)"""
-        logger.info(f"Reprocessing PDF: {pdf_document.title}")
+    def enqueue_processing(self, pdf_id: uuid.UUID, reprocess: bool = False) -> Future:
+        """Queue a PDF for (re)processing on the processing workers"""
+        job = self.reprocess_pdf if reprocess else self.process_pdf
+        future = self.executor.submit(job, pdf_id)
+        self.queued_jobs[pdf_id] = future
+        future.add_done_callback(lambda _: self._forget_job(pdf_id, future))
+        return future
+
+    def _forget_job(self, pdf_id: uuid.UUID, future: Future) -> None:
+        # A document queued again in the meantime keeps its newer job
+        if self.queued_jobs.get(pdf_id) is future and not future.cancelled():
+            del self.queued_jobs[pdf_id]
+
+    def shutdown(self) -> None:
+        """Drop queued jobs, marking their documents failed, and wait for the
+        running ones to finish"""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.embedding_executor.shutdown(wait=True, cancel_futures=True)
+        for pdf_id, future in list(self.queued_jobs.items()):
+            if not future.cancelled():
+                continue
+            try:
+                self._update_document(
+                    pdf_id,
+                    processing_status="failed",
+                    error_message="Processing was interrupted by a server "
+                    "shutdown, reprocess the document",
+                )
+            except Exception as e:
+                logger.error(f"Error marking PDF {pdf_id} as failed: {e}")
+        self.queued_jobs.clear()
 
-        # First, delete existing embeddings for this PDF
-        try:
-            self.delete_pdf_embeddings(pdf_document.id)
-            logger.info(f"Deleted existing embeddings for PDF: {pdf_document.title}")
-        except Exception as e:
-            logger.warning(f"Could not delete existing embeddings: {e}")
+    def reprocess_pdf(self, pdf_id: uuid.UUID) -> dict[str, Any]:
+        """Reprocess a PDF document (useful for failed documents)"""
+        logger.info(f"Reprocessing PDF: {pdf_id}")
 
-        # Then reprocess
-        return self.process_pdf(pdf_document, db)
+        # Chunk ids are deterministic, so the new chunks overwrite the old
+        # ones in place and the document stays searchable throughout. Only
+        # chunks the new run no longer produces are deleted afterwards
+        return self.process_pdf(pdf_id, remove_stale=True)
 
     def compact_chromadb(self) -> Dict[str, Any]:
         """Compact the ChromaDB collection to reclaim space"""
         try:
             if not self.vectordb:
                 return {"error": "ChromaDB not available"}
+            if settings.CHROMA_HOST:
+                return {"error": "ChromaDB runs on a server, compact it there"}
 
             logger.info("Compacting ChromaDB collection to reclaim space...")
 
             # For ChromaDB 0.6.3, we need to use SQLite VACUUM
-            import sqlite3
-            import os
-
-            # Get the database path
-            db_path = os.path.join(self.persist_directory, "chroma.sqlite3")
+            db_path = self.chroma_db_path
 
             if os.path.exists(db_path):
-                # Connect and run VACUUM to reclaim space
+                # Connect and run VACUUM to reclaim space. The rebuild also
+                # switches files created before incremental vacuuming over
                 conn = sqlite3.connect(db_path)
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
                 conn.execute("VACUUM")
                 conn.close()
                 logger.info(
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import logging
+import uuid
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+import psycopg
+
+from app.core.db import engine
+from app.services.pdf_service import PDF_STATUS_CHANNEL, pdf_service
+
+logger = logging.getLogger(__name__)
+
+
+class PDFStatusBroadcaster:
+    """
+    Fans the processing status notifications Postgres sends on
+    PDF_STATUS_CHANNEL out to the subscribers in this process.
+
+    One LISTEN connection per process serves every subscriber, it is opened
+    on the first subscription and reopened if it drops. Once listening, the
+    current statuses are published again to cover the changes it missed.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: dict[uuid.UUID, set[asyncio.Queue]] = {}
+        self._listener: asyncio.Task | None = None
+
+    def _conninfo(self) -> str:
+        # psycopg takes a plain libpq URL, without SQLAlchemy's driver suffix
+        return engine.url.set(drivername="postgresql").render_as_string(
+            hide_password=False
+        )
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    self._conninfo(), autocommit=True
+                ) as conn:
+                    await conn.execute(f"LISTEN {PDF_STATUS_CHANNEL}")
+                    # Notifications sent while not listening are lost, a
+                    # subscriber could then wait forever for its final status
+                    await self._publish_current_statuses()
+                    async for notify in conn.notifies():
+                        self._publish(json.loads(notify.payload))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("PDF status listener failed, reconnecting")
+                await asyncio.sleep(1)
+
+    async def _publish_current_statuses(self) -> None:
+        """Publish the current status of every document with subscribers"""
+        for pdf_id in list(self._subscribers):
+            status = await asyncio.to_thread(pdf_service.get_processing_status, pdf_id)
+            if status is not None:
+                self._publish(status)
+
+    def _publish(self, status: dict[str, Any]) -> None:
+        for queue in self._subscribers.get(uuid.UUID(status["id"]), ()):
+            queue.put_nowait(status)
+
+    @asynccontextmanager
+    async def subscribe(self, pdf_id: uuid.UUID) -> AsyncIterator[asyncio.Queue]:
+        """Receive the status updates of one PDF document while in the block"""
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(pdf_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers[pdf_id]
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[pdf_id]
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+# Global instance
+pdf_status_broadcaster = PDFStatusBroadcaster()
@@ -0,0 +1,240 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app import crud
+from app.core.clock import utcnow
+from app.core.config import settings
+from app.models import ChatMessage
+from app.tests.utils.chat import create_random_chat_message, create_random_chat_session
+from app.tests.utils.utils import random_lower_string
+
+SESSIONS_URL = f"{settings.API_V1_STR}/chat/sessions"
+
+
+@pytest.fixture(scope="module")
+def user_id(
+    db: Session,
+    normal_user_token_headers: dict[str, str],  # noqa: ARG001
+) -> uuid.UUID:
+    # Looked up once per module, normal_user_token_headers makes sure the user
+    # exists. The id is kept rather than the user, which expires on every commit
+    user = crud.get_user_by_email(session=db, email=settings.EMAIL_TEST_USER)
+    assert user
+    return user.id
+
+
+def test_read_chat_sessions_count(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    db: Session,
+    user_id: uuid.UUID,
+) -> None:
+    for _ in range(3):
+        create_random_chat_session(db, user_id)
+    response = client.get(
+        SESSIONS_URL,
+        headers=normal_user_token_headers,
+        params={"limit": 2, "include_count": True},
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert len(content["data"]) == 2
+    assert content["count"] >= 3
+    assert content["has_more"] is True
+
+
+def test_read_chat_sessions_count_past_last_page(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    db: Session,
+    user_id: uuid.UUID,
+) -> None:
+    create_random_chat_session(db, user_id)
+    response = client.get(
+        SESSIONS_URL,
+        headers=normal_user_token_headers,
+        params={"skip": 10000, "include_count": True},
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert content["data"] == []
+    assert content["count"] >= 1
+
+
+def test_read_chat_messages(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    db: Session,
+    user_id: uuid.UUID,
+) -> None:
+    chat_session = create_random_chat_session(db, user_id)
+    first = create_random_chat_message(db, chat_session.id)
+    create_random_chat_message(db, chat_session.id, role="assistant")
+    response = client.get(
+        f"{SESSIONS_URL}/{chat_session.id}/messages",
+        headers=normal_user_token_headers,
+        params={"limit": 1, "include_count": True},
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert content["count"] == 2
+    assert content["has_more"] is True
+    assert len(content["data"]) == 1
+    assert content["data"][0]["id"] == str(first.id)
+
+
+def test_read_chat_messages_without_count(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    db: Session,
+    user_id: uuid.UUID,
+) -> None:
+    chat_session = create_random_chat_session(db, user_id)
+    create_random_chat_message(db, chat_session.id)
+    response = client.get(
+        f"{SESSIONS_URL}/{chat_session.id}/messages",
+        headers=normal_user_token_headers,
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert len(content["data"]) == 1
+    assert content["count"] is None
+    assert content["has_more"] is False
+
+
+def test_read_chat_messages_after_cursor(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    db: Session,
+    user_id: uuid.UUID,
+) -> None:
+    chat_session = create_random_chat_session(db, user_id)
+    messages = [create_random_chat_message(db, chat_session.id) for _ in range(3)]
+    url = f"{SESSIONS_URL}/{chat_session.id}/messages"
+    response = client.get(url, headers=normal_user_token_headers, params={"limit": 2})
+    assert response.status_code == 200
+    content = response.json()
+    assert [m["id"] for m in content["data"]] == [str(m.id) for m in messages[:2]]
+    assert content["next_cursor"]
+
+    response = client.get(
+        url,
+        headers=normal_user_token_headers,
+        params={"limit": 2, "after": content["next_cursor"]},
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert [m["id"] for m in content["data"]] == [str(messages[2].id)]
+    assert content["next_cursor"] is None
+
+
+def test_read_chat_messages_invalid_cursor(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    db: Session,
+    user_id: uuid.UUID,
+) -> None:
+    chat_session = create_random_chat_session(db, user_id)
+    response = client.get(
+        f"{SESSIONS_URL}/{chat_session.id}/messages",
+        headers=normal_user_token_headers,
+        params={"after": "not-a-cursor"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_read_chat_messages_not_found(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    db: Session,
+    user_id: uuid.UUID,
+) -> None:
+    chat_session = create_random_chat_session(db, user_id)
+    response = client.get(
+        f"{SESSIONS_URL}/{chat_session.id}/messages",
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Chat session not found"
+
+
+def test_read_chat_messages_head(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    db: Session,
+    user_id: uuid.UUID,
+) -> None:
+    chat_session = create_random_chat_session(db, user_id)
+    messages = [create_random_chat_message(db, chat_session.id) for _ in range(3)]
+    url = f"{SESSIONS_URL}/{chat_session.id}/messages/head"
+    response = client.get(url, headers=normal_user_token_headers, params={"limit": 2})
+    assert response.status_code == 200
+    content = response.json()
+    assert [m["id"] for m in content["data"]] == [str(m.id) for m in messages[1:]]
+    assert content["next_cursor"]
+
+    response = client.get(
+        url,
+        headers=normal_user_token_headers,
+        params={"limit": 2, "before": content["next_cursor"]},
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert [m["id"] for m in content["data"]] == [str(messages[0].id)]
+    assert content["next_cursor"] is None
+
+
+def test_read_chat_messages_head_same_timestamp(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    db: Session,
+    user_id: uuid.UUID,
+) -> None:
+    chat_session = create_random_chat_session(db, user_id)
+    # Every message shares the page boundary's timestamp
+    created_at = utcnow()
+    messages = [
+        ChatMessage(
+            session_id=chat_session.id,
+            content=random_lower_string(),
+            role="user",
+            created_at=created_at,
+        )
+        for _ in range(3)
+    ]
+    db.add_all(messages)
+    db.commit()
+    expected = sorted(str(message.id) for message in messages)
+
+    url = f"{SESSIONS_URL}/{chat_session.id}/messages/head"
+    seen: list[str] = []
+    params: dict[str, str | int] = {"limit": 2}
+    while True:
+        response = client.get(url, headers=normal_user_token_headers, params=params)
+        assert response.status_code == 200
+        content = response.json()
+        seen = [m["id"] for m in content["data"]] + seen
+        if content["next_cursor"] is None:
+            break
+        params["before"] = content["next_cursor"]
+    assert seen == expected
+
+
+def test_read_chat_messages_head_invalid_cursor(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    db: Session,
+    user_id: uuid.UUID,
+) -> None:
+    chat_session = create_random_chat_session(db, user_id)
+    response = client.get(
+        f"{SESSIONS_URL}/{chat_session.id}/messages/head",
+        headers=normal_user_token_headers,
+        params={"before": "not-a-cursor"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
@@ -0,0 +1,165 @@
+import uuid
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.core.clock import utcnow
+from app.core.config import settings
+from app.models import ContentFilterLog
+from app.services.content_filter_service import content_filter_service
+from app.tests.utils.content_filter import create_random_content_filter_log
+from app.tests.utils.user import create_random_user
+
+LOGS_URL = f"{settings.API_V1_STR}/content-filter/logs"
+STATISTICS_URL = f"{settings.API_V1_STR}/content-filter/statistics"
+
+
+@pytest.fixture(scope="module")
+def user_logs(db: Session) -> list[ContentFilterLog]:
+    """Logs of a user of their own, newest first. The two newest share a
+    timestamp, so pages must break ties by id"""
+    user = create_random_user(db)
+    now = utcnow()
+    timestamps = [now, now] + [now - timedelta(minutes=i) for i in range(1, 5)]
+    content_types = ["user_input", "ai_response"] * 3
+    logs = [
+        create_random_content_filter_log(db, user.id, content_type, created_at)
+        for content_type, created_at in zip(content_types, timestamps, strict=True)
+    ]
+    return sorted(logs, key=lambda log: (log.created_at, log.id), reverse=True)
+
+
+def test_read_logs_cursor_walk(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    user_logs: list[ContentFilterLog],
+) -> None:
+    params: dict[str, str | int] = {"user_id": str(user_logs[0].user_id), "limit": 2}
+    seen: list[str] = []
+    while True:
+        response = client.get(LOGS_URL, headers=superuser_token_headers, params=params)
+        assert response.status_code == 200
+        content = response.json()
+        seen += [log["id"] for log in content["data"]]
+        if not content["has_more"]:
+            assert content["next_cursor"] is None
+            break
+        assert content["next_cursor"]
+        params["after"] = content["next_cursor"]
+    assert seen == [str(log.id) for log in user_logs]
+
+
+def test_read_logs_invalid_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    response = client.get(
+        LOGS_URL, headers=superuser_token_headers, params={"after": "not-a-cursor"}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_read_logs_exact_user_id(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    user_logs: list[ContentFilterLog],
+) -> None:
+    response = client.get(
+        LOGS_URL,
+        headers=superuser_token_headers,
+        params={"user_id": str(user_logs[0].user_id)},
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert content["count"] == len(user_logs)
+    assert [log["id"] for log in content["data"]] == [str(log.id) for log in user_logs]
+
+
+def test_read_logs_user_id_prefix(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    user_logs: list[ContentFilterLog],
+) -> None:
+    user_id = str(user_logs[0].user_id)
+    # Matched case-insensitively, surrounding whitespace is ignored
+    response = client.get(
+        LOGS_URL,
+        headers=superuser_token_headers,
+        params={"user_id": f" {user_id[:13].upper()} ", "limit": 1000},
+    )
+    assert response.status_code == 200
+    content = response.json()
+    # Other users may share the prefix, but every log matches it
+    assert all(log["user_id"].startswith(user_id[:13]) for log in content["data"])
+    assert {str(log.id) for log in user_logs} <= {log["id"] for log in content["data"]}
+
+
+def test_read_logs_garbage_user_id(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    user_logs: list[ContentFilterLog],  # noqa: ARG001
+) -> None:
+    response = client.get(
+        LOGS_URL, headers=superuser_token_headers, params={"user_id": "%' OR 1=1"}
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert content["data"] == []
+    assert content["count"] == 0
+    assert content["has_more"] is False
+
+
+def test_read_logs_content_type(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    user_logs: list[ContentFilterLog],
+) -> None:
+    response = client.get(
+        LOGS_URL,
+        headers=superuser_token_headers,
+        params={"user_id": str(user_logs[0].user_id), "content_type": "ai_response"},
+    )
+    assert response.status_code == 200
+    content = response.json()
+    expected = [str(log.id) for log in user_logs if log.content_type == "ai_response"]
+    assert [log["id"] for log in content["data"]] == expected
+    assert content["count"] == len(expected)
+
+
+def test_read_statistics(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    user_logs: list[ContentFilterLog],  # noqa: ARG001
+) -> None:
+    content_filter_service.statistics_cache.clear()
+    response = client.get(STATISTICS_URL, headers=superuser_token_headers)
+    assert response.status_code == 200
+    content = response.json()
+    assert content["total_violations"] >= 6
+    assert content["today_violations"] <= content["total_violations"]
+    assert (
+        content["user_input_violations"] + content["ai_response_violations"]
+        == content["total_violations"]
+    )
+    assert content["trivially_safe_count"] >= 0
+
+
+@pytest.mark.parametrize("url", [LOGS_URL, STATISTICS_URL])
+def test_content_filter_normal_user(
+    client: TestClient, normal_user_token_headers: dict[str, str], url: str
+) -> None:
+    response = client.get(url, headers=normal_user_token_headers)
+    assert response.status_code == 403
+    assert response.json()["detail"] == "The user doesn't have enough privileges"
+
+
+def test_content_filter_unknown_user_id(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    response = client.get(
+        LOGS_URL, headers=superuser_token_headers, params={"user_id": str(uuid.uuid4())}
+    )
+    assert response.status_code == 200
+    assert response.json()["count"] == 0
@@ -0,0 +1,177 @@
+import hashlib
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlmodel import Session
+
+from app.core.clock import utcnow
+from app.core.config import settings
+from app.models import PDFDocument
+from app.services.pdf_service import pdf_service
+
+PDFS_URL = f"{settings.API_V1_STR}/pdfs"
+CONTENT = b"%PDF-1.4 chunked upload test content"
+
+
+def start_upload(
+    client: TestClient, headers: dict[str, str], content: bytes = CONTENT
+) -> str:
+    response = client.post(
+        f"{PDFS_URL}/uploads",
+        headers=headers,
+        data={"title": "Upload", "filename": "upload.pdf", "file_size": len(content)},
+    )
+    assert response.status_code == 200
+    assert response.json()["processing_status"] == "uploading"
+    return response.json()["id"]
+
+
+def upload_chunk(
+    client: TestClient, headers: dict[str, str], pdf_id: str, offset: int, data: bytes
+) -> int:
+    response = client.put(
+        f"{PDFS_URL}/{pdf_id}/chunks",
+        headers=headers,
+        params={"offset": offset},
+        content=data,
+    )
+    return response.status_code
+
+
+def test_chunked_upload(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    pdf_id = start_upload(client, superuser_token_headers)
+    # Chunks may arrive in any order
+    middle = len(CONTENT) // 2
+    assert (
+        upload_chunk(client, superuser_token_headers, pdf_id, middle, CONTENT[middle:])
+        == 200
+    )
+    assert (
+        upload_chunk(client, superuser_token_headers, pdf_id, 0, CONTENT[:middle])
+        == 200
+    )
+
+    with patch.object(pdf_service, "enqueue_processing") as enqueue_processing:
+        response = client.post(
+            f"{PDFS_URL}/{pdf_id}/finalize",
+            headers=superuser_token_headers,
+            params={"sha256": hashlib.sha256(CONTENT).hexdigest()},
+        )
+    assert response.status_code == 200
+    assert response.json()["processing_status"] == "pending"
+    enqueue_processing.assert_called_once_with(uuid.UUID(pdf_id))
+
+    pdf_document = db.get(PDFDocument, uuid.UUID(pdf_id))
+    assert pdf_document
+    assert Path(pdf_document.filename).read_bytes() == CONTENT
+    assert not Path(f"{pdf_document.filename}.part").exists()
+
+    # A finalized upload takes no more chunks and cannot be finalized again
+    assert upload_chunk(client, superuser_token_headers, pdf_id, 0, b"x") == 409
+    response = client.post(
+        f"{PDFS_URL}/{pdf_id}/finalize", headers=superuser_token_headers
+    )
+    assert response.status_code == 409
+    Path(pdf_document.filename).unlink()
+
+
+def test_upload_chunk_out_of_range(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    pdf_id = start_upload(client, superuser_token_headers)
+    # Past the end, even without a body
+    assert (
+        upload_chunk(client, superuser_token_headers, pdf_id, len(CONTENT), b"") == 400
+    )
+    # Starting inside the file but running past its end
+    assert upload_chunk(client, superuser_token_headers, pdf_id, 1, CONTENT) == 400
+
+
+def test_upload_chunk_not_found(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    assert (
+        upload_chunk(client, superuser_token_headers, str(uuid.uuid4()), 0, b"x") == 404
+    )
+
+
+def test_upload_chunk_normal_user(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    normal_user_token_headers: dict[str, str],
+) -> None:
+    pdf_id = start_upload(client, superuser_token_headers)
+    assert upload_chunk(client, normal_user_token_headers, pdf_id, 0, CONTENT) == 403
+
+
+def test_finalize_incomplete_upload(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    pdf_id = start_upload(client, superuser_token_headers)
+    response = client.post(
+        f"{PDFS_URL}/{pdf_id}/finalize", headers=superuser_token_headers
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "No chunks were uploaded"
+
+    assert upload_chunk(client, superuser_token_headers, pdf_id, 0, CONTENT[:4]) == 200
+    response = client.post(
+        f"{PDFS_URL}/{pdf_id}/finalize", headers=superuser_token_headers
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"Uploaded 4 of {len(CONTENT)} bytes"
+
+
+def test_finalize_checksum_mismatch(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    pdf_id = start_upload(client, superuser_token_headers)
+    assert upload_chunk(client, superuser_token_headers, pdf_id, 0, CONTENT) == 200
+    response = client.post(
+        f"{PDFS_URL}/{pdf_id}/finalize",
+        headers=superuser_token_headers,
+        params={"sha256": hashlib.sha256(b"other").hexdigest()},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Checksum does not match"
+
+
+def test_expire_abandoned_uploads(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    abandoned_id = start_upload(client, superuser_token_headers)
+    recent_id = start_upload(client, superuser_token_headers)
+    for pdf_id in (abandoned_id, recent_id):
+        assert (
+            upload_chunk(client, superuser_token_headers, pdf_id, 0, CONTENT[:4]) == 200
+        )
+    db.execute(
+        update(PDFDocument)
+        .where(PDFDocument.id == uuid.UUID(abandoned_id))
+        .values(
+            created_at=utcnow()
+            - timedelta(seconds=settings.PDF_UPLOAD_EXPIRE_SECONDS + 60)
+        )
+    )
+    db.commit()
+    abandoned = db.get(PDFDocument, uuid.UUID(abandoned_id))
+    assert abandoned
+    abandoned_part = Path(f"{abandoned.filename}.part")
+    assert abandoned_part.exists()
+
+    assert pdf_service.expire_abandoned_uploads() >= 1
+
+    db.expire_all()
+    assert db.get(PDFDocument, uuid.UUID(abandoned_id)) is None
+    assert not abandoned_part.exists()
+    # Uploads still within the window are kept
+    recent = db.get(PDFDocument, uuid.UUID(recent_id))
+    assert recent
+    assert recent.processing_status == "uploading"
+    assert Path(f"{recent.filename}.part").exists()
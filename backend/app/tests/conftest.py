@@ -24,7 +24,9 @@ def db() -> Generator[Session, None, None]:
         session.commit()
 
 
-@pytest.fixture(scope="module")
+# One client for the whole run, entering it runs the app's lifespan, and
+# leaving it shuts down the service executors that later modules still need
+@pytest.fixture(scope="session")
 def client() -> Generator[TestClient, None, None]:
     with TestClient(app) as c:
         yield c
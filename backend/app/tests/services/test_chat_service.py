@@ -0,0 +1,15 @@
+import uuid
+
+from langchain_core.documents import Document
+
+from app.services.chat_service import chat_service
+
+
+def test_format_pdf_context_closest_first() -> None:
+    docs_and_scores = [
+        (Document(page_content="far", metadata={"pdf_title": "Far"}), 0.9),
+        (Document(page_content="close", metadata={"pdf_title": "Close"}), 0.1),
+        (Document(page_content="middle", metadata={"pdf_title": "Middle"}), 0.5),
+    ]
+    context = chat_service._format_pdf_context(uuid.uuid4(), docs_and_scores, 2)
+    assert context == "From 'Close': close\n\nFrom 'Middle': middle"
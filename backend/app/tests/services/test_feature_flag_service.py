@@ -0,0 +1,83 @@
+from collections.abc import Callable, Generator
+from typing import Any
+
+import pytest
+from sqlmodel import Session
+
+from app.core.db import engine
+from app.models import FeatureFlag, FeatureFlagCreate
+from app.services.feature_flag_service import FeatureFlagService
+from app.tests.utils.utils import random_lower_string
+
+
+class WriteDuringRead:
+    """A session that lands a flag write from another session right before
+    the flags are read, as a concurrent request would"""
+
+    def __init__(self, db: Session, write: Callable[[], None]) -> None:
+        self._db = db
+        self._write = write
+
+    def exec(self, statement: Any) -> Any:
+        self._write()
+        return self._db.exec(statement)
+
+
+@pytest.fixture
+def service() -> FeatureFlagService:
+    # A fresh instance, so no other test has filled its caches
+    return FeatureFlagService()
+
+
+@pytest.fixture
+def flag(
+    db: Session, service: FeatureFlagService
+) -> Generator[FeatureFlag, None, None]:
+    flag = service.create_flag(
+        db,
+        FeatureFlagCreate(name=random_lower_string(), description="Test flag"),
+    )
+    assert flag
+    yield flag
+    service.delete_flag(db, flag.id)
+
+
+def is_cached(service: FeatureFlagService, key: str) -> bool:
+    return service.active_flags_cache.get(key) is not None
+
+
+def test_write_invalidates_flags_and_prompt(
+    db: Session, service: FeatureFlagService, flag: FeatureFlag
+) -> None:
+    assert flag.name in service.get_active_flags_prompt_text(db)
+    assert is_cached(service, service._ACTIVE_FLAGS_KEY)
+    assert is_cached(service, service._PROMPT_TEXT_KEY)
+
+    toggled = service.toggle_flag(db, flag.id)
+    assert toggled
+    assert not toggled.is_enabled
+    assert not is_cached(service, service._ACTIVE_FLAGS_KEY)
+    assert not is_cached(service, service._PROMPT_TEXT_KEY)
+
+    assert flag.name not in [f.name for f in service.get_active_flags(db)]
+    assert flag.name not in service.get_active_flags_prompt_text(db)
+
+
+def test_reload_racing_write_is_not_cached(
+    db: Session, service: FeatureFlagService, flag: FeatureFlag
+) -> None:
+    def toggle() -> None:
+        with Session(engine) as other_db:
+            service.toggle_flag(other_db, flag.id)
+
+    racing_db: Any = WriteDuringRead(db, toggle)
+    service.get_active_flags_prompt_text(racing_db)
+    # What was read may predate the write, neither entry may be cached
+    assert not is_cached(service, service._ACTIVE_FLAGS_KEY)
+    assert not is_cached(service, service._PROMPT_TEXT_KEY)
+
+    # The next reload sees the write and is cached again
+    assert flag.name not in [f.name for f in service.get_active_flags(db)]
+    assert is_cached(service, service._ACTIVE_FLAGS_KEY)
+    assert flag.name not in service.get_active_flags_prompt_text(db)
+    assert is_cached(service, service._PROMPT_TEXT_KEY)
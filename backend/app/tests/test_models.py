@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import StatementError
+from sqlmodel import Session, select
+
+from app.models import ChatMessage, ContentFilterLog
+from app.tests.utils.chat import create_random_chat_message, create_random_chat_session
+from app.tests.utils.user import create_random_user
+
+
+def test_coded_string_round_trip(db: Session) -> None:
+    user = create_random_user(db)
+    chat_session = create_random_chat_session(db, user.id)
+    message = create_random_chat_message(db, chat_session.id, role="assistant")
+    db.expire_all()
+
+    stored = db.execute(
+        text("SELECT role FROM chatmessage WHERE id = :id"), {"id": message.id}
+    ).scalar_one()
+    assert stored == 1
+    loaded = db.get(ChatMessage, message.id)
+    assert loaded
+    assert loaded.role == "assistant"
+
+
+def test_coded_string_unknown_value(db: Session) -> None:
+    user = create_random_user(db)
+    chat_session = create_random_chat_session(db, user.id)
+    db.add(ChatMessage(session_id=chat_session.id, content="hi", role="system"))
+    with pytest.raises(StatementError) as exc_info:
+        db.commit()
+    db.rollback()
+    assert isinstance(exc_info.value.orig, ValueError)
+    assert "'system'" in str(exc_info.value.orig)
+
+
+def test_coded_string_filter(db: Session) -> None:
+    user = create_random_user(db)
+    for content_type in ("user_input", "ai_response", "ai_response"):
+        db.add(
+            ContentFilterLog(
+                user_id=user.id,
+                content_type=content_type,
+                original_content="content",
+                blocked_reason="reason",
+            )
+        )
+    db.commit()
+
+    logs = db.exec(
+        select(ContentFilterLog).where(
+            ContentFilterLog.user_id == user.id,
+            ContentFilterLog.content_type == "ai_response",
+        )
+    ).all()
+    assert len(logs) == 2
+    assert {log.content_type for log in logs} == {"ai_response"}
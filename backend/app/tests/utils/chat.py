@@ -0,0 +1,26 @@
+import uuid
+
+from sqlmodel import Session
+
+from app.models import ChatMessage, ChatSession
+from app.tests.utils.utils import random_lower_string
+
+
+def create_random_chat_session(db: Session, owner_id: uuid.UUID) -> ChatSession:
+    chat_session = ChatSession(owner_id=owner_id, title=random_lower_string())
+    db.add(chat_session)
+    db.commit()
+    db.refresh(chat_session)
+    return chat_session
+
+
+def create_random_chat_message(
+    db: Session, session_id: uuid.UUID, role: str = "user"
+) -> ChatMessage:
+    message = ChatMessage(
+        session_id=session_id, content=random_lower_string(), role=role
+    )
+    db.add(message)
+    db.commit()
+    db.refresh(message)
+    return message
@@ -0,0 +1,27 @@
+import uuid
+from datetime import datetime
+
+from sqlmodel import Session
+
+from app.core.clock import utcnow
+from app.models import ContentFilterLog
+from app.tests.utils.utils import random_lower_string
+
+
+def create_random_content_filter_log(
+    db: Session,
+    user_id: uuid.UUID,
+    content_type: str = "user_input",
+    created_at: datetime | None = None,
+) -> ContentFilterLog:
+    log = ContentFilterLog(
+        user_id=user_id,
+        content_type=content_type,
+        original_content=random_lower_string(),
+        blocked_reason=random_lower_string(),
+        created_at=created_at or utcnow(),
+    )
+    db.add(log)
+    db.commit()
+    db.refresh(log)
+    return log